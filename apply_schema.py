@@ -1,12 +1,15 @@
 import psycopg2
 import os
+import sys
 
-# Set env vars
-os.environ["DB_NAME"] = "workouts"
-os.environ["DB_USER"] = "user"
-os.environ["DB_PASSWORD"] = "password"
-os.environ["DB_HOST"] = "localhost"
-os.environ["DB_PORT"] = "5432"
+# Default env vars (docker-compose provides its own)
+os.environ.setdefault("DB_NAME", "workouts")
+os.environ.setdefault("DB_USER", "user")
+os.environ.setdefault("DB_PASSWORD", "password")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
 
 def get_db_connection():
     conn = psycopg2.connect(
@@ -19,18 +22,69 @@ def get_db_connection():
     return conn
 
 def apply_schema():
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         with open("db_setup.sql", "r") as f:
             sql = f.read()
         cursor.execute(sql)
         conn.commit()
         cursor.close()
-        conn.close()
         print("Schema applied successfully.")
-    except Exception as e:
-        print(f"Error: {e}")
+    finally:
+        conn.close()
+
+def apply_migrations():
+    """Apply every migrations/NNN_*.sql file not yet recorded in schema_migrations, in order."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    version = None
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(255) PRIMARY KEY,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+            if not filename.endswith(".sql"):
+                continue
+            version = filename[:-len(".sql")]
+            if version in applied:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, filename), "r") as f:
+                sql = f.read()
+            # Each migration runs in its own transaction
+            cursor.execute(sql)
+            cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+            conn.commit()
+            print(f"Applied migration {version}")
+        print("Migrations up to date.")
+    except Exception:
+        # Stop here: later migrations (and --check) must not run against a half-migrated schema
+        conn.rollback()
+        if version:
+            print(f"Migration {version} failed and was rolled back")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
 
 if __name__ == "__main__":
-    apply_schema()
+    # --reset recreates the base schema from db_setup.sql (drops all data) before migrating
+    try:
+        if "--reset" in sys.argv:
+            apply_schema()
+        apply_migrations()
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    # --check confirms the hot queries are planned against the migration indexes
+    if "--check" in sys.argv:
+        from verify_indexes import verify_indexes
+        sys.exit(1 if verify_indexes() else 0)
@@ -0,0 +1,55 @@
+"""Fill the Fitbit heart-rate cache for every workout day in a date range.
+
+    python backfill_heartrate.py --from 2024-01-01 --to 2024-12-31 [--user-id 1] [--concurrency 4]
+
+Only days with a workout and no final cached copy are fetched; see
+main.backfill_heartrate. Unlike the HTTP endpoint, this waits out Fitbit's
+rate-limit resets (up to FITBIT_MAX_RETRY_DELAY) instead of stopping.
+"""
+import argparse
+import asyncio
+import os
+from datetime import date
+
+# Default env vars (docker-compose provides its own)
+os.environ.setdefault("DB_NAME", "workouts")
+os.environ.setdefault("DB_USER", "user")
+os.environ.setdefault("DB_PASSWORD", "password")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+
+import fitbit  # noqa: E402
+from db import open_async_pool, close_async_pool  # noqa: E402
+from main import FITBIT_BACKFILL_CONCURRENCY, backfill_heartrate  # noqa: E402
+
+
+async def run(user_id, date_from, date_to, concurrency):
+    await open_async_pool()
+    await fitbit.open_client()
+    try:
+        return await backfill_heartrate(user_id, date_from, date_to, concurrency)
+    finally:
+        await fitbit.close_client()
+        await close_async_pool()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=FITBIT_BACKFILL_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.user_id, args.date_from, args.date_to, args.concurrency))
+    print(f"{result.workout_days} workout days, {result.already_cached} already cached, "
+          f"{len(result.fetched)} fetched, {len(result.failed)} failed.")
+    for day, error in sorted(result.failed.items()):
+        print(f"  {day}: {error}")
+    if result.pending:
+        print(f"Rate limited: {len(result.pending)} days left, retry in {result.retry_after}s.")
+    return 1 if result.failed or result.pending else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+import importer
+
+# Default env vars (docker-compose provides its own)
+os.environ.setdefault("DB_NAME", "workouts")
+os.environ.setdefault("DB_USER", "user")
+os.environ.setdefault("DB_PASSWORD", "password")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+
+CSV_HEADER = ["title", "start_time", "end_time", "description", "exercise_title", "superset_id",
+              "exercise_notes", "set_index", "set_type", "weight_lbs", "reps", "distance_miles",
+              "duration_seconds", "rpe"]
+EXERCISES_PER_WORKOUT = 6
+SETS_PER_EXERCISE = 4
+
+def get_db_connection():
+    return psycopg2.connect(
+        dbname=os.environ.get("DB_NAME"),
+        user=os.environ.get("DB_USER"),
+        password=os.environ.get("DB_PASSWORD"),
+        host=os.environ.get("DB_HOST"),
+        port=os.environ.get("DB_PORT")
+    )
+
+def write_synthetic_csv(path, row_count):
+    """Hevy-style export with one workout per day, going back from 2000-01-01."""
+    rows_per_workout = EXERCISES_PER_WORKOUT * SETS_PER_EXERCISE
+    start = datetime(2000, 1, 1, 6, 30)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for i in range(row_count):
+            workout, rest = divmod(i, rows_per_workout)
+            exercise, set_index = divmod(rest, SETS_PER_EXERCISE)
+            started = start - timedelta(days=workout)
+            writer.writerow([
+                "Benchmark", started.strftime(importer.HEVY_DATE_FORMAT),
+                (started + timedelta(hours=1)).strftime(importer.HEVY_DATE_FORMAT), "",
+                f"Benchmark Exercise {exercise}", "", "", set_index, "normal",
+                100 + set_index * 5, 8, "", "", "",
+            ])
+
+def benchmark(row_count=100000, keep=False):
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as tmp:
+        path = tmp.name
+    try:
+        write_synthetic_csv(path, row_count)
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            t0 = time.perf_counter()
+            with open(path, newline="", encoding="utf-8") as f:
+                workouts, _ = importer.parse_workouts(csv.DictReader(f))
+            t1 = time.perf_counter()
+            imported, updated, skipped = importer.load_workouts(cursor, workouts)
+            t2 = time.perf_counter()
+            print(f"{row_count} rows -> {len(workouts)} workouts: parse {t1 - t0:.2f}s, load {t2 - t1:.2f}s "
+                  f"({imported} imported, {updated} updated, {len(skipped)} skipped)")
+            if keep:
+                conn.commit()
+        finally:
+            # Leave the database untouched unless asked otherwise
+            if not keep:
+                conn.rollback()
+            cursor.close()
+            conn.close()
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 100000
+    benchmark(rows, keep="--keep" in sys.argv)
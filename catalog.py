@@ -0,0 +1,67 @@
+"""In-process cache of the exercise catalog.
+
+Each API worker keeps the exercises joined with their muscle names, plus
+id and name indexes, in memory. Writes to exercises, exercise_muscles and
+muscles bump the exercise_catalog counter in table_versions (see
+versions.py), so a worker checks whether its copy is still current with one
+primary-key lookup instead of re-running the join.
+The exercise write routes also call invalidate() after committing so the
+worker that made the change never serves its own stale copy.
+"""
+import threading
+
+import psycopg2.extras
+
+from versions import EXERCISE_CATALOG, get_version
+
+CATALOG_QUERY = """
+    SELECT e.*, array_remove(array_agg(m.name), NULL) as muscle_group
+    FROM exercises e
+    LEFT JOIN exercise_muscles em ON e.id = em.exercise_id
+    LEFT JOIN muscles m ON em.muscle_id = m.id
+    GROUP BY e.id
+    ORDER BY e.name ASC
+"""
+
+
+class ExerciseCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._exercises = []
+        self._by_id = {}
+        self._by_name = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def _refresh(self, conn):
+        # Read the version before the catalog: a write landing in between makes
+        # us label newer data with an older version, which only costs a reload.
+        version = get_version(conn, EXERCISE_CATALOG)
+        with self._lock:
+            if version is not None and version == self._version:
+                return self._exercises, self._by_id, self._by_name
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute(CATALOG_QUERY)
+            exercises = cursor.fetchall()
+            cursor.close()
+            self._exercises = exercises
+            self._by_id = {e['id']: e for e in exercises}
+            self._by_name = {e['name']: e['id'] for e in exercises}
+            self._version = version
+            return self._exercises, self._by_id, self._by_name
+
+    def all(self, conn):
+        """Every exercise with its muscle_group list, ordered by name."""
+        return self._refresh(conn)[0]
+
+    def get(self, conn, exercise_id):
+        return self._refresh(conn)[1].get(exercise_id)
+
+    def id_for_name(self, conn, name):
+        return self._refresh(conn)[2].get(name)
+
+
+exercise_catalog = ExerciseCatalog()
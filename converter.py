@@ -1,67 +1,9 @@
 import csv
 import json
-from datetime import datetime
 from itertools import groupby
 
-EXERCISE_MUSCLE_GROUPS = {
-    "Lateral Raise (Cable)": ["Shoulders"],
-    "Face Pull": ["Shoulders", "Upper Back"],
-    "Bench Press (Dumbbell)": ["Chest", "Shoulders", "Triceps"],
-    "Dumbbell Row": ["Back", "Biceps"],
-    "Pull Up (Assisted)": ["Back", "Biceps"],
-    "Chest Dip (Assisted)": ["Chest", "Triceps", "Shoulders"],
-    "Butterfly (Pec Deck)": ["Chest"],
-    "Sled Push": ["Quads", "Glutes", "Calves"],
-    "sled back peddle pull": ["Quads", "Glutes", "Hamstrings"],
-    "Nordic Hamstrings Curls": ["Hamstrings"],
-    "Dumbbell Step Up": ["Quads", "Glutes"],
-    "Lateral Lunges (weighted)": ["Quads", "Glutes", "Adductors"],
-    "Hip flexor Lift": ["Hip Flexors"],
-    "Cable Core Palloff Press": ["Core"],
-    "Shoulder Press (Dumbbell)": ["Shoulders", "Triceps"],
-    "Bulgarian Split Squat": ["Quads", "Glutes", "Hamstrings"],
-    "Single Leg Romanian Deadlift (Dumbbell)": ["Hamstrings", "Glutes"],
-    "Box Jump": ["Quads", "Glutes", "Calves"],
-    "Cable Twist Flat": ["Core", "Obliques"],
-    "Lat Pulldown (Cable)": ["Back", "Biceps"],
-    "Lunge (Dumbbell)": ["Quads", "Glutes", "Hamstrings"],
-    "Back Extension (Weighted Hyperextension)": ["Lower Back", "Glutes", "Hamstrings"],
-    "Front Raise (Dumbbell)": ["Shoulders"],
-    "Skullcrusher (Dumbbell)": ["Triceps"],
-    "Chest Fly (Dumbbell)": ["Chest"],
-    "Bent Over Row (Dumbbell)": ["Back", "Biceps"],
-    "Overhead Press (Dumbbell)": ["Shoulders", "Triceps"],
-    "Bicep Curl (Dumbbell)": ["Biceps"],
-    "Single Leg Press (Machine)": ["Quads", "Glutes"],
-    "Hip Thrust (Machine)": ["Glutes", "Hamstrings"],
-    "Standing Calf Raise (Dumbbell)": ["Calves"],
-    "Dead Bug": ["Core"],
-    "Chin Up (Assisted)": ["Back", "Biceps"],
-    "Bench Press - Close Grip (Barbell)": ["Chest", "Triceps"],
-    "Overhead Press (Barbell)": ["Shoulders", "Triceps"],
-    "Triceps Pushdown": ["Triceps"],
-    "Bicep Curl (Cable)": ["Biceps"],
-    "Chest Press (Band)": ["Chest", "Shoulders", "Triceps"],
-    "Mountain Climber": ["Core", "Quads"],
-    "Reverse Lunge": ["Quads", "Glutes", "Hamstrings"],
-    "Hip Adduction (Machine)": ["Adductors"],
-    "Hip Abduction (Machine)": ["Abductors"],
-    "Pistol Squat": ["Quads", "Glutes"],
-    "Plank": ["Core"],
-    "Decline Crunch": ["Core"]
-}
+from importer import EXERCISE_MUSCLE_GROUPS, parse_date, parse_float, parse_int
 
-def parse_float(value):
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return 0.0
-
-def parse_int(value):
-    try:
-        return int(value)
-    except (ValueError, TypeError):
-        return 0
 
 def get_exercise_type(row):
     if row.get('duration_seconds') or row.get('distance_miles'):
@@ -76,11 +18,10 @@ def convert_csv_to_json(csv_path, json_path):
     with open(csv_path, mode='r', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
         
-        rows = sorted(reader, key=lambda r: datetime.strptime(r['start_time'].split(',')[0], '%d %b %Y'))
+        rows = sorted(reader, key=lambda r: parse_date(r['start_time']).date())
         
-        for date_str, day_rows_iter in groupby(rows, key=lambda r: r['start_time'].split(',')[0]):
+        for date_obj, day_rows_iter in groupby(rows, key=lambda r: parse_date(r['start_time']).date()):
             day_rows = list(day_rows_iter)
-            date_obj = datetime.strptime(date_str, '%d %b %Y')
             iso_date = date_obj.strftime('%Y-%m-%d')
 
             if iso_date not in workouts:
@@ -104,12 +45,13 @@ def convert_csv_to_json(csv_path, json_path):
                         "superset_id": row.get('superset_id')
                     }
                 
+                # The JSON export records missing or unreadable numbers as 0
                 set_data = {
-                    "reps": parse_int(row.get('reps')),
-                    "weight": parse_float(row.get('weight_lbs')),
+                    "reps": parse_int(row.get('reps')) or 0,
+                    "weight": parse_float(row.get('weight_lbs')) or 0.0,
                     "distance": row.get('distance_miles'),
-                    "duration": parse_float(row.get('duration_seconds')) / 60 if row.get('duration_seconds') else None,
-                    "rpe": parse_float(row.get('rpe')) if row.get('rpe') else None,
+                    "duration": (parse_float(row.get('duration_seconds')) or 0.0) / 60 if row.get('duration_seconds') else None,
+                    "rpe": (parse_float(row.get('rpe')) or 0.0) if row.get('rpe') else None,
                 }
                 set_data = {k: v for k, v in set_data.items() if v is not None and v != ''}
                 exercises_today[exercise_title]['sets'].append(set_data)
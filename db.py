@@ -0,0 +1,227 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+import asyncpg
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the pool timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool.
+
+    Connections are created lazily up to ``maxconn`` and kept open for reuse,
+    so a request only pays the TCP+auth handshake when the pool has to grow.
+    Idle connections that have not been used for ``check_interval`` seconds
+    are pinged before being handed out, and broken ones are replaced.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=30.0, check_interval=30.0, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: minconn=%s maxconn=%s" % (minconn, maxconn))
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._connect_kwargs = connect_kwargs
+        self._idle = deque()  # (connection, last_used) pairs
+        self._size = 0  # connections currently open, idle or checked out
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def open(self):
+        """(Re)open the pool and pre-connect ``minconn`` connections."""
+        with self._cond:
+            self._closed = False
+        conns = [self.getconn() for _ in range(self.minconn - len(self._idle))]
+        for conn in conns:
+            self.putconn(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            conn.close()
+
+    def _connect(self):
+        return psycopg2.connect(**self._connect_kwargs)
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        conn, last_used = None, None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout("Timed out after %.1fs waiting for a database connection" % self.timeout)
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            if self._is_healthy(conn, last_used):
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn):
+        if not conn.closed:
+            status = conn.info.transaction_status
+            try:
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    conn.close()
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                conn.close()
+
+        with self._cond:
+            if conn.closed or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if self._closed and not conn.closed:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection and always hand it back, rolling back on error."""
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    conn.close()
+            raise
+        finally:
+            self.putconn(conn)
+
+
+DB_SETTINGS = {
+    "dbname": os.environ.get("DB_NAME"),
+    "user": os.environ.get("DB_USER"),
+    "password": os.environ.get("DB_PASSWORD"),
+    "host": os.environ.get("DB_HOST"),
+    "port": os.environ.get("DB_PORT"),
+}
+
+pool = ConnectionPool(
+    minconn=int(os.environ.get("DB_POOL_MIN", "1")),
+    maxconn=int(os.environ.get("DB_POOL_MAX", "10")),
+    timeout=float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+    check_interval=float(os.environ.get("DB_POOL_CHECK_INTERVAL", "30")),
+    **DB_SETTINGS
+)
+
+
+def db_connection():
+    """Context manager yielding a pooled connection."""
+    return pool.connection()
+
+
+# --- Async engine (asyncpg) ---
+# Used by the hot in-gym routes so they run on the event loop instead of
+# queueing for Starlette's threadpool.
+
+ASYNC_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+async_pool = None
+
+
+async def open_async_pool():
+    global async_pool
+    if async_pool is None:
+        async_pool = await asyncpg.create_pool(
+            database=DB_SETTINGS["dbname"],
+            user=DB_SETTINGS["user"],
+            password=DB_SETTINGS["password"],
+            host=DB_SETTINGS["host"],
+            port=int(DB_SETTINGS["port"]) if DB_SETTINGS["port"] else None,
+            min_size=int(os.environ.get("DB_ASYNC_POOL_MIN", "1")),
+            max_size=int(os.environ.get("DB_ASYNC_POOL_MAX", "20")),
+            max_inactive_connection_lifetime=float(os.environ.get("DB_POOL_CHECK_INTERVAL", "30")) * 10,
+        )
+    return async_pool
+
+
+async def close_async_pool():
+    global async_pool
+    if async_pool is not None:
+        await async_pool.close()
+        async_pool = None
+
+
+async def acquire_async_connection():
+    """Check out an asyncpg connection, raising PoolTimeout when the pool stays exhausted."""
+    db_pool = async_pool or await open_async_pool()
+    try:
+        return await db_pool.acquire(timeout=ASYNC_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PoolTimeout("Timed out after %.1fs waiting for a database connection" % ASYNC_POOL_TIMEOUT)
+
+
+async def release_async_connection(conn):
+    await async_pool.release(conn)
+
+
+@asynccontextmanager
+async def async_db_connection():
+    """Async context manager yielding a pooled asyncpg connection."""
+    conn = await acquire_async_connection()
+    try:
+        yield conn
+    finally:
+        await release_async_connection(conn)
@@ -1,5 +1,5 @@
 -- Drop all tables with cascade to handle dependencies
-DROP TABLE IF EXISTS users, body_measurements, exercises, muscles, exercise_muscles, workouts, workout_exercises, workout_sets, routines, routine_days, routine_exercises CASCADE;
+DROP TABLE IF EXISTS users, body_measurements, exercises, muscles, exercise_muscles, workouts, workout_exercises, workout_sets, routines, routine_days, routine_exercises, exercise_summaries, import_jobs, table_versions, sync_tombstones, user_fitbit_auth, fitbit_heartrate_days, schema_migrations CASCADE;
 
 -- Users table to store user information
 CREATE TABLE users (
@@ -0,0 +1,87 @@
+"""Shared HTTP client for the Fitbit Web API.
+
+One httpx.AsyncClient is opened in the app lifespan and reused by every
+Fitbit call, so requests ride on pooled keep-alive connections (HTTP/2 when
+the h2 package is installed) instead of redoing DNS, TCP and TLS each time.
+A semaphore caps how many Fitbit requests are in flight at once across the
+process, and callers that can afford to wait (the heart-rate backfill) ask
+request() to retry rate-limited responses after the delay Fitbit's headers
+announce, up to a caller-chosen limit. Tests pass an httpx.MockTransport to open_client() in place of the
+network.
+"""
+import asyncio
+import os
+
+import httpx
+
+FITBIT_API_URL = "https://api.fitbit.com"
+FITBIT_MAX_CONCURRENCY = int(os.environ.get("FITBIT_MAX_CONCURRENCY", "4"))
+FITBIT_MAX_RETRIES = int(os.environ.get("FITBIT_MAX_RETRIES", "3"))
+FITBIT_MAX_RETRY_DELAY = float(os.environ.get("FITBIT_MAX_RETRY_DELAY", "3600"))
+FITBIT_TIMEOUT = httpx.Timeout(
+    float(os.environ.get("FITBIT_TIMEOUT", "15")),
+    connect=float(os.environ.get("FITBIT_CONNECT_TIMEOUT", "5")),
+)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+client = None
+_semaphore = None
+
+
+async def open_client(transport=None):
+    global client, _semaphore
+    if client is None:
+        client = httpx.AsyncClient(
+            base_url=FITBIT_API_URL,
+            http2=HTTP2_AVAILABLE and transport is None,
+            timeout=FITBIT_TIMEOUT,
+            limits=httpx.Limits(max_connections=FITBIT_MAX_CONCURRENCY, max_keepalive_connections=FITBIT_MAX_CONCURRENCY),
+            transport=transport,
+        )
+        _semaphore = asyncio.Semaphore(FITBIT_MAX_CONCURRENCY)
+    return client
+
+
+async def close_client():
+    global client, _semaphore
+    if client is not None:
+        await client.aclose()
+        client, _semaphore = None, None
+
+
+def _should_retry(method, response):
+    # A failed POST may already have rotated a token; only replay what is safe
+    return response.status_code == 429 or (method == "GET" and response.status_code >= 500)
+
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retrying: Fitbit's rate-limit headers, else exponential backoff."""
+    for header in ("Retry-After", "Fitbit-Rate-Limit-Reset"):
+        value = response.headers.get(header)
+        if value and value.isdigit():
+            return min(float(value) + 1, FITBIT_MAX_RETRY_DELAY)
+    return min(2.0 ** attempt, FITBIT_MAX_RETRY_DELAY)
+
+
+async def request(method, url, retries=0, max_retry_delay=FITBIT_MAX_RETRY_DELAY, **kwargs):
+    """Send a request through the shared client, waiting for a free concurrency slot.
+
+    With ``retries``, 429s (and 5xx for GETs) are retried after retry_delay();
+    the concurrency slot is released while waiting. A response asking for a
+    longer wait than ``max_retry_delay`` is returned as is.
+    """
+    http = client or await open_client()
+    for attempt in range(retries + 1):
+        async with _semaphore:
+            response = await http.request(method, url, **kwargs)
+        if attempt == retries or not _should_retry(method, response):
+            return response
+        delay = retry_delay(response, attempt)
+        if delay > max_retry_delay:
+            return response
+        await asyncio.sleep(delay)
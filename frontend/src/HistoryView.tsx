@@ -6,12 +6,18 @@ import type { Workout } from './types';
 import { format, parseISO } from 'date-fns';
 import { ChevronRight, Clock, Dumbbell, Calendar, Plus, X, List } from 'lucide-react';
 import WorkoutDetailModal from './components/WorkoutDetailModal';
-import type { Exercise, WorkoutExercise } from './types';
+import type { Exercise } from './types';
 import { useUserPreferences } from './context/UserPreferencesContext';
 
+const HISTORY_PAGE_SIZE = 30;
+// Filter by the (default) user so the page is read off idx_workouts_user_date
+const HISTORY_PAGE_PATH = `/workouts/?user_id=1&limit=${HISTORY_PAGE_SIZE}`;
+
 const HistoryView: React.FC = () => {
     const [workouts, setWorkouts] = useState<Workout[]>([]);
     const [isLoading, setIsLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
 
     const [selectedWorkout, setSelectedWorkout] = useState<Workout | null>(null);
     const [showDateModal, setShowDateModal] = useState(false);
@@ -39,8 +45,9 @@ const HistoryView: React.FC = () => {
 
     const loadWorkouts = async () => {
         try {
-            const data = await api.get<Workout[]>('/workouts/');
-            setWorkouts(data);
+            const page = await api.getPage<Workout[]>(HISTORY_PAGE_PATH);
+            setWorkouts(page.data);
+            setNextCursor(page.nextCursor);
         } catch (err) {
             console.error('Failed to load history', err);
         } finally {
@@ -48,6 +55,20 @@ const HistoryView: React.FC = () => {
         }
     };
 
+    const loadMoreWorkouts = async () => {
+        if (!nextCursor) return;
+        setIsLoadingMore(true);
+        try {
+            const page = await api.getPage<Workout[]>(`${HISTORY_PAGE_PATH}&cursor=${encodeURIComponent(nextCursor)}`);
+            setWorkouts(prev => [...prev, ...page.data]);
+            setNextCursor(page.nextCursor);
+        } catch (err) {
+            console.error('Failed to load more history', err);
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     const handleDelete = async (id: number) => {
         try {
             await api.delete(`/workouts/${id}`);
@@ -84,35 +105,33 @@ const HistoryView: React.FC = () => {
                 notes: notes
             });
 
-            // 2. Populate with exercises if routine selected
+            // 2. Populate with exercises if routine selected, in a single batch
             if (dayData && dayData.exercises) {
-                for (let i = 0; i < dayData.exercises.length; i++) {
-                    const ex = dayData.exercises[i];
-                    // Create WorkoutExercise
-                    const we = await api.post<WorkoutExercise>('/workout_exercises/', {
-                        workout_id: workout.id,
-                        exercise_id: ex.id,
-                        sequence: i + 1
-                    });
-
-                    // Fetch full exercise for details (defaults)
-                    const fullEx = await api.get<Exercise>(`/exercises/${ex.id}`);
-
-                    // Create Sets
-                    const numSets = ex.suggested_sets || fullEx.default_sets || 0;
-                    if (numSets > 0) {
-                        for (let s = 1; s <= numSets; s++) {
-                            await api.post('/workout_sets/', {
-                                workout_exercise_id: we.id,
-                                set_number: s,
-                                reps: ex.suggested_reps ? parseInt(ex.suggested_reps) : (fullEx.default_reps ? parseInt(fullEx.default_reps) : null),
-                                duration_seconds: ex.suggested_time_seconds || fullEx.default_time_seconds || null,
-                                tempo: ex.tempo || fullEx.default_tempo,
-                                completed: false
-                            });
-                        }
+                const catalog = await api.get<Exercise[]>('/exercises/');
+                const catalogById = new Map(catalog.map(e => [e.id, e]));
+
+                const exerciseOps: any[] = [];
+                const setOps: any[] = [];
+                dayData.exercises.forEach((ex: any, i: number) => {
+                    const fullEx = catalogById.get(ex.id);
+                    const ref = `ex-${i}`;
+                    exerciseOps.push({ op: 'create', ref, exercise_id: ex.id, sequence: i + 1 });
+
+                    const numSets = ex.suggested_sets || fullEx?.default_sets || 0;
+                    for (let s = 1; s <= numSets; s++) {
+                        setOps.push({
+                            op: 'create',
+                            workout_exercise_ref: ref,
+                            set_number: s,
+                            reps: ex.suggested_reps ? parseInt(ex.suggested_reps) : (fullEx?.default_reps ? parseInt(fullEx.default_reps) : null),
+                            duration_seconds: ex.suggested_time_seconds || fullEx?.default_time_seconds || null,
+                            tempo: ex.tempo || fullEx?.default_tempo,
+                            completed: false
+                        });
                     }
-                }
+                });
+
+                await api.post(`/workouts/${workout.id}/batch`, { exercises: exerciseOps, sets: setOps });
             }
 
             navigate(`/workout/${workout.id}`);
@@ -257,6 +276,16 @@ const HistoryView: React.FC = () => {
                             </div>
                         </section>
                     ))}
+
+                    {nextCursor && (
+                        <button
+                            onClick={loadMoreWorkouts}
+                            disabled={isLoadingMore}
+                            className="w-full bg-slate-900 border border-slate-800 hover:border-slate-700 text-slate-300 font-medium py-3 rounded-xl transition-colors"
+                        >
+                            {isLoadingMore ? 'Loading...' : 'Load older workouts'}
+                        </button>
+                    )}
                 </div>
             )}
 
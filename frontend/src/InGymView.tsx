@@ -112,42 +112,40 @@ const InGymView: React.FC = () => {
                 notes: `Routine: ${dayData.routine_name || 'Active Routine'} - ${dayData.day_name || dayData.name}`
             });
 
-            const workoutExercises: WorkoutExercise[] = [];
-
-            for (let i = 0; i < dayData.exercises.length; i++) {
-                const ex = dayData.exercises[i];
-                const we = await api.post<WorkoutExercise>('/workout_exercises/', {
-                    workout_id: workout.id,
-                    exercise_id: ex.id,
-                    sequence: i + 1
-                });
-
-                const fullEx = await api.get<Exercise>(`/exercises/${ex.id}`);
-                we.exercise = fullEx;
-
-                const sets: any[] = [];
-                const numSets = ex.suggested_sets || fullEx.default_sets || 0;
-
-                if (numSets > 0) {
-                    for (let s = 1; s <= numSets; s++) {
-                        const newSet = await api.post('/workout_sets/', {
-                            workout_exercise_id: we.id,
-                            set_number: s,
-                            reps: ex.suggested_reps ? parseInt(ex.suggested_reps) : (fullEx.default_reps ? parseInt(fullEx.default_reps) : null),
-                            duration_seconds: ex.suggested_time_seconds || fullEx.default_time_seconds || null,
-                            tempo: ex.tempo || fullEx.default_tempo,
-                            completed: false
-                        });
-                        sets.push(newSet);
-                    }
+            // One catalog read for the defaults, then every exercise and set in a single batch
+            const catalog = await api.get<Exercise[]>('/exercises/');
+            const catalogById = new Map(catalog.map(e => [e.id, e]));
+
+            const exerciseOps: any[] = [];
+            const setOps: any[] = [];
+            dayData.exercises.forEach((ex: any, i: number) => {
+                const fullEx = catalogById.get(ex.id);
+                const ref = `ex-${i}`;
+                exerciseOps.push({ op: 'create', ref, exercise_id: ex.id, sequence: i + 1 });
+
+                const numSets = ex.suggested_sets || fullEx?.default_sets || 0;
+                for (let s = 1; s <= numSets; s++) {
+                    setOps.push({
+                        op: 'create',
+                        workout_exercise_ref: ref,
+                        set_number: s,
+                        reps: ex.suggested_reps ? parseInt(ex.suggested_reps) : (fullEx?.default_reps ? parseInt(fullEx.default_reps) : null),
+                        duration_seconds: ex.suggested_time_seconds || fullEx?.default_time_seconds || null,
+                        tempo: ex.tempo || fullEx?.default_tempo,
+                        completed: false
+                    });
                 }
+            });
 
-                we.sets = sets;
-                workoutExercises.push(we);
+            const result = await api.post<{ workout: Workout, refs: Record<string, number> }>(
+                `/workouts/${workout.id}/batch`,
+                { exercises: exerciseOps, sets: setOps }
+            );
+            for (const we of result.workout.exercises || []) {
+                we.exercise = catalogById.get(we.exercise_id) || we.exercise;
             }
 
-            workout.exercises = workoutExercises;
-            setActiveWorkout(workout);
+            setActiveWorkout(result.workout);
 
         } catch (err) {
             console.error("Failed to start routine workout", err);
@@ -1,28 +1,62 @@
 import React, { useState, useEffect } from 'react';
 import { api } from './api';
-import type { Workout, Exercise } from './types';
+import type { Exercise, WorkoutSet } from './types';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, LineChart, Line } from 'recharts';
 import { Calendar, TrendingUp, Dumbbell } from 'lucide-react';
 import Autocomplete from './components/Autocomplete';
 import { format, parseISO } from 'date-fns';
 
+interface PeriodCount {
+    period: string;
+    count: number;
+}
+
+interface WorkoutTonnage {
+    workout_id: number;
+    date: string;
+    tonnage: number;
+}
+
+interface ExerciseHistoryEntry {
+    workout_id: number;
+    date: string;
+    max_weight: number | null;
+    estimated_1rm: number | null;
+    volume: number;
+    sets: WorkoutSet[];
+}
+
 const ReportsView: React.FC = () => {
-    const [workouts, setWorkouts] = useState<Workout[]>([]);
+    const [workoutsPerMonth, setWorkoutsPerMonth] = useState<PeriodCount[]>([]);
+    const [tonnage, setTonnage] = useState<WorkoutTonnage[]>([]);
     const [exercises, setExercises] = useState<Exercise[]>([]);
     const [loading, setLoading] = useState(true);
     const [selectedExerciseId, setSelectedExerciseId] = useState<number | null>(null);
+    const [exerciseHistory, setExerciseHistory] = useState<ExerciseHistoryEntry[]>([]);
 
     useEffect(() => {
         loadData();
     }, []);
 
+    useEffect(() => {
+        if (!selectedExerciseId) {
+            setExerciseHistory([]);
+            return;
+        }
+        api.get<ExerciseHistoryEntry[]>(`/reports/exercises/${selectedExerciseId}/history`)
+            .then(setExerciseHistory)
+            .catch(err => console.error('Failed to load exercise history', err));
+    }, [selectedExerciseId]);
+
     const loadData = async () => {
         try {
-            const [workoutsData, exercisesData] = await Promise.all([
-                api.get<Workout[]>('/workouts/'),
+            const [perMonthData, tonnageData, exercisesData] = await Promise.all([
+                api.get<PeriodCount[]>('/reports/workouts_per_period?period=month'),
+                api.get<WorkoutTonnage[]>('/reports/tonnage?limit=10'),
                 api.get<Exercise[]>('/exercises/')
             ]);
-            setWorkouts(workoutsData);
+            setWorkoutsPerMonth(perMonthData);
+            setTonnage(tonnageData);
             setExercises(exercisesData);
         } catch (err) {
             console.error('Failed to load data', err);
@@ -36,80 +70,25 @@ const ReportsView: React.FC = () => {
         value: ex.id
     })).sort((a, b) => a.label.localeCompare(b.label));
 
-    // --- Aggregate Data Processing (Default View) ---
-    const workoutsByMonth = workouts.reduce((acc, workout) => {
-        const month = new Date(workout.date).toLocaleString('default', { month: 'short' });
-        acc[month] = (acc[month] || 0) + 1;
-        return acc;
-    }, {} as Record<string, number>);
-
-    const barData = Object.entries(workoutsByMonth).map(([name, count]) => ({ name, count }));
-
-    // Mock volume data for now since we need to calculate it from sets
-    const volumeData = workouts.slice(0, 10).map((_w, i) => ({
-        name: `WO ${i + 1}`,
-        volume: Math.floor(Math.random() * 5000) + 2000 // Placeholder
+    // --- Aggregate Data (computed server-side) ---
+    const barData = workoutsPerMonth.map(p => ({
+        name: format(parseISO(p.period), 'MMM yy'),
+        count: p.count
     }));
 
-    // --- Exercise Specific Processing ---
-    const getExerciseHistory = () => {
-        if (!selectedExerciseId) return [];
-
-        const history: any[] = [];
-        const selectedExercise = exercises.find(e => e.id === selectedExerciseId);
-        if (!selectedExercise) return [];
-
-        workouts.forEach(workout => {
-            if (!workout.exercises) return;
-
-            workout.exercises.forEach((item: any) => {
-                const checkAndAdd = (ex: any) => {
-                    // Check logic based on confirmed API response (ex.id matches exercise ID)
-                    if (ex.id === selectedExerciseId && ex.sets && ex.sets.length > 0) {
-                        // Calculate One Rep Max (Epley formula) for the best set
-                        let maxWeight = 0;
-                        let estimated1RM = 0;
-
-                        ex.sets.forEach((set: any) => {
-                            if (set.weight_kg && set.weight_kg > maxWeight) {
-                                maxWeight = set.weight_kg;
-                            }
-                            if (set.weight_kg && set.reps) {
-                                const e1rm = set.weight_kg * (1 + set.reps / 30);
-                                if (e1rm > estimated1RM) estimated1RM = e1rm;
-                            }
-                        });
-
-                        history.push({
-                            date: workout.date,
-                            sets: ex.sets,
-                            maxWeight,
-                            estimated1RM,
-                            volume: ex.sets.reduce((acc: number, s: any) => acc + ((s.weight_kg || 0) * (s.reps || 0)), 0),
-                            notes: ex.notes
-                        });
-                    }
-                };
-
-                if (item.superset && Array.isArray(item.superset)) {
-                    item.superset.forEach(checkAndAdd);
-                } else {
-                    checkAndAdd(item);
-                }
-            });
-        });
-
-        return history.sort((a, b) => new Date(b.date).getTime() - new Date(a.date).getTime());
-    };
+    const volumeData = tonnage.map(t => ({
+        name: format(parseISO(t.date), 'MMM d'),
+        volume: Math.round(t.tonnage)
+    }));
 
-    const exerciseHistory = getExerciseHistory();
+    // --- Exercise Specific Data ---
     const selectedExerciseName = exercises.find(e => e.id === selectedExerciseId)?.name;
 
     // Filter for chart (reverse order for date ascending)
     const chartData = [...exerciseHistory].reverse().map(h => ({
         date: format(parseISO(h.date), 'MMM d'),
-        weight: h.maxWeight,
-        e1rm: Math.round(h.estimated1RM)
+        weight: h.max_weight ?? 0,
+        e1rm: Math.round(h.estimated_1rm ?? 0)
     }));
 
     if (loading) {
@@ -234,7 +213,7 @@ const ReportsView: React.FC = () => {
                                                     {format(parseISO(entry.date), 'EEEE, MMMM do, yyyy')}
                                                 </div>
                                                 <div className="text-sm text-slate-500">
-                                                    Est. 1RM: <span className="text-slate-300 font-mono">{Math.round(entry.estimated1RM)} lbs</span>
+                                                    Est. 1RM: <span className="text-slate-300 font-mono">{Math.round(entry.estimated_1rm ?? 0)} lbs</span>
                                                 </div>
                                             </div>
                                         </div>
@@ -243,7 +222,7 @@ const ReportsView: React.FC = () => {
                                     </div>
 
                                     <div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-3">
-                                        {entry.sets.map((set: any, sIdx: number) => (
+                                        {entry.sets.map((set, sIdx) => (
                                             <div key={sIdx} className="bg-slate-950/50 border border-slate-800/50 rounded-lg p-3 flex items-center justify-between">
                                                 <div className="flex items-center gap-3">
                                                     <span className="text-xs font-bold text-slate-500 w-6">#{set.set_number}</span>
@@ -24,6 +24,16 @@ export const api = {
         return response.json();
     },
 
+    // For keyset-paginated lists: returns the page plus the cursor for the next one (null on the last page)
+    getPage: async <T>(endpoint: string): Promise<{ data: T, nextCursor: string | null }> => {
+        const response = await fetch(`${API_BASE_URL}${endpoint}`);
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.detail || `API Error: ${response.statusText}`);
+        }
+        return { data: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
+    },
+
     post: async <T>(endpoint: string, data: any): Promise<T> => {
         const response = await fetch(`${API_BASE_URL}${endpoint}`, {
             method: 'POST',
@@ -71,3 +81,33 @@ export const api = {
         return response.json();
     },
 };
+
+// --- Previous-set lookups ---
+// Every SetLogger on the workout screen asks for its previous values on mount.
+// Requests made in the same tick are coalesced into one /exercises/last_sets call.
+
+export interface LastSet {
+    exercise_id: number;
+    set_number: number;
+    weight_kg: number | null;
+    reps: number | null;
+}
+
+let pendingLastSets: { exerciseIds: Set<number>, request: Promise<LastSet[]> } | null = null;
+
+export const getLastSet = async (exerciseId: number, setNumber: number): Promise<LastSet | null> => {
+    if (!pendingLastSets) {
+        const exerciseIds = new Set<number>();
+        const request = new Promise<LastSet[]>((resolve, reject) => {
+            setTimeout(() => {
+                pendingLastSets = null;
+                const query = Array.from(exerciseIds).map(id => `exercise_ids=${id}`).join('&');
+                api.get<LastSet[]>(`/exercises/last_sets?${query}`).then(resolve, reject);
+            }, 0);
+        });
+        pendingLastSets = { exerciseIds, request };
+    }
+    pendingLastSets.exerciseIds.add(exerciseId);
+    const rows = await pendingLastSets.request;
+    return rows.find(row => row.exercise_id === exerciseId && row.set_number === setNumber) ?? null;
+};
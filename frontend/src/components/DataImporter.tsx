@@ -1,12 +1,48 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { api } from '../api';
 import { Upload, AlertCircle, CheckCircle } from 'lucide-react';
 
+interface ImportJob {
+    id: number;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    rows_processed: number;
+    workouts_imported: number;
+    workouts_updated: number;
+    workouts_skipped: number;
+    errors: string[];
+}
+
+const JOB_POLL_INTERVAL_MS = 1000;
+
 const DataImporter: React.FC = () => {
     const [file, setFile] = useState<File | null>(null);
     const [uploading, setUploading] = useState(false);
     const [status, setStatus] = useState<{ type: 'success' | 'error', message: string } | null>(null);
-    const [stats, setStats] = useState<{ imported: number, skipped: number } | null>(null);
+    const [stats, setStats] = useState<{ imported: number, updated: number, skipped: number } | null>(null);
+    const [job, setJob] = useState<ImportJob | null>(null);
+
+    // Poll the background job until it finishes
+    useEffect(() => {
+        if (!job || job.status === 'succeeded' || job.status === 'failed') return;
+        const timer = setTimeout(async () => {
+            try {
+                const updated = await api.get<ImportJob>(`/jobs/${job.id}`);
+                setJob(updated);
+                setStats({ imported: updated.workouts_imported, updated: updated.workouts_updated, skipped: updated.workouts_skipped });
+                if (updated.status === 'succeeded') {
+                    setStatus({ type: 'success', message: 'Import completed successfully!' });
+                } else if (updated.status === 'failed') {
+                    setStatus({ type: 'error', message: updated.errors[0] || 'Import failed' });
+                }
+            } catch (error) {
+                setStatus({ type: 'error', message: error instanceof Error ? error.message : 'Lost track of import' });
+                setJob(null);
+            }
+        }, JOB_POLL_INTERVAL_MS);
+        return () => clearTimeout(timer);
+    }, [job]);
+
+    const jobRunning = !!job && (job.status === 'queued' || job.status === 'running');
 
     const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
         if (e.target.files && e.target.files.length > 0) {
@@ -22,14 +58,15 @@ const DataImporter: React.FC = () => {
         setUploading(true);
         setStatus(null);
         setStats(null);
+        setJob(null);
 
         const formData = new FormData();
         formData.append('file', file);
 
         try {
-            const result = await api.postFile<{ status: string, imported: number, skipped: number }>('/workouts/import', formData);
-            setStatus({ type: 'success', message: 'Import completed successfully!' });
-            setStats({ imported: result.imported, skipped: result.skipped });
+            // Queued as a background job: the upload returns as soon as the file is stored
+            const result = await api.postFile<{ status: string, job_id: number }>('/workouts/import?background=true', formData);
+            setJob({ id: result.job_id, status: 'queued', rows_processed: 0, workouts_imported: 0, workouts_updated: 0, workouts_skipped: 0, errors: [] });
             setFile(null);
             // Reset file input value manually if needed, but managing state is enough for logic
         } catch (error) {
@@ -48,7 +85,7 @@ const DataImporter: React.FC = () => {
                 </h3>
 
                 <p className="text-slate-400 text-sm mb-6">
-                    Upload a CSV file to import past workouts. Existing workouts (matching date) will be skipped.
+                    Upload a CSV file to import past workouts. Workouts already imported (same date and start time) are skipped if unchanged and updated if the export changed them.
                 </p>
 
                 <div className="space-y-4">
@@ -62,14 +99,23 @@ const DataImporter: React.FC = () => {
                     {file && (
                         <button
                             onClick={handleUpload}
-                            disabled={uploading}
+                            disabled={uploading || jobRunning}
                             className="flex items-center gap-2 px-4 py-2 bg-sky-500 hover:bg-sky-400 text-white rounded-lg font-medium transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
                         >
-                            {uploading ? 'Importing...' : 'Start Import'}
+                            {uploading ? 'Uploading...' : 'Start Import'}
                         </button>
                     )}
                 </div>
 
+                {job && jobRunning && (
+                    <div className="mt-6 p-4 rounded-lg bg-sky-500/10 text-sky-400 text-sm">
+                        <p className="font-medium">{job.status === 'queued' ? 'Import queued...' : 'Importing in the background...'}</p>
+                        <p className="mt-1 opacity-90">
+                            Rows: {job.rows_processed} | Imported: {job.workouts_imported} | Updated: {job.workouts_updated} | Skipped: {job.workouts_skipped}
+                        </p>
+                    </div>
+                )}
+
                 {status && (
                     <div className={`mt-6 p-4 rounded-lg flex items-start gap-3 ${status.type === 'success' ? 'bg-emerald-500/10 text-emerald-400' : 'bg-red-500/10 text-red-400'}`}>
                         {status.type === 'success' ? <CheckCircle size={20} className="shrink-0" /> : <AlertCircle size={20} className="shrink-0" />}
@@ -77,7 +123,7 @@ const DataImporter: React.FC = () => {
                             <p className="font-medium">{status.message}</p>
                             {stats && (
                                 <p className="text-sm mt-1 opacity-90">
-                                    Imported: {stats.imported} | Skipped: {stats.skipped}
+                                    Imported: {stats.imported} | Updated: {stats.updated} | Skipped: {stats.skipped}
                                 </p>
                             )}
                         </div>
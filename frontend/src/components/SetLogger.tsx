@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Check, Trash2, History, Timer } from 'lucide-react';
-import { api } from '../api';
+import { api, getLastSet } from '../api';
 import type { WorkoutSet } from '../types';
 import clsx from 'clsx';
 import TimerModal from './TimerModal';
@@ -75,10 +75,8 @@ const SetLogger: React.FC<SetLoggerProps> = ({
 
     const loadHistory = async () => {
         try {
-            const data = await api.get<{ weight_kg: number, reps: number }>(
-                `/exercises/${exerciseId}/last_set?set_number=${setNumber}`
-            );
-            if (data) {
+            const data = await getLastSet(exerciseId, setNumber);
+            if (data && data.weight_kg !== null && data.reps !== null) {
                 // history data is in KG, convert for display
                 const convertedWeight = convertWeight(data.weight_kg);
                 const historyWeight = convertedWeight ?? data.weight_kg; // Fallback
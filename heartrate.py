@@ -0,0 +1,170 @@
+"""Per-day cache of Fitbit intraday heart rate.
+
+A day of 1-minute samples is stored as 1440 bytes in fitbit_heartrate_days,
+one bpm per minute of the day with 0 marking minutes without a reading.
+Days that ended a while before they were fetched never change again and are
+served from the table forever; today (and a day fetched too soon after it
+ended, before the tracker synced) is refetched once its copy is older than a
+short TTL.
+
+The summary helpers work on those bytes directly: slicing, stripping gaps and
+mapping bpm to zones with bytes.translate/count run in C over the whole
+window rather than per sample in Python.
+"""
+import bisect
+import math
+import os
+from datetime import datetime, time, timedelta
+
+MINUTES_PER_DAY = 24 * 60
+
+TODAY_TTL = timedelta(seconds=int(os.environ.get("HEARTRATE_TODAY_TTL_SECONDS", "300")))
+# Trackers sync in the background; a day is final once fetched this long after it ended
+FINAL_AFTER = timedelta(hours=int(os.environ.get("HEARTRATE_FINAL_AFTER_HOURS", "6")))
+
+DEFAULT_MAX_HR = int(os.environ.get("HEARTRATE_MAX_BPM", "190"))
+# Sessions logged without an end time are assumed to last this long
+DEFAULT_SESSION_MINUTES = int(os.environ.get("HEARTRATE_DEFAULT_SESSION_MINUTES", "60"))
+
+# Zone name and lower bound as a fraction of max heart rate
+ZONES = (
+    ("rest", 0.0),
+    ("warm_up", 0.5),
+    ("fat_burn", 0.6),
+    ("cardio", 0.7),
+    ("hard", 0.8),
+    ("peak", 0.9),
+)
+
+
+def encode_samples(dataset):
+    """Fitbit ``activities-heart-intraday.dataset`` -> 1440 bytes of bpm per minute."""
+    samples = bytearray(MINUTES_PER_DAY)
+    for point in dataset:
+        hours, minutes = point['time'].split(':')[:2]
+        samples[int(hours) * 60 + int(minutes)] = max(0, min(255, round(point['value'])))
+    return bytes(samples)
+
+
+def iter_samples(samples):
+    """(minute_of_day, bpm) for every minute that has a reading."""
+    return ((minute, bpm) for minute, bpm in enumerate(samples) if bpm)
+
+
+def resting_heart_rate(payload):
+    days = payload.get('activities-heart') or []
+    return days[0].get('value', {}).get('restingHeartRate') if days else None
+
+
+def to_fitbit_json(day, samples, resting=None):
+    """Rebuild the subset of Fitbit's heart-rate response the app uses from a cached day."""
+    summary = {"restingHeartRate": resting} if resting is not None else {}
+    return {
+        "activities-heart": [{"dateTime": day.isoformat(), "value": summary}],
+        "activities-heart-intraday": {
+            "dataset": [
+                {"time": f"{minute // 60:02d}:{minute % 60:02d}:00", "value": bpm}
+                for minute, bpm in iter_samples(samples)
+            ],
+            "datasetInterval": 1,
+            "datasetType": "minute",
+        },
+    }
+
+
+def is_fresh(day, fetched_at, now=None):
+    """Whether a cached day can be served without asking Fitbit again."""
+    now = now or datetime.now().astimezone()
+    day_end = datetime.combine(day + timedelta(days=1), time.min).astimezone()
+    if fetched_at >= day_end + FINAL_AFTER:
+        return True
+    return now - fetched_at < TODAY_TTL
+
+
+async def get_day(conn, user_id, day):
+    return await conn.fetchrow(
+        "SELECT samples, resting_heart_rate, fetched_at FROM fitbit_heartrate_days WHERE user_id = $1 AND date = $2",
+        user_id, day
+    )
+
+
+async def store_day(conn, user_id, day, payload):
+    """Encode and upsert one day of Fitbit's heart-rate response; returns the stored row."""
+    dataset = (payload.get('activities-heart-intraday') or {}).get('dataset') or []
+    return await conn.fetchrow("""
+        INSERT INTO fitbit_heartrate_days (user_id, date, samples, resting_heart_rate, fetched_at)
+        VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            samples = EXCLUDED.samples,
+            resting_heart_rate = EXCLUDED.resting_heart_rate,
+            fetched_at = EXCLUDED.fetched_at
+        RETURNING samples, resting_heart_rate, fetched_at
+    """, user_id, day, encode_samples(dataset), resting_heart_rate(payload))
+
+
+def minute_of_day(t):
+    return t.hour * 60 + t.minute
+
+
+def format_minute(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def session_window(start_time, end_time, now_minute=None):
+    """[start, end) minute range of a session within its day.
+
+    Without an end time the session runs until ``now_minute`` (today's live
+    workout) or for DEFAULT_SESSION_MINUTES; sessions past midnight are cut
+    at the end of the day.
+    """
+    start = minute_of_day(start_time)
+    if end_time is not None:
+        end = minute_of_day(end_time)
+        if end <= start:
+            end = MINUTES_PER_DAY
+    elif now_minute is not None:
+        end = max(now_minute, start + 1)
+    else:
+        end = start + DEFAULT_SESSION_MINUTES
+    return start, min(end, MINUTES_PER_DAY)
+
+
+def zone_bounds(max_hr):
+    return [math.ceil(fraction * max_hr) for _, fraction in ZONES]
+
+
+def summarize(samples, start, end, max_hr=DEFAULT_MAX_HR):
+    """Average/max bpm and minutes per zone for samples[start:end], ignoring gaps."""
+    bounds = zone_bounds(max_hr)
+    readings = bytes(samples[start:end]).replace(b"\x00", b"")
+    if readings:
+        zone_of = bytes(bisect.bisect_right(bounds, bpm) - 1 for bpm in range(256))
+        zone_ids = readings.translate(zone_of)
+        minutes = [zone_ids.count(i) for i in range(len(ZONES))]
+        avg_bpm, max_bpm = round(sum(readings) / len(readings), 1), max(readings)
+    else:
+        minutes = [0] * len(ZONES)
+        avg_bpm = max_bpm = None
+    zones = [
+        {"name": name, "min_bpm": bounds[i], "max_bpm": bounds[i + 1] - 1 if i + 1 < len(bounds) else None, "minutes": minutes[i]}
+        for i, (name, _) in enumerate(ZONES)
+    ]
+    return {"avg_bpm": avg_bpm, "max_bpm": max_bpm, "minutes_with_data": len(readings), "zones": zones}
+
+
+def split_window(start, end, weights):
+    """Cut [start, end) into consecutive segments sized by ``weights`` (equal when all are 0)."""
+    if not weights:
+        return []
+    total = sum(weights)
+    if total == 0:
+        weights, total = [1] * len(weights), len(weights)
+    segments = []
+    cumulative = 0
+    segment_start = start
+    for weight in weights:
+        cumulative += weight
+        segment_end = start + round((end - start) * cumulative / total)
+        segments.append((segment_start, segment_end))
+        segment_start = segment_end
+    return segments
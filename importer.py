@@ -0,0 +1,740 @@
+"""Workout ETL: parse Hevy-style CSV exports and workout JSON archives, load them with COPY.
+
+Every source goes through the same parser (``parse_date``, ``lbs_to_kg``,
+the sled weight/distance swap) into one workout shape. Sources are read as
+streams, and parsing can be spread over a process pool. Each batch of
+workouts is staged into temp tables with ``COPY FROM STDIN`` and loaded
+with a handful of set-based ``INSERT ... SELECT`` statements, so neither
+memory nor the number of round trips grows with the size of the export.
+
+Used by POST /workouts/import and background import jobs, and as a CLI::
+
+    python importer.py workout_data.csv workouts-data/all_workouts.json --seed-muscles
+"""
+import argparse
+import codecs
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import psycopg2
+
+HEVY_DATE_FORMAT = "%d %b %Y, %H:%M"
+LBS_TO_KG = 0.45359237
+MILES_TO_M = 1609.34
+# workout_sets.distance_m is NUMERIC(7, 2)
+MAX_DISTANCE_M = 99999.99
+
+# Units seen in the free-text distance/height fields of the JSON archives
+DISTANCE_UNITS_M = {"mi": MILES_TO_M, "mile": MILES_TO_M, "miles": MILES_TO_M, "yd": 0.9144, "yard": 0.9144,
+                    "yards": 0.9144, "m": 1.0, "meter": 1.0, "meters": 1.0, "km": 1000.0, "ft": 0.3048, "feet": 0.3048}
+HEIGHT_UNITS_CM = {"in": 2.54, "inch": 2.54, "inches": 2.54, "cm": 1.0}
+
+READ_CHUNK_SIZE = 64 * 1024
+# Workouts are flushed once a batch holds at least this many CSV rows
+IMPORT_BATCH_ROWS = 5000
+# Workouts handed to a parse worker at a time
+PARSE_CHUNK_WORKOUTS = 256
+
+# Per-set values written to workout_sets, in content_hash order
+SET_FIELDS = ('set_number', 'weight_kg', 'reps', 'distance_m', 'duration_seconds', 'height_cm', 'notes')
+
+# Muscle groups for the exercises in the historical export (--seed-muscles)
+EXERCISE_MUSCLE_GROUPS = {
+    "Lateral Raise (Cable)": ["Shoulders"],
+    "Face Pull": ["Shoulders", "Upper Back"],
+    "Bench Press (Dumbbell)": ["Chest", "Shoulders", "Triceps"],
+    "Dumbbell Row": ["Back", "Biceps"],
+    "Pull Up (Assisted)": ["Back", "Biceps"],
+    "Chest Dip (Assisted)": ["Chest", "Triceps", "Shoulders"],
+    "Butterfly (Pec Deck)": ["Chest"],
+    "Sled Push": ["Quads", "Glutes", "Calves"],
+    "sled back peddle pull": ["Quads", "Glutes", "Hamstrings"],
+    "Nordic Hamstrings Curls": ["Hamstrings"],
+    "Dumbbell Step Up": ["Quads", "Glutes"],
+    "Lateral Lunges (weighted)": ["Quads", "Glutes", "Adductors"],
+    "Hip flexor Lift": ["Hip Flexors"],
+    "Cable Core Palloff Press": ["Core"],
+    "Shoulder Press (Dumbbell)": ["Shoulders", "Triceps"],
+    "Bulgarian Split Squat": ["Quads", "Glutes", "Hamstrings"],
+    "Single Leg Romanian Deadlift (Dumbbell)": ["Hamstrings", "Glutes"],
+    "Box Jump": ["Quads", "Glutes", "Calves"],
+    "Cable Twist Flat": ["Core", "Obliques"],
+    "Lat Pulldown (Cable)": ["Back", "Biceps"],
+    "Lunge (Dumbbell)": ["Quads", "Glutes", "Hamstrings"],
+    "Back Extension (Weighted Hyperextension)": ["Lower Back", "Glutes", "Hamstrings"],
+    "Front Raise (Dumbbell)": ["Shoulders"],
+    "Skullcrusher (Dumbbell)": ["Triceps"],
+    "Chest Fly (Dumbbell)": ["Chest"],
+    "Bent Over Row (Dumbbell)": ["Back", "Biceps"],
+    "Overhead Press (Dumbbell)": ["Shoulders", "Triceps"],
+    "Bicep Curl (Dumbbell)": ["Biceps"],
+    "Single Leg Press (Machine)": ["Quads", "Glutes"],
+    "Hip Thrust (Machine)": ["Glutes", "Hamstrings"],
+    "Standing Calf Raise (Dumbbell)": ["Calves"],
+    "Dead Bug": ["Core"],
+    "Chin Up (Assisted)": ["Back", "Biceps"],
+    "Bench Press - Close Grip (Barbell)": ["Chest", "Triceps"],
+    "Overhead Press (Barbell)": ["Shoulders", "Triceps"],
+    "Triceps Pushdown": ["Triceps"],
+    "Bicep Curl (Cable)": ["Biceps"],
+    "Chest Press (Band)": ["Chest", "Shoulders", "Triceps"],
+    "Mountain Climber": ["Core", "Quads"],
+    "Reverse Lunge": ["Quads", "Glutes", "Hamstrings"],
+    "Hip Adduction (Machine)": ["Adductors"],
+    "Hip Abduction (Machine)": ["Abductors"],
+    "Pistol Squat": ["Quads", "Glutes"],
+    "Plank": ["Core"],
+    "Decline Crunch": ["Core"]
+}
+
+
+def parse_date(date_str):
+    if not date_str:
+        return None
+    try:
+        # Format: "9 Jul 2025, 06:42"
+        return datetime.strptime(date_str, HEVY_DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def parse_float(value):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def lbs_to_kg(lbs):
+    value = parse_float(lbs) if lbs else None
+    return round(value * LBS_TO_KG, 2) if value is not None else None
+
+
+def _build_set(set_number, ex_title, weight_lbs, distance_m, reps, duration_seconds, notes, height_cm=None):
+    """Shared workout_sets conversion for CSV rows and JSON sets."""
+    # Sled Push/Pull weights were logged in the distance column
+    if 'sled' in ex_title.lower() and not weight_lbs and distance_m:
+        weight_lbs, distance_m = distance_m / MILES_TO_M, None
+
+    if distance_m is not None:
+        distance_m = round(distance_m, 2)
+        if distance_m > MAX_DISTANCE_M:
+            notes = (notes or "") + f" [Import Warning: Dist {distance_m:.2f}m removed (overflow)]"
+            distance_m = None
+
+    return {
+        'set_number': set_number,
+        'weight_kg': lbs_to_kg(weight_lbs),
+        'reps': reps,
+        'distance_m': distance_m,
+        'duration_seconds': duration_seconds,
+        'height_cm': round(height_cm, 2) if height_cm is not None else None,
+        'notes': notes,
+    }
+
+
+def parse_set(row):
+    """Convert one CSV row into the workout_sets values (everything but the workout exercise)."""
+    distance_miles = parse_float(row.get('distance_miles')) if row.get('distance_miles') else None
+    set_index = parse_int(row.get('set_index'))
+    return _build_set(
+        set_index + 1 if set_index is not None else 1,
+        row['exercise_title'],
+        row.get('weight_lbs'),
+        distance_miles * MILES_TO_M if distance_miles is not None else None,
+        parse_int(row.get('reps')),
+        parse_int(row.get('duration_seconds')),
+        row.get('exercise_notes', ''),
+    )
+
+
+def _parse_measure(value, units, default_factor):
+    """Parse "30 Yards" / "18 in" / 255 into base units; bare numbers use ``default_factor``."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) * default_factor
+    match = re.match(r"\s*(-?[\d.]+)\s*([a-zA-Z]*)", str(value))
+    if not match:
+        return None
+    number = parse_float(match.group(1))
+    unit = match.group(2).lower()
+    if number is None or (unit and unit not in units):
+        return None
+    return number * units[unit] if unit else number * default_factor
+
+
+def _new_workout(key, title, workout_date, start_time, end_time, notes):
+    return {
+        'key': key,
+        'title': title,
+        'date': workout_date,  # None when the source date cannot be parsed
+        'start_time': start_time,
+        'end_time': end_time,
+        'notes': notes,
+        'exercises': {},  # exercise title -> sets, in order of first appearance
+        'rows': 0,
+    }
+
+
+def content_hash(workout):
+    """SHA-256 over everything the import writes for a workout, to detect changed sessions on re-import."""
+    payload = [
+        workout['title'], workout['date'], workout['start_time'], workout['end_time'], workout['notes'],
+        [[name, [[s[field] for field in SET_FIELDS] for s in sets]] for name, sets in workout['exercises'].items()],
+    ]
+    return hashlib.sha256(json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def iter_lines(binary_file, chunk_size=None, encoding="utf-8"):
+    """Yield text lines from a binary file, reading and decoding it in fixed-size chunks."""
+    chunk_size = chunk_size or READ_CHUNK_SIZE
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    while True:
+        chunk = binary_file.read(chunk_size)
+        pending += decoder.decode(chunk, final=not chunk)
+        # Only split on \n: csv re-joins quoted fields that span lines
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def iter_csv_rows(binary_file, chunk_size=None):
+    """Stream an uploaded CSV as dict rows without holding the file in memory."""
+    return csv.DictReader(iter_lines(binary_file, chunk_size))
+
+
+def iter_row_groups(rows):
+    """Group CSV dict rows into per-workout lists keyed by (start_time, end_time, title).
+
+    Exports list every row of a workout contiguously, so a group is yielded as
+    soon as the key changes and only one is held in memory.
+    """
+    group, group_key = [], None
+    for row in rows:
+        key = (row['start_time'], row['end_time'], row['title'])
+        if group and key != group_key:
+            yield group
+            group = []
+        group_key = key
+        group.append(row)
+    if group:
+        yield group
+
+
+def parse_csv_workout(rows):
+    """Parse the CSV rows of one workout."""
+    first = rows[0]
+    start, end = parse_date(first['start_time']), parse_date(first['end_time'])
+    workout = _new_workout(
+        (first['start_time'], first['end_time'], first['title']), first['title'],
+        start.date() if start else None, start.time() if start else None, end.time() if end else None,
+        first.get('description', ''),
+    )
+    workout['rows'] = len(rows)
+    for row in rows:
+        ex_title = row['exercise_title']
+        if ex_title:
+            workout['exercises'].setdefault(ex_title, []).append(parse_set(row))
+    workout['content_hash'] = content_hash(workout)
+    return workout
+
+
+def iter_workouts(rows):
+    """Parse CSV dict rows into workouts, one at a time."""
+    return map(parse_csv_workout, iter_row_groups(rows))
+
+
+def iter_json_items(text_file, chunk_size=None):
+    """Stream the elements of a top-level JSON array without loading the whole document."""
+    chunk_size = chunk_size or READ_CHUNK_SIZE
+    decoder = json.JSONDecoder()
+    buffer, pos, started, eof = "", 0, False, False
+    while True:
+        # Skip whitespace, the opening bracket and separators
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == "," or (buffer[pos] == "[" and not started)):
+            started = started or buffer[pos] == "["
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        if pos < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                pos = end
+                continue
+        elif eof:
+            return
+        chunk = text_file.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def parse_json_workout(item):
+    """Parse one day of a workout JSON archive (workouts-data/workout.schema.json).
+
+    Weights are in lbs, set durations in minutes, distances and heights are
+    free text with units ("30 Yards", "18 in"). The archives carry no times,
+    so the workout is keyed by its date alone.
+    """
+    workout_date = None
+    try:
+        workout_date = datetime.strptime(item.get('date', ''), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        pass
+
+    exercises = []
+    for entry in item.get('exercises', []):
+        exercises.extend(entry['superset'] if 'superset' in entry else [entry])
+    title = next((ex.get('category') for ex in exercises if ex.get('category')), "")
+    workout = _new_workout((item.get('date'),), title, workout_date, None, None, item.get('notes', ''))
+
+    for ex in exercises:
+        ex_title = ex.get('name')
+        if not ex_title:
+            continue
+        sets = workout['exercises'].setdefault(ex_title, [])
+        for s in ex.get('sets', []):
+            duration_minutes = parse_float(s.get('duration'))
+            sets.append(_build_set(
+                len(sets) + 1,
+                ex_title,
+                s.get('weight'),
+                _parse_measure(s.get('distance'), DISTANCE_UNITS_M, MILES_TO_M),
+                parse_int(s.get('reps')),
+                round(duration_minutes * 60) if duration_minutes else None,
+                ex.get('notes', ''),
+                _parse_measure(s.get('height'), HEIGHT_UNITS_CM, 1.0),
+            ))
+            workout['rows'] += 1
+    workout['content_hash'] = content_hash(workout)
+    return workout
+
+
+def _parse_chunk(parse, items):
+    return [parse(item) for item in items]
+
+
+def parallel_map(parse, items, workers=1, chunk_size=None):
+    """Apply ``parse`` to ``items`` in order, across ``workers`` processes when > 1.
+
+    Unlike Executor.map this only keeps a few chunks in flight, so a stream
+    of items is never read far ahead of the loader.
+    """
+    if workers <= 1:
+        yield from map(parse, items)
+        return
+
+    chunk_size = chunk_size or PARSE_CHUNK_WORKOUTS
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                in_flight.append(executor.submit(_parse_chunk, parse, chunk))
+                chunk = []
+                if len(in_flight) >= workers * 2:
+                    yield from in_flight.popleft().result()
+        if chunk:
+            in_flight.append(executor.submit(_parse_chunk, parse, chunk))
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def parse_workouts(rows):
+    """Parse every row at once; returns ``(workouts, skipped_details)``."""
+    parsed, skipped_details = [], []
+    for workout in iter_workouts(rows):
+        if workout['date'] is None:
+            skipped_details.append(f"Invalid date for {workout['key']}")
+        else:
+            parsed.append(workout)
+    return parsed, skipped_details
+
+
+# --- Loading ---
+
+def _copy_value(value):
+    """Encode a value for COPY ... FROM STDIN in text format."""
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _stage_workouts(cursor, workouts):
+    cursor.execute("""
+        CREATE TEMP TABLE import_workouts (
+            workout_key INTEGER PRIMARY KEY,
+            title TEXT,
+            date DATE NOT NULL,
+            start_time TIME,
+            end_time TIME,
+            notes TEXT,
+            content_hash CHAR(64) NOT NULL,
+            workout_id INTEGER,
+            -- TRUE when workout_id is an existing workout whose content changed
+            is_update BOOLEAN NOT NULL DEFAULT FALSE
+        ) ON COMMIT DROP
+    """)
+    cursor.execute("""
+        CREATE TEMP TABLE import_sets (
+            workout_key INTEGER NOT NULL,
+            exercise_seq INTEGER NOT NULL,
+            exercise_name TEXT NOT NULL,
+            set_number INTEGER,
+            weight_kg NUMERIC(6, 2),
+            reps INTEGER,
+            distance_m NUMERIC(7, 2),
+            duration_seconds INTEGER,
+            height_cm NUMERIC(5, 2),
+            notes TEXT
+        ) ON COMMIT DROP
+    """)
+
+    _copy_rows(cursor, "import_workouts", ("workout_key", "title", "date", "start_time", "end_time", "notes", "content_hash"), (
+        (key, w['title'], w['date'], w['start_time'], w['end_time'], w['notes'], w['content_hash'])
+        for key, w in enumerate(workouts)
+    ))
+    _copy_rows(cursor, "import_sets", (
+        "workout_key", "exercise_seq", "exercise_name", "set_number",
+        "weight_kg", "reps", "distance_m", "duration_seconds", "height_cm", "notes",
+    ), (
+        (key, seq, ex_name, s['set_number'], s['weight_kg'], s['reps'], s['distance_m'], s['duration_seconds'],
+         s['height_cm'], s['notes'])
+        for key, w in enumerate(workouts)
+        for seq, (ex_name, sets) in enumerate(w['exercises'].items(), start=1)
+        for s in sets
+    ))
+
+
+def _skip_detail(title, d, t, reason):
+    when = f"{d:%Y-%m-%d} {t:%H:%M}" if t else f"{d:%Y-%m-%d}"
+    return f"Skipped {when} \"{title}\": {reason}"
+
+
+def load_workouts(cursor, workouts, user_id=1):
+    """Insert new workouts for ``user_id``, update changed ones in place and skip the rest.
+
+    A session is keyed by (user_id, date, start_time). An existing imported
+    session whose content_hash matches is left alone; one whose hash differs
+    gets its notes/end time updated and its exercises and sets replaced.
+    Sessions logged in the app (content_hash NULL) are never rewritten: an
+    upload row that only matches one of those is skipped. Runs inside the
+    caller's transaction; returns ``(imported, updated, skipped_details)``.
+    """
+    _stage_workouts(cursor, workouts)
+
+    # One anti-join against the existing sessions for the whole batch; the
+    # window also drops repeats of a session within the upload itself
+    cursor.execute("""
+        DELETE FROM import_workouts iw
+        USING (
+            SELECT c.workout_key,
+                   CASE WHEN c.occurrence > 1 THEN 'repeated'
+                        WHEN imported.content_hash = c.content_hash THEN 'unchanged'
+                        ELSE 'app' END AS reason,
+                   COALESCE(imported.id, app.id) AS existing_id
+            FROM (
+                SELECT workout_key, date, start_time, content_hash,
+                       row_number() OVER (PARTITION BY date, start_time ORDER BY workout_key) AS occurrence
+                FROM import_workouts
+            ) c
+            LEFT JOIN workouts imported
+                ON imported.user_id = %s AND imported.date = c.date
+                AND imported.start_time IS NOT DISTINCT FROM c.start_time AND imported.content_hash IS NOT NULL
+            CROSS JOIN LATERAL (
+                SELECT min(w.id) AS id FROM workouts w
+                WHERE w.user_id = %s AND w.date = c.date
+                AND w.start_time IS NOT DISTINCT FROM c.start_time AND w.content_hash IS NULL
+            ) app
+            WHERE c.occurrence > 1 OR imported.content_hash = c.content_hash
+               OR (imported.id IS NULL AND app.id IS NOT NULL)
+        ) dup
+        WHERE iw.workout_key = dup.workout_key
+        RETURNING iw.workout_key, iw.title, iw.date, iw.start_time, dup.reason, dup.existing_id
+    """, (user_id, user_id))
+    skip_reasons = {
+        'repeated': "repeated in this upload",
+        'unchanged': "unchanged since import as workout {}",
+        'app': "logged in app as workout {}",
+    }
+    skipped = [
+        (key, _skip_detail(title, d, t, skip_reasons[reason].format(existing_id)))
+        for key, title, d, t, reason, existing_id in cursor.fetchall()
+    ]
+
+    # Whatever still matches an imported session has changed: rewrite it in
+    # place. Sessions logged in the app are never touched.
+    cursor.execute("""
+        UPDATE import_workouts iw SET workout_id = w.id, is_update = TRUE
+        FROM workouts w
+        WHERE w.user_id = %s AND w.date = iw.date AND w.start_time IS NOT DISTINCT FROM iw.start_time
+        AND w.content_hash IS NOT NULL
+    """, (user_id,))
+    updated = cursor.rowcount
+    if updated:
+        cursor.execute("""
+            UPDATE workouts w
+            SET end_time = iw.end_time, notes = iw.notes, content_hash = iw.content_hash
+            FROM import_workouts iw
+            WHERE iw.is_update AND w.id = iw.workout_id
+        """)
+        cursor.execute("""
+            DELETE FROM workout_sets ws
+            USING workout_exercises we, import_workouts iw
+            WHERE iw.is_update AND we.workout_id = iw.workout_id AND ws.workout_exercise_id = we.id
+        """)
+        cursor.execute("""
+            DELETE FROM workout_exercises we
+            USING import_workouts iw
+            WHERE iw.is_update AND we.workout_id = iw.workout_id
+        """)
+
+    # Reserve ids up front so children can be inserted with plain INSERT ... SELECT
+    cursor.execute("UPDATE import_workouts SET workout_id = nextval(pg_get_serial_sequence('workouts', 'id')) WHERE NOT is_update")
+    # A session inserted concurrently since the anti-join loses the race quietly
+    # and is dropped from the staging table along with its sets
+    cursor.execute("""
+        WITH inserted AS (
+            INSERT INTO workouts (id, user_id, date, start_time, end_time, notes, content_hash)
+            SELECT workout_id, %s, date, start_time, end_time, notes, content_hash FROM import_workouts
+            WHERE NOT is_update
+            ON CONFLICT (user_id, date, start_time) WHERE content_hash IS NOT NULL DO NOTHING
+            RETURNING id
+        )
+        DELETE FROM import_workouts iw
+        WHERE NOT iw.is_update AND NOT EXISTS (SELECT 1 FROM inserted WHERE inserted.id = iw.workout_id)
+        RETURNING iw.workout_key, iw.title, iw.date, iw.start_time
+    """, (user_id,))
+    skipped += [(key, _skip_detail(title, d, t, "imported concurrently")) for key, title, d, t in cursor.fetchall()]
+    cursor.execute("SELECT count(*) FROM import_workouts WHERE NOT is_update")
+    imported = cursor.fetchone()[0]
+    skipped_details = [detail for _, detail in sorted(skipped)]
+
+    # Only write exercises when a name is new: even an INSERT that adds no rows
+    # fires the statement trigger bumping the exercise_catalog version, which
+    # would invalidate every catalog cache and ETag on each batch
+    cursor.execute("""
+        SELECT DISTINCT s.exercise_name
+        FROM import_sets s
+        JOIN import_workouts iw USING (workout_key)
+        WHERE NOT EXISTS (SELECT 1 FROM exercises e WHERE e.name = s.exercise_name)
+    """)
+    new_names = [name for name, in cursor.fetchall()]
+    if new_names:
+        cursor.execute("INSERT INTO exercises (name) SELECT unnest(%s::text[]) ON CONFLICT (name) DO NOTHING", (new_names,))
+
+    cursor.execute("""
+        CREATE TEMP TABLE import_workout_exercises ON COMMIT DROP AS
+        SELECT DISTINCT s.workout_key, s.exercise_seq, iw.workout_id, e.id AS exercise_id, NULL::INTEGER AS id
+        FROM import_sets s
+        JOIN import_workouts iw USING (workout_key)
+        JOIN exercises e ON e.name = s.exercise_name
+    """)
+    cursor.execute("UPDATE import_workout_exercises SET id = nextval(pg_get_serial_sequence('workout_exercises', 'id'))")
+    cursor.execute("""
+        INSERT INTO workout_exercises (id, workout_id, exercise_id, sequence)
+        SELECT id, workout_id, exercise_id, exercise_seq FROM import_workout_exercises
+    """)
+    cursor.execute("""
+        INSERT INTO workout_sets (workout_exercise_id, set_number, weight_kg, reps, distance_m, duration_seconds, height_cm, notes)
+        SELECT iwe.id, s.set_number, s.weight_kg, s.reps, s.distance_m, s.duration_seconds, s.height_cm, s.notes
+        FROM import_sets s
+        JOIN import_workout_exercises iwe USING (workout_key, exercise_seq)
+        ORDER BY iwe.id, s.set_number
+    """)
+    return imported, updated, skipped_details
+
+
+def _iter_batches(workouts, batch_rows):
+    batch, batch_row_count = [], 0
+    for workout in workouts:
+        batch.append(workout)
+        batch_row_count += workout['rows']
+        if batch_row_count >= batch_rows:
+            yield batch
+            batch, batch_row_count = [], 0
+    if batch:
+        yield batch
+
+
+def load_batches(conn, workouts, user_id=1, batch_rows=None):
+    """Load parsed workouts in bounded batches, committing and yielding progress after each.
+
+    Each progress dict carries running totals plus the skip details of that
+    batch. Memory is bounded by the batch size, not by the size of the source.
+    """
+    totals = {"batch": 0, "rows": 0, "imported": 0, "updated": 0, "skipped": 0}
+    cursor = conn.cursor()
+    try:
+        for batch in _iter_batches(workouts, batch_rows or IMPORT_BATCH_ROWS):
+            valid = [w for w in batch if w['date'] is not None]
+            skipped_details = [f"Invalid date for {w['key']}" for w in batch if w['date'] is None]
+            imported = updated = 0
+            if valid:
+                imported, updated, skipped = load_workouts(cursor, valid, user_id)
+                skipped_details += skipped
+            conn.commit()
+
+            totals["batch"] += 1
+            totals["rows"] += sum(w['rows'] for w in batch)
+            totals["imported"] += imported
+            totals["updated"] += updated
+            totals["skipped"] += len(skipped_details)
+            yield {**totals, "skipped_details": skipped_details}
+
+        if totals["imported"] or totals["updated"]:
+            # Cheaper to recompute every summary once than per set
+            cursor.execute("SELECT rebuild_exercise_summaries()")
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def import_batches(conn, rows, user_id=1, batch_rows=None):
+    """``load_batches`` over CSV dict rows."""
+    return load_batches(conn, iter_workouts(rows), user_id, batch_rows)
+
+
+def import_rows(conn, rows, user_id=1, batch_rows=None):
+    """Run a whole import and return the combined report."""
+    result = {"imported": 0, "updated": 0, "skipped": 0, "skipped_details": [], "batches": 0, "rows": 0}
+    for progress in import_batches(conn, rows, user_id, batch_rows):
+        result["skipped_details"] += progress["skipped_details"]
+        result.update(imported=progress["imported"], updated=progress["updated"], skipped=progress["skipped"],
+                      batches=progress["batch"], rows=progress["rows"])
+    return result
+
+
+def seed_exercise_muscles(cursor, groups=None):
+    """Create the muscles and exercises in ``groups`` and link them, in three statements."""
+    groups = groups or EXERCISE_MUSCLE_GROUPS
+    pairs = [(exercise, muscle) for exercise, muscles in groups.items() for muscle in muscles]
+    cursor.execute("INSERT INTO muscles (name) SELECT DISTINCT unnest(%s::text[]) ON CONFLICT (name) DO NOTHING",
+                   (sorted({muscle for _, muscle in pairs}),))
+    cursor.execute("INSERT INTO exercises (name) SELECT unnest(%s::text[]) ON CONFLICT (name) DO NOTHING",
+                   (list(groups),))
+    cursor.execute("""
+        INSERT INTO exercise_muscles (exercise_id, muscle_id)
+        SELECT e.id, m.id
+        FROM unnest(%s::text[], %s::text[]) AS p(exercise_name, muscle_name)
+        JOIN exercises e ON e.name = p.exercise_name
+        JOIN muscles m ON m.name = p.muscle_name
+        ON CONFLICT (exercise_id, muscle_id) DO NOTHING
+    """, ([exercise for exercise, _ in pairs], [muscle for _, muscle in pairs]))
+
+
+# --- CLI ---
+
+def iter_source_workouts(path, workers=1):
+    """Stream parsed workouts from a CSV export or a JSON archive, chosen by extension."""
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from parallel_map(parse_json_workout, iter_json_items(f), workers)
+    else:
+        with open(path, "rb") as f:
+            yield from parallel_map(parse_csv_workout, iter_row_groups(iter_csv_rows(f)), workers)
+
+
+def get_db_connection():
+    # Default env vars (docker-compose provides its own)
+    return psycopg2.connect(
+        dbname=os.environ.get("DB_NAME", "workouts"),
+        user=os.environ.get("DB_USER", "user"),
+        password=os.environ.get("DB_PASSWORD", "password"),
+        host=os.environ.get("DB_HOST", "localhost"),
+        port=os.environ.get("DB_PORT", "5432")
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load Hevy-style CSV exports and workout JSON archives.")
+    parser.add_argument("sources", nargs="+", help="CSV or .json files, loaded in the given order")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="parse processes (default: one per CPU, 1 parses in-process)")
+    parser.add_argument("--batch-rows", type=int, default=IMPORT_BATCH_ROWS)
+    parser.add_argument("--seed-muscles", action="store_true",
+                        help="create the muscles/exercises in EXERCISE_MUSCLE_GROUPS and link them first")
+    parser.add_argument("--truncate", action="store_true",
+                        help="delete all workouts and exercises (and routine entries using them) before loading; normally unnecessary, "
+                             "re-imports only touch new or changed sessions")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if args.truncate:
+            # DELETE rather than TRUNCATE ... RESTART IDENTITY: the row triggers
+            # record sync tombstones and ids are never reused, so /sync clients
+            # drop the old rows instead of mistaking new ones for them.
+            # Children go first so each tombstone can still find its owner.
+            for table in ("workout_sets", "workout_exercises", "workouts",
+                          "routine_exercises", "exercise_muscles", "exercises"):
+                cursor.execute(f"DELETE FROM {table}")
+        if args.seed_muscles:
+            seed_exercise_muscles(cursor)
+        conn.commit()
+
+        for path in args.sources:
+            started = time.perf_counter()
+            progress = {"rows": 0, "imported": 0, "updated": 0, "skipped": 0}
+            for progress in load_batches(conn, iter_source_workouts(path, args.workers), args.user_id, args.batch_rows):
+                for detail in progress["skipped_details"]:
+                    print(f"  {detail}")
+                print(f"{path}: batch {progress['batch']}, {progress['rows']} rows, {progress['imported']} imported, "
+                      f"{progress['updated']} updated, {progress['skipped']} skipped")
+            print(f"{path}: done in {time.perf_counter() - started:.1f}s ({progress['imported']} imported, "
+                  f"{progress['updated']} updated, {progress['skipped']} skipped)")
+    except Exception as e:
+        conn.rollback()
+        print(f"FAILED: {e}")
+        return 1
+    finally:
+        cursor.close()
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
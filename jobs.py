@@ -0,0 +1,110 @@
+"""Background CSV import jobs.
+
+Uploads are copied to a temp file and imported by a small in-process thread
+pool, so the request returns as soon as the file is on disk. Progress is
+written to the import_jobs table after every committed batch; jobs left
+queued or running by a previous process are marked failed on startup.
+"""
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import importer
+from db import db_connection
+
+IMPORT_JOB_WORKERS = int(os.environ.get("IMPORT_JOB_WORKERS", "1"))
+UPLOAD_COPY_CHUNK_SIZE = 1024 * 1024
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMPORT_JOB_WORKERS, thread_name_prefix="import-job")
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def fail_interrupted_jobs():
+    """Jobs run in-process, so anything still queued or running belongs to a dead worker."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE import_jobs
+            SET status = 'failed', finished_at = CURRENT_TIMESTAMP,
+                errors = errors || '["Interrupted by a server restart"]'::jsonb
+            WHERE status IN ('queued', 'running')
+        """)
+        conn.commit()
+        cursor.close()
+
+
+def enqueue_import(upload, filename=None, user_id=1):
+    """Copy an upload (binary file object) to disk, record a queued job and start it; returns the job id."""
+    fd, path = tempfile.mkstemp(prefix="workout-import-", suffix=".csv")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(upload, f, UPLOAD_COPY_CHUNK_SIZE)
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO import_jobs (user_id, filename) VALUES (%s, %s) RETURNING id",
+                (user_id, filename)
+            )
+            job_id = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+    except Exception:
+        os.remove(path)
+        raise
+
+    _get_executor().submit(_run_import, job_id, path, user_id)
+    return job_id
+
+
+def _run_import(job_id, path, user_id):
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE import_jobs SET status = 'running', started_at = CURRENT_TIMESTAMP WHERE id = %s",
+                (job_id,)
+            )
+            conn.commit()
+            try:
+                with open(path, "rb") as f:
+                    # import_batches has committed the batch by the time it yields
+                    for progress in importer.import_batches(conn, importer.iter_csv_rows(f), user_id):
+                        cursor.execute("""
+                            UPDATE import_jobs
+                            SET rows_processed = %s, batches = %s, workouts_imported = %s, workouts_updated = %s,
+                                workouts_skipped = %s, skipped_details = skipped_details || %s::jsonb
+                            WHERE id = %s
+                        """, (progress["rows"], progress["batch"], progress["imported"], progress["updated"], progress["skipped"],
+                              json.dumps(progress["skipped_details"]), job_id))
+                        conn.commit()
+                status, errors = "succeeded", []
+            except Exception as e:
+                conn.rollback()
+                status, errors = "failed", [str(e)]
+            cursor.execute("""
+                UPDATE import_jobs
+                SET status = %s, finished_at = CURRENT_TIMESTAMP, errors = errors || %s::jsonb
+                WHERE id = %s
+            """, (status, json.dumps(errors), job_id))
+            conn.commit()
+            cursor.close()
+    except Exception as e:
+        print(f"Import job {job_id} could not record its status: {e}")
+    finally:
+        os.remove(path)
+
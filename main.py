@@ -1,25 +1,56 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Union
 import psycopg2
 import psycopg2.extras
 import os
 from datetime import date, time, datetime, timedelta
-import httpx
 import base64
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from dotenv import load_dotenv
 from fastapi import UploadFile, File
 import csv
 import io
+import json
+from contextlib import asynccontextmanager, suppress
+from collections import defaultdict
+import asyncio
 
 load_dotenv()
 
-load_dotenv()
+import importer
+import jobs
+import fitbit
+import heartrate
+from catalog import exercise_catalog
+import versions
+from db import pool, db_connection, PoolTimeout, open_async_pool, close_async_pool, acquire_async_connection, release_async_connection, async_db_connection
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool.open()
+    await open_async_pool()
+    await fitbit.open_client()
+    token_refresher = asyncio.create_task(_fitbit_token_refresher())
+    try:
+        jobs.fail_interrupted_jobs()
+    except Exception as e:
+        # import_jobs comes from migrations/004; the API should still start without it
+        print(f"Could not reset interrupted import jobs: {e}")
+    yield
+    jobs.shutdown()
+    token_refresher.cancel()
+    with suppress(asyncio.CancelledError):
+        await token_refresher
+    await fitbit.close_client()
+    await close_async_pool()
+    pool.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +58,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Mount static files
@@ -199,15 +231,65 @@ class SuggestedWorkout(BaseModel):
 
 
 # Database connection
-def get_db_connection():
-    conn = psycopg2.connect(
-        dbname=os.environ.get("DB_NAME"),
-        user=os.environ.get("DB_USER"),
-        password=os.environ.get("DB_PASSWORD"),
-        host=os.environ.get("DB_HOST"),
-        port=os.environ.get("DB_PORT")
-    )
-    return conn
+def get_db():
+    """FastAPI dependency yielding a pooled connection for the duration of a request."""
+    try:
+        with db_connection() as conn:
+            yield conn
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+async def get_async_db():
+    """Async counterpart of get_db, yielding an asyncpg connection."""
+    try:
+        conn = await acquire_async_connection()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        yield conn
+    finally:
+        await release_async_connection(conn)
+
+# --- Conditional GETs ---
+# Read-mostly routes carry a strong ETag built from the table_versions counters
+# their body depends on. A matching If-None-Match is answered with 304 after a
+# single version lookup, before the route loads or serializes anything.
+
+READ_CACHE_CONTROL = "private, no-cache"
+
+def _if_none_match(request):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+def _apply_etag(request, response, etag):
+    if etag is None:
+        return
+    headers = {"ETag": etag, "Cache-Control": READ_CACHE_CONTROL}
+    matches = _if_none_match(request)
+    if etag in matches or "*" in matches:
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+def etag_for(*version_names):
+    """Route dependency answering 304 when the client's copy is current, else tagging the response."""
+    def check(request: Request, response: Response, conn=Depends(get_db)):
+        _apply_etag(request, response, versions.make_etag(versions.get_versions(conn, version_names)))
+    return Depends(check)
+
+def async_etag_for(*version_names):
+    """etag_for for routes running on the asyncpg pool."""
+    async def check(request: Request, response: Response, conn=Depends(get_async_db)):
+        _apply_etag(request, response, versions.make_etag(await versions.fetch_versions(conn, version_names)))
+    return Depends(check)
+
+async def _workout_etag(workout_id: int, request: Request, response: Response, conn=Depends(get_async_db)):
+    """ETag of /workouts/{id}: the workout's own version plus the exercise catalog counter."""
+    catalog = await versions.fetch_versions(conn, [versions.EXERCISE_CATALOG])
+    version = await versions.fetch_workout_version(conn, workout_id)
+    if catalog and version is not None:
+        _apply_etag(request, response, versions.make_etag({**catalog, "workout": version}))
 
 
 
@@ -218,9 +300,8 @@ def read_root():
     return {"Hello": "World"}
 
 @app.post("/users/", response_model=User)
-def create_user(user: User):
+def create_user(user: User, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO users (username, email, password_hash, google_id) VALUES (%s, %s, %s, %s) RETURNING *",
@@ -229,7 +310,6 @@ def create_user(user: User):
         new_user_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return User(**new_user_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -237,9 +317,8 @@ def create_user(user: User):
 # --- Routine Exercises ---
 
 @app.post("/routine_exercises/", response_model=RoutineExercise)
-def create_routine_exercise(routine_exercise: RoutineExercise):
+def create_routine_exercise(routine_exercise: RoutineExercise, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             """INSERT INTO routine_exercises 
@@ -251,20 +330,17 @@ def create_routine_exercise(routine_exercise: RoutineExercise):
         new_re_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return RoutineExercise(**new_re_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/users/{user_id}", response_model=User)
-def get_user(user_id: int):
+def get_user(user_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
         user_data = cursor.fetchone()
         cursor.close()
-        conn.close()
         if user_data is None:
             raise HTTPException(status_code=404, detail="User not found")
         return User(**user_data)
@@ -272,22 +348,19 @@ def get_user(user_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/users/", response_model=List[User])
-def get_users():
+def get_users(conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM users")
         users_data = cursor.fetchall()
         cursor.close()
-        conn.close()
         return [User(**u) for u in users_data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/users/{user_id}", response_model=User)
-def update_user(user_id: int, user: User):
+def update_user(user_id: int, user: User, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "UPDATE users SET username = %s, email = %s, password_hash = %s, google_id = %s WHERE id = %s RETURNING *",
@@ -296,7 +369,6 @@ def update_user(user_id: int, user: User):
         updated_user_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if updated_user_data is None:
             raise HTTPException(status_code=404, detail="User not found")
         return User(**updated_user_data)
@@ -304,15 +376,13 @@ def update_user(user_id: int, user: User):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/users/{user_id}", status_code=204)
-def delete_user(user_id: int):
+def delete_user(user_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM users WHERE id = %s RETURNING id", (user_id,))
         deleted_id = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="User not found")
         return
@@ -320,9 +390,8 @@ def delete_user(user_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/body_measurements/", response_model=BodyMeasurement)
-def create_body_measurement(body_measurement: BodyMeasurement):
+def create_body_measurement(body_measurement: BodyMeasurement, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO body_measurements (user_id, date, body_weight_kg, body_fat_percentage, notes) VALUES (%s, %s, %s, %s, %s) RETURNING *",
@@ -331,20 +400,17 @@ def create_body_measurement(body_measurement: BodyMeasurement):
         new_body_measurement_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return BodyMeasurement(**new_body_measurement_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/body_measurements/{body_measurement_id}", response_model=BodyMeasurement)
-def get_body_measurement(body_measurement_id: int):
+def get_body_measurement(body_measurement_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM body_measurements WHERE id = %s", (body_measurement_id,))
         body_measurement_data = cursor.fetchone()
         cursor.close()
-        conn.close()
         if body_measurement_data is None:
             raise HTTPException(status_code=404, detail="Body measurement not found")
         return BodyMeasurement(**body_measurement_data)
@@ -352,22 +418,19 @@ def get_body_measurement(body_measurement_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/body_measurements/", response_model=List[BodyMeasurement])
-def get_body_measurements():
+def get_body_measurements(conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM body_measurements")
         body_measurements_data = cursor.fetchall()
         cursor.close()
-        conn.close()
         return [BodyMeasurement(**bm) for bm in body_measurements_data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/body_measurements/{body_measurement_id}", response_model=BodyMeasurement)
-def update_body_measurement(body_measurement_id: int, body_measurement: BodyMeasurement):
+def update_body_measurement(body_measurement_id: int, body_measurement: BodyMeasurement, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "UPDATE body_measurements SET user_id = %s, date = %s, body_weight_kg = %s, body_fat_percentage = %s, notes = %s WHERE id = %s RETURNING *",
@@ -376,7 +439,6 @@ def update_body_measurement(body_measurement_id: int, body_measurement: BodyMeas
         updated_body_measurement_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if updated_body_measurement_data is None:
             raise HTTPException(status_code=404, detail="Body measurement not found")
         return BodyMeasurement(**updated_body_measurement_data)
@@ -384,15 +446,13 @@ def update_body_measurement(body_measurement_id: int, body_measurement: BodyMeas
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/body_measurements/{body_measurement_id}", status_code=204)
-def delete_body_measurement(body_measurement_id: int):
+def delete_body_measurement(body_measurement_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM body_measurements WHERE id = %s RETURNING id", (body_measurement_id,))
         deleted_id = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="Body measurement not found")
         return
@@ -400,9 +460,8 @@ def delete_body_measurement(body_measurement_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/muscles/", response_model=Muscle)
-def create_muscle(muscle: Muscle):
+def create_muscle(muscle: Muscle, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO muscles (name) VALUES (%s) RETURNING *",
@@ -411,43 +470,37 @@ def create_muscle(muscle: Muscle):
         new_muscle_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return Muscle(**new_muscle_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/muscles/{muscle_id}", response_model=Muscle)
-def get_muscle(muscle_id: int):
+def get_muscle(muscle_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM muscles WHERE id = %s", (muscle_id,))
         muscle_data = cursor.fetchone()
         cursor.close()
-        conn.close()
         if muscle_data is None:
             raise HTTPException(status_code=404, detail="Muscle not found")
         return Muscle(**muscle_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/muscles/", response_model=List[Muscle])
-def get_muscles():
+@app.get("/muscles/", response_model=List[Muscle], dependencies=[etag_for(versions.EXERCISE_CATALOG)])
+def get_muscles(conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM muscles")
         muscles_data = cursor.fetchall()
         cursor.close()
-        conn.close()
         return [Muscle(**m) for m in muscles_data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/muscles/{muscle_id}", response_model=Muscle)
-def update_muscle(muscle_id: int, muscle: Muscle):
+def update_muscle(muscle_id: int, muscle: Muscle, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "UPDATE muscles SET name = %s WHERE id = %s RETURNING *",
@@ -456,7 +509,6 @@ def update_muscle(muscle_id: int, muscle: Muscle):
         updated_muscle_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if updated_muscle_data is None:
             raise HTTPException(status_code=404, detail="Muscle not found")
         return Muscle(**updated_muscle_data)
@@ -464,15 +516,13 @@ def update_muscle(muscle_id: int, muscle: Muscle):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/muscles/{muscle_id}", status_code=204)
-def delete_muscle(muscle_id: int):
+def delete_muscle(muscle_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM muscles WHERE id = %s RETURNING id", (muscle_id,))
         deleted_id = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="Muscle not found")
         return
@@ -480,9 +530,8 @@ def delete_muscle(muscle_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/exercise_muscles/", response_model=ExerciseMuscle)
-def create_exercise_muscle(exercise_muscle: ExerciseMuscle):
+def create_exercise_muscle(exercise_muscle: ExerciseMuscle, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO exercise_muscles (exercise_id, muscle_id, is_primary) VALUES (%s, %s, %s) RETURNING *",
@@ -491,20 +540,17 @@ def create_exercise_muscle(exercise_muscle: ExerciseMuscle):
         new_exercise_muscle_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return ExerciseMuscle(**new_exercise_muscle_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/exercise_muscles/{exercise_id}/{muscle_id}", response_model=ExerciseMuscle)
-def get_exercise_muscle(exercise_id: int, muscle_id: int):
+def get_exercise_muscle(exercise_id: int, muscle_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM exercise_muscles WHERE exercise_id = %s AND muscle_id = %s", (exercise_id, muscle_id))
         exercise_muscle_data = cursor.fetchone()
         cursor.close()
-        conn.close()
         if exercise_muscle_data is None:
             raise HTTPException(status_code=404, detail="Exercise-muscle link not found")
         return ExerciseMuscle(**exercise_muscle_data)
@@ -512,15 +558,13 @@ def get_exercise_muscle(exercise_id: int, muscle_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/exercise_muscles/{exercise_id}/{muscle_id}", status_code=204)
-def delete_exercise_muscle(exercise_id: int, muscle_id: int):
+def delete_exercise_muscle(exercise_id: int, muscle_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM exercise_muscles WHERE exercise_id = %s AND muscle_id = %s RETURNING exercise_id", (exercise_id, muscle_id))
         deleted_id = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="Exercise-muscle link not found")
         return
@@ -528,9 +572,10 @@ def delete_exercise_muscle(exercise_id: int, muscle_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/exercises/", response_model=Exercise)
-def create_exercise(exercise: Exercise):
+def create_exercise(exercise: Exercise, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
+        if exercise_catalog.id_for_name(conn, exercise.name) is not None:
+            raise HTTPException(status_code=409, detail=f"Exercise with name '{exercise.name}' already exists.")
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO exercises (name, description, type, equipment, default_tempo, tracked_metrics, default_sets, default_reps, default_rest_seconds, default_weight_percent, default_time_seconds) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING *",
@@ -549,13 +594,15 @@ def create_exercise(exercise: Exercise):
                     cursor.execute("INSERT INTO exercise_muscles (exercise_id, muscle_id) VALUES (%s, %s)", (new_exercise_data['id'], muscle_id))
         
         conn.commit()
+        exercise_catalog.invalidate()
         
         # Refetch with muscles
         new_exercise_data['muscle_group'] = exercise.muscle_group
         
         cursor.close()
-        conn.close()
         return Exercise(**new_exercise_data)
+    except HTTPException:
+        raise
     except psycopg2.errors.UniqueViolation:
         conn.rollback()
         raise HTTPException(status_code=409, detail=f"Exercise with name '{exercise.name}' already exists.")
@@ -563,15 +610,42 @@ def create_exercise(exercise: Exercise):
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+class LastSet(BaseModel):
+    exercise_id: int
+    set_number: int
+    weight_kg: Optional[float] = None
+    reps: Optional[int] = None
+
+# Declared before /exercises/{exercise_id}/... so "last_sets" is not parsed as an id
+@app.get("/exercises/last_sets", response_model=List[LastSet])
+async def get_last_sets(exercise_ids: List[int] = Query(...), current_workout_id: Optional[int] = None, conn=Depends(get_async_db)):
+    """Previous weight/reps for every set number of several exercises in one query.
+
+    Same rule as /exercises/{exercise_id}/last_set, applied per (exercise, set_number).
+    """
+    try:
+        rows = await conn.fetch("""
+            SELECT DISTINCT ON (we.exercise_id, ws.set_number)
+                   we.exercise_id, ws.set_number, ws.weight_kg, ws.reps
+            FROM workout_exercises we
+            JOIN workouts w ON we.workout_id = w.id
+            JOIN workout_sets ws ON ws.workout_exercise_id = we.id
+            WHERE we.exercise_id = ANY($1::int[])
+              AND ($2::int IS NULL OR w.id != $2)
+            ORDER BY we.exercise_id, ws.set_number, w.date DESC, w.start_time DESC
+        """, exercise_ids, current_workout_id)
+        return [LastSet(**row) for row in rows]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 class DeleteExerciseRequest(BaseModel):
     strategy: str # "delete_all", "migrate_to_existing", "migrate_to_new"
     target_exercise_id: Optional[int] = None
     new_exercise_name: Optional[str] = None
 
 @app.get("/exercises/{exercise_id}/usage")
-def get_exercise_usage(exercise_id: int):
+def get_exercise_usage(exercise_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute("SELECT COUNT(*) FROM workout_exercises WHERE exercise_id = %s", (exercise_id,))
@@ -581,15 +655,13 @@ def get_exercise_usage(exercise_id: int):
         routine_count = cursor.fetchone()[0]
         
         cursor.close()
-        conn.close()
         return {"workout_count": workout_count, "routine_count": routine_count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/exercises/{exercise_id}/delete")
-def delete_exercise_with_migration(exercise_id: int, request: DeleteExerciseRequest):
+def delete_exercise_with_migration(exercise_id: int, request: DeleteExerciseRequest, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         
         # Validation
@@ -633,7 +705,14 @@ def delete_exercise_with_migration(exercise_id: int, request: DeleteExerciseRequ
         # Logic for migration
         if request.strategy in ["migrate_to_existing", "migrate_to_new"]:
             # Migrate Workout History
-            cursor.execute("UPDATE workout_exercises SET exercise_id = %s WHERE exercise_id = %s", (target_id, exercise_id))
+            cursor.execute("""
+                UPDATE workout_exercises we SET exercise_id = %s
+                FROM workouts w
+                WHERE we.exercise_id = %s AND w.id = we.workout_id
+                RETURNING w.user_id
+            """, (target_id, exercise_id))
+            # The source summaries go with the exercise; the target's absorb its history
+            _refresh_exercise_summary_keys(cursor, {(row['user_id'], target_id) for row in cursor.fetchall()})
             
             # Migrate Routines
             cursor.execute("UPDATE routine_exercises SET exercise_id = %s WHERE exercise_id = %s", (target_id, exercise_id))
@@ -661,8 +740,8 @@ def delete_exercise_with_migration(exercise_id: int, request: DeleteExerciseRequ
         deleted = cursor.fetchone()
         
         conn.commit()
+        exercise_catalog.invalidate()
         cursor.close()
-        conn.close()
         
         if not deleted:
             raise HTTPException(status_code=404, detail="Exercise not found or already deleted")
@@ -670,32 +749,16 @@ def delete_exercise_with_migration(exercise_id: int, request: DeleteExerciseRequ
         return {"status": "success", "migrated_to": target_id}
 
     except HTTPException:
-        if 'conn' in locals() and conn:
-            conn.rollback()
+        conn.rollback()
         raise
     except Exception as e:
-        if 'conn' in locals() and conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/exercises/{exercise_id}", response_model=Exercise)
-def get_exercise(exercise_id: int):
+@app.get("/exercises/{exercise_id}", response_model=Exercise, dependencies=[etag_for(versions.EXERCISE_CATALOG)])
+def get_exercise(exercise_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        # Fetch with muscles aggregated
-        cursor.execute("""
-            SELECT e.*, array_remove(array_agg(m.name), NULL) as muscle_group 
-            FROM exercises e 
-            LEFT JOIN exercise_muscles em ON e.id = em.exercise_id 
-            LEFT JOIN muscles m ON em.muscle_id = m.id 
-            WHERE e.id = %s
-            GROUP BY e.id
-        """, (exercise_id,))
-        
-        exercise_data = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        exercise_data = exercise_catalog.get(conn, exercise_id)
         if exercise_data is None:
             raise HTTPException(status_code=404, detail="Exercise not found")
         return Exercise(**exercise_data)
@@ -704,30 +767,16 @@ def get_exercise(exercise_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/exercises/", response_model=List[Exercise])
-def get_exercises():
+@app.get("/exercises/", response_model=List[Exercise], dependencies=[etag_for(versions.EXERCISE_CATALOG)])
+def get_exercises(conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cursor.execute("""
-            SELECT e.*, array_remove(array_agg(m.name), NULL) as muscle_group 
-            FROM exercises e 
-            LEFT JOIN exercise_muscles em ON e.id = em.exercise_id 
-            LEFT JOIN muscles m ON em.muscle_id = m.id 
-            GROUP BY e.id
-            ORDER BY e.name ASC
-        """)
-        exercises_data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return [Exercise(**e) for e in exercises_data]
+        return [Exercise(**e) for e in exercise_catalog.all(conn)]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/exercises/{exercise_id}", response_model=Exercise)
-def update_exercise(exercise_id: int, exercise: Exercise):
+def update_exercise(exercise_id: int, exercise: Exercise, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "UPDATE exercises SET name = %s, description = %s, type = %s, equipment = %s, default_tempo = %s, tracked_metrics = %s, default_sets = %s, default_reps = %s, default_rest_seconds = %s, default_weight_percent = %s, default_time_seconds = %s WHERE id = %s RETURNING *",
@@ -750,12 +799,12 @@ def update_exercise(exercise_id: int, exercise: Exercise):
                     cursor.execute("INSERT INTO exercise_muscles (exercise_id, muscle_id) VALUES (%s, %s)", (exercise_id, muscle_id))
         
         conn.commit()
+        exercise_catalog.invalidate()
         
         # Set for return
         updated_exercise_data['muscle_group'] = exercise.muscle_group
         
         cursor.close()
-        conn.close()
         if updated_exercise_data is None:
             raise HTTPException(status_code=404, detail="Exercise not found")
         return Exercise(**updated_exercise_data)
@@ -769,15 +818,14 @@ def update_exercise(exercise_id: int, exercise: Exercise):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/exercises/{exercise_id}", status_code=204)
-def delete_exercise(exercise_id: int):
+def delete_exercise(exercise_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM exercises WHERE id = %s RETURNING id", (exercise_id,))
         deleted_id = cursor.fetchone()
         conn.commit()
+        exercise_catalog.invalidate()
         cursor.close()
-        conn.close()
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="Exercise not found")
         return
@@ -785,9 +833,8 @@ def delete_exercise(exercise_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/routines/", response_model=Routine)
-def create_routine(routine: Routine):
+def create_routine(routine: Routine, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO routines (user_id, name, description, is_active) VALUES (%s, %s, %s, %s) RETURNING *",
@@ -796,7 +843,6 @@ def create_routine(routine: Routine):
         new_routine_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return Routine(**new_routine_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -821,30 +867,26 @@ def _fetch_routine_details(cursor, routine_data):
     return routine
 
 @app.get("/routines/{routine_id}", response_model=Routine)
-def get_routine(routine_id: int):
+def get_routine(routine_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM routines WHERE id = %s", (routine_id,))
         routine_data = cursor.fetchone()
         
         if routine_data is None:
             cursor.close()
-            conn.close()
             raise HTTPException(status_code=404, detail="Routine not found")
             
         routine = _fetch_routine_details(cursor, routine_data)
         
         cursor.close()
-        conn.close()
         return Routine(**routine)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/routines/", response_model=List[Routine])
-def get_routines():
+@app.get("/routines/", response_model=List[Routine], dependencies=[etag_for(versions.ROUTINES)])
+def get_routines(conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM routines")
         routines_data = cursor.fetchall()
@@ -854,15 +896,13 @@ def get_routines():
             routines.append(_fetch_routine_details(cursor, r_data))
             
         cursor.close()
-        conn.close()
         return [Routine(**r) for r in routines]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/routines/{routine_id}", response_model=Routine)
-def update_routine(routine_id: int, routine: Routine):
+def update_routine(routine_id: int, routine: Routine, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "UPDATE routines SET user_id = %s, name = %s, description = %s, is_active = %s WHERE id = %s RETURNING *",
@@ -871,7 +911,6 @@ def update_routine(routine_id: int, routine: Routine):
         updated_routine_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if updated_routine_data is None:
             raise HTTPException(status_code=404, detail="Routine not found")
         return Routine(**updated_routine_data)
@@ -879,15 +918,13 @@ def update_routine(routine_id: int, routine: Routine):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/routines/{routine_id}", status_code=204)
-def delete_routine(routine_id: int):
+def delete_routine(routine_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM routines WHERE id = %s RETURNING id", (routine_id,))
         deleted_id = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="Routine not found")
         return
@@ -895,9 +932,8 @@ def delete_routine(routine_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/routines/{routine_id}/activate")
-def activate_routine(routine_id: int):
+def activate_routine(routine_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         # Set all to false
         cursor.execute("UPDATE routines SET is_active = FALSE")
@@ -905,180 +941,133 @@ def activate_routine(routine_id: int):
         cursor.execute("UPDATE routines SET is_active = TRUE WHERE id = %s", (routine_id,))
         conn.commit()
         cursor.close()
-        conn.close()
         return {"status": "success"}
     except Exception as e:
          raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/workouts/import")
-async def import_workouts_csv(file: UploadFile = File(...)):
+def _import_progress_lines(rows):
+    # Owns its connection like _export_workouts, since it runs while the response streams
     try:
-        contents = await file.read()
-        decoded = contents.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(decoded))
-        
-        workouts = {}
-        for row in csv_reader:
-            start_str = row['start_time']
-            end_str = row['end_time']
-            title = row['title']
-            
-            workout_key = (start_str, end_str, title)
-            
-            if workout_key not in workouts:
-                # Helper to parse date
-                start_dt = None
-                if start_str:
-                    try:
-                        start_dt = datetime.strptime(start_str, "%d %b %Y, %H:%M") 
-                    except ValueError:
-                        pass # Handle error or skip
-                        
-                end_dt = None
-                if end_str:
-                     try:
-                        end_dt = datetime.strptime(end_str, "%d %b %Y, %H:%M")
-                     except ValueError:
-                        pass
-
-                workouts[workout_key] = {
-                    'start': start_dt,
-                    'end': end_dt,
-                    'title': title,
-                    'note': row.get('description', ''),
-                    'exercises': {} 
-                }
-            
-            ex_title = row['exercise_title']
-            if not ex_title:
-                continue
-
-            if ex_title not in workouts[workout_key]['exercises']:
-                workouts[workout_key]['exercises'][ex_title] = []
-
-            # Parse Set Data
-            weight_lbs = row.get('weight_lbs')
-            distance = row.get('distance_miles') 
-            
-            if 'sled' in ex_title.lower() and not weight_lbs and distance:
-                weight_lbs = distance
-                distance = None 
+        with db_connection() as conn:
+            for batch_progress in importer.import_batches(conn, rows, user_id=1):
+                yield json.dumps(batch_progress) + "\n"
+        yield json.dumps({"status": "success"}) + "\n"
+    except Exception as e:
+        yield json.dumps({"status": "error", "detail": str(e)}) + "\n"
 
-            weight_kg = None
-            if weight_lbs:
-                try:
-                    weight_kg = round(float(weight_lbs) * 0.45359237, 2)
-                except ValueError:
-                    pass
-            
-            reps = row.get('reps')
-            reps = int(reps) if reps else None
-            
-            dist_m = float(distance) * 1609.34 if distance else None
-            
-            duration = row.get('duration_seconds')
-            duration = int(duration) if duration else None
-
-            set_data = {
-                'set_index': row.get('set_index'),
-                'weight_kg': weight_kg,
-                'reps': reps,
-                'distance_m': dist_m,
-                'duration_seconds': duration,
-                'notes': row.get('exercise_notes', '') 
-            }
-            workouts[workout_key]['exercises'][ex_title].append(set_data)
-
-        # Import into DB
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        imported_count = 0
-        skipped_count = 0
-        skipped_details = []
-        
+@app.post("/workouts/import")
+def import_workouts_csv(file: UploadFile = File(...), progress: bool = False, background: bool = False):
+    """Import a Hevy-style CSV export, parsed straight from the spooled upload and loaded in batches.
+
+    With ``progress=true`` the response is NDJSON: one line per committed batch
+    (running totals plus that batch's skip details), then a final status line.
+    With ``background=true`` the file is queued as a job and its id returned
+    at once; poll GET /jobs/{job_id} for progress.
+    """
+    if background:
         try:
-            for w_key, w_data in workouts.items():
-                start_dt = w_data['start']
-                if not start_dt:
-                    skipped_details.append(f"Invalid date for {w_key}")
-                    skipped_count += 1
-                    continue
-                    
-                formatted_date = start_dt.strftime("%Y-%m-%d")
-                
-                # Check for existing workout
-                # We define "existing" as same start date and same User (ID 1 for now)
-                cursor.execute("SELECT id FROM workouts WHERE date = %s AND user_id = 1", (formatted_date,))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    skipped_details.append(f"Skipped {formatted_date}, ID: {existing[0]}")
-                    skipped_count += 1
-                    continue # Skip if exists
-                
-                formatted_time = start_dt.strftime("%H:%M:%S")
-                
-                cursor.execute("""
-                    INSERT INTO workouts (user_id, date, start_time, end_time, notes)
-                    VALUES (1, %s, %s, %s, %s)
-                    RETURNING id
-                """, (formatted_date, formatted_time, w_data['end'], w_data['note']))
-                workout_id = cursor.fetchone()[0]
-                
-                seq_counter = 0
-                for ex_name, sets in w_data['exercises'].items():
-                    seq_counter += 1
-                    
-                    cursor.execute("SELECT id FROM exercises WHERE name = %s", (ex_name,))
-                    res = cursor.fetchone()
-                    if res:
-                        ex_id = res[0]
-                    else:
-                        cursor.execute("INSERT INTO exercises (name) VALUES (%s) RETURNING id", (ex_name,))
-                        ex_id = cursor.fetchone()[0]
-                    
-                    cursor.execute("""
-                        INSERT INTO workout_exercises (workout_id, exercise_id, sequence)
-                        VALUES (%s, %s, %s)
-                        RETURNING id
-                    """, (workout_id, ex_id, seq_counter))
-                    we_id = cursor.fetchone()[0]
-                    
-                    sets.sort(key=lambda x: int(x['set_index']) if x['set_index'] else 0)
-                    
-                    for s in sets:
-                        set_num = int(s['set_index']) + 1 if s['set_index'] is not None else 1
-                        
-                        try:
-                            cursor.execute("""
-                                INSERT INTO workout_sets (workout_exercise_id, set_number, weight_kg, reps, distance_m, duration_seconds, notes)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                            """, (we_id, set_num, s['weight_kg'], s['reps'], s['distance_m'], s['duration_seconds'], s['notes']))
-                        except Exception as e:
-                            print(f"Error inserting set: {e}")
-                            pass
-
-                imported_count += 1
-            
-            conn.commit()
-            return {"status": "success", "imported": imported_count, "skipped": skipped_count, "skipped_details": skipped_details}
-            
+            job_id = jobs.enqueue_import(file.file, filename=file.filename, user_id=1)
         except Exception as e:
-            conn.rollback()
-            raise HTTPException(status_code=500, detail=str(e))
-        finally:
-            cursor.close()
-            conn.close()
+            raise HTTPException(status_code=500, detail=f"Error queueing import: {str(e)}")
+        return {"status": "queued", "job_id": job_id}
 
+    rows = importer.iter_csv_rows(file.file)
+    if progress:
+        return StreamingResponse(_import_progress_lines(rows), media_type="application/x-ndjson")
+
+    try:
+        with db_connection() as conn:
+            result = importer.import_rows(conn, rows, user_id=1)
+        return {"status": "success", **result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
 
-@app.get("/routines/active/schedule", response_model=List[RoutineDayResponse])
-def get_active_routine_schedule(user_id: int = 1):
+class ImportJob(BaseModel):
+    id: int
+    user_id: int
+    filename: Optional[str] = None
+    status: str
+    rows_processed: int
+    batches: int
+    workouts_imported: int
+    workouts_updated: int = 0
+    workouts_skipped: int
+    skipped_details: List[str] = []
+    errors: List[str] = []
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+@app.get("/jobs/{job_id}", response_model=ImportJob)
+def get_import_job(job_id: int, conn=Depends(get_db)):
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cursor.execute("SELECT * FROM import_jobs WHERE id = %s", (job_id,))
+        job = cursor.fetchone()
+        cursor.close()
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return ImportJob(**job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _load_routine_schedule(cursor, routine_id):
+    """Build the day -> exercise -> muscles tree for a routine in two queries."""
+    cursor.execute("SELECT * FROM routine_days WHERE routine_id = %s ORDER BY day_of_week", (routine_id,))
+    routine_days = cursor.fetchall()
+
+    days_response = []
+    days_map = {}
+    for day in routine_days:
+        day_dict = {
+            "id": day['id'],
+            "name": day['name'],
+            "day_of_week": day['day_of_week'],
+            "exercises": []
+        }
+        days_map[day['id']] = day_dict
+        days_response.append(day_dict)
+
+    if not days_map:
+        return days_response
+
+    # Exercises for every day at once, with muscles aggregated per exercise
+    cursor.execute("""
+        SELECT re.routine_day_id, e.id, e.name, re.group_name,
+               re.suggested_sets, re.suggested_reps, re.suggested_weight_percent, re.rest_period_seconds, re.tempo,
+               array_remove(array_agg(m.name), NULL) as muscle_group
+        FROM routine_exercises re
+        JOIN exercises e ON re.exercise_id = e.id
+        LEFT JOIN exercise_muscles em ON e.id = em.exercise_id
+        LEFT JOIN muscles m ON em.muscle_id = m.id
+        WHERE re.routine_day_id IN %s
+        GROUP BY re.id, e.id
+        ORDER BY re.routine_day_id, re.sequence
+    """, (tuple(days_map.keys()),))
+
+    for ex in cursor.fetchall():
+        days_map[ex['routine_day_id']]['exercises'].append({
+            "id": ex['id'],
+            "name": ex['name'],
+            "muscle_group": ex['muscle_group'] or [],
+            "sets": [], # Not relevant for schedule preview
+            "group_name": ex['group_name'],
+            "suggested_sets": ex['suggested_sets'],
+            "suggested_reps": ex['suggested_reps'],
+            "suggested_weight_percent": ex['suggested_weight_percent'],
+            "rest_period_seconds": ex['rest_period_seconds'],
+            "tempo": ex['tempo']
+        })
+
+    return days_response
+
+@app.get("/routines/active/schedule", response_model=List[RoutineDayResponse], dependencies=[etag_for(versions.ROUTINES, versions.EXERCISE_CATALOG)])
+def get_active_routine_schedule(user_id: int = 1, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         
         # 1. Get active routine
@@ -1087,59 +1076,12 @@ def get_active_routine_schedule(user_id: int = 1):
         
         if not active_routine:
             cursor.close()
-            conn.close()
             return []
             
-        # 2. Get routine days ordered
-        cursor.execute("SELECT * FROM routine_days WHERE routine_id = %s ORDER BY day_of_week", (active_routine['id'],))
-        routine_days = cursor.fetchall()
-        
-        days_response = []
-        for day in routine_days:
-            # 3. Get exercises for this day
-            cursor.execute("""
-                SELECT re.id as routine_exercise_id, e.id, e.name, re.group_name,
-                       re.suggested_sets, re.suggested_reps, re.suggested_weight_percent, re.rest_period_seconds, re.tempo
-                FROM routine_exercises re
-                JOIN exercises e ON re.exercise_id = e.id
-                WHERE re.routine_day_id = %s
-                ORDER BY re.sequence
-            """, (day['id'],))
-            exercises_data = cursor.fetchall()
-
-            exercises_list = []
-            for ex in exercises_data:
-                # Fetch muscles (could be optimized)
-                cursor.execute("""
-                    SELECT m.name
-                    FROM exercise_muscles em
-                    JOIN muscles m ON em.muscle_id = m.id
-                    WHERE em.exercise_id = %s
-                """, (ex['id'],))
-                muscles = [m['name'] for m in cursor.fetchall()]
-
-                exercises_list.append({
-                    "id": ex['id'],
-                    "name": ex['name'],
-                    "muscle_group": muscles,
-                    "sets": [], # Not relevant for schedule preview
-                    "group_name": ex['group_name'],
-                    "suggested_sets": ex['suggested_sets'],
-                    "suggested_reps": ex['suggested_reps'],
-                    "suggested_weight_percent": ex['suggested_weight_percent'],
-                    "rest_period_seconds": ex['rest_period_seconds'],
-                    "tempo": ex['tempo']
-                })
-            
-            days_response.append({
-                "id": day['id'],
-                "name": day['name'],
-                "day_of_week": day['day_of_week'],
-                "exercises": exercises_list
-            })
+        # 2. Get routine days with their exercises and muscles
+        days_response = _load_routine_schedule(cursor, active_routine['id'])
             
         cursor.close()
-        conn.close()
         
         return days_response
 
@@ -1150,9 +1092,8 @@ def get_active_routine_schedule(user_id: int = 1):
 # --- Routine Days ---
 
 @app.post("/routine_days/", response_model=RoutineDay)
-def create_routine_day(routine_day: RoutineDay):
+def create_routine_day(routine_day: RoutineDay, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO routine_days (routine_id, name, day_of_week) VALUES (%s, %s, %s) RETURNING *",
@@ -1161,20 +1102,17 @@ def create_routine_day(routine_day: RoutineDay):
         new_day_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return RoutineDay(**new_day_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/routines/{routine_id}/days", response_model=List[RoutineDay])
-def get_routine_days(routine_id: int):
+def get_routine_days(routine_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM routine_days WHERE routine_id = %s ORDER BY day_of_week", (routine_id,))
         days_data = cursor.fetchall()
         cursor.close()
-        conn.close()
         return [RoutineDay(**d) for d in days_data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1182,9 +1120,8 @@ def get_routine_days(routine_id: int):
 # --- Routine Exercises ---
 
 @app.post("/routine_exercises/", response_model=RoutineExercise)
-def create_routine_exercise(routine_exercise: RoutineExercise):
+def create_routine_exercise(routine_exercise: RoutineExercise, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             """INSERT INTO routine_exercises 
@@ -1196,52 +1133,42 @@ def create_routine_exercise(routine_exercise: RoutineExercise):
         new_re_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return RoutineExercise(**new_re_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/routine_days/{day_id}/exercises", response_model=List[RoutineExercise])
-def get_routine_day_exercises(day_id: int):
+def get_routine_day_exercises(day_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM routine_exercises WHERE routine_day_id = %s ORDER BY sequence", (day_id,))
         re_data = cursor.fetchall()
         cursor.close()
-        conn.close()
         return [RoutineExercise(**re) for re in re_data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/exercises/{exercise_id}/last_set")
-def get_last_set(exercise_id: int, set_number: int, current_workout_id: Optional[int] = None):
+async def get_last_set(exercise_id: int, set_number: int, current_workout_id: Optional[int] = None, conn=Depends(get_async_db)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        
         # Find the most recent workout for this exercise, excluding current workout
         query = """
             SELECT ws.weight_kg, ws.reps
             FROM workout_sets ws
             JOIN workout_exercises we ON ws.workout_exercise_id = we.id
             JOIN workouts w ON we.workout_id = w.id
-            WHERE we.exercise_id = %s
-              AND ws.set_number = %s
+            WHERE we.exercise_id = $1
+              AND ws.set_number = $2
         """
         params = [exercise_id, set_number]
         
         if current_workout_id:
-            query += " AND w.id != %s"
+            query += " AND w.id != $3"
             params.append(current_workout_id)
             
         query += " ORDER BY w.date DESC, w.start_time DESC LIMIT 1"
         
-        cursor.execute(query, tuple(params))
-        data = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        data = await conn.fetchrow(query, *params)
         
         if data:
             return {"weight_kg": data['weight_kg'], "reps": data['reps']}
@@ -1258,9 +1185,8 @@ class SuggestedWorkoutResponse(BaseModel):
     exercises: List[ExerciseResponse]
 
 @app.get("/workouts/suggested", response_model=Optional[SuggestedWorkoutResponse])
-def get_suggested_workout(user_id: int = 1): # Hardcoded user_id for now
+def get_suggested_workout(user_id: int = 1, conn=Depends(get_db)): # Hardcoded user_id for now
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         
         # 1. Get current day of week (0=Monday, 6=Sunday)
@@ -1283,7 +1209,6 @@ def get_suggested_workout(user_id: int = 1): # Hardcoded user_id for now
         
         if not day_data:
             cursor.close()
-            conn.close()
             return None
             
         # 3. Get exercises for this day
@@ -1318,7 +1243,6 @@ def get_suggested_workout(user_id: int = 1): # Hardcoded user_id for now
             })
             
         cursor.close()
-        conn.close()
         
         return {
             'routine_name': day_data['routine_name'],
@@ -1331,9 +1255,8 @@ def get_suggested_workout(user_id: int = 1): # Hardcoded user_id for now
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/workouts/", response_model=Workout)
-def create_workout(workout: Workout):
+def create_workout(workout: Workout, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO workouts (user_id, date, start_time, end_time, notes) VALUES (%s, %s, %s, %s, %s) RETURNING *",
@@ -1342,25 +1265,80 @@ def create_workout(workout: Workout):
         new_workout_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return Workout(**new_workout_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Columns served in workout trees; the sync and ETag bookkeeping columns
+# (content_hash, updated_at, change_txid, version) stay internal
+WORKOUT_TREE_COLUMNS = "id, user_id, date, start_time, end_time, notes"
+WORKOUT_TREE_SET_COLUMNS = ", ".join(f"ws.{c}" for c in (
+    "id", "workout_exercise_id", "set_number", "reps", "weight_kg", "duration_seconds",
+    "distance_m", "height_cm", "tempo", "notes", "completed",
+))
+
+async def _assemble_workout_trees(conn, workouts_data):
+    """Attach exercises (with muscles and tracked metrics) and their sets to each workout.
+
+    Works for one or many workouts and always costs two queries.
+    """
+    workouts = [dict(w) for w in workouts_data]
+    if not workouts:
+        return workouts
+    workout_ids = [w['id'] for w in workouts]
+
+    exercises_data = await conn.fetch("""
+        SELECT we.*, e.name as exercise_name, e.tracked_metrics, array_remove(array_agg(m.name), NULL) as muscle_group
+        FROM workout_exercises we
+        JOIN exercises e ON we.exercise_id = e.id
+        LEFT JOIN exercise_muscles em ON e.id = em.exercise_id
+        LEFT JOIN muscles m ON em.muscle_id = m.id
+        WHERE we.workout_id = ANY($1::int[])
+        GROUP BY we.id, e.name, e.tracked_metrics
+        ORDER BY we.workout_id, we.sequence
+    """, workout_ids)
+
+    sets_data = await conn.fetch(f"""
+        SELECT {WORKOUT_TREE_SET_COLUMNS}
+        FROM workout_sets ws
+        JOIN workout_exercises we ON ws.workout_exercise_id = we.id
+        WHERE we.workout_id = ANY($1::int[])
+        ORDER BY ws.workout_exercise_id, ws.set_number
+    """, workout_ids)
+
+    sets_map = {}
+    for s in sets_data:
+        sets_map.setdefault(s['workout_exercise_id'], []).append(dict(s))
+
+    exercises_map = {w_id: [] for w_id in workout_ids}
+    for ex in exercises_data:
+        # Frontend: `WorkoutExercise` has `exercise: Exercise`.
+        full_ex_obj = {
+            "id": ex['exercise_id'],
+            "name": ex['exercise_name'],
+            "muscle_group": ex['muscle_group'] or [],
+            "tracked_metrics": ex['tracked_metrics']
+        }
+        exercises_map[ex['workout_id']].append({
+            "id": ex['id'],
+            "workout_id": ex['workout_id'],
+            "exercise_id": ex['exercise_id'],
+            "sequence": ex['sequence'],
+            "exercise": full_ex_obj,
+            "sets": sets_map.get(ex['id'], [])
+        })
+
+    for w in workouts:
+        w['exercises'] = exercises_map[w['id']]
+    return workouts
+
 @app.get("/workouts/active", response_model=Optional[dict])
-def get_active_workout():
+async def get_active_workout(conn=Depends(get_async_db)):
     try:
-        conn = get_db_connection()
-
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        
         # Find the most recent unfinished workout
-        cursor.execute("SELECT * FROM workouts WHERE user_id = 1 AND end_time IS NULL ORDER BY date DESC, start_time DESC LIMIT 1")
-        workout_data = cursor.fetchone()
+        workout_data = await conn.fetchrow(f"SELECT {WORKOUT_TREE_COLUMNS} FROM workouts WHERE user_id = 1 AND end_time IS NULL ORDER BY date DESC, start_time DESC LIMIT 1")
         
         if not workout_data:
-            cursor.close()
-            conn.close()
             return None
             
         # Check for staleness (older than 24 hours)
@@ -1375,64 +1353,11 @@ def get_active_workout():
             if datetime.now() - workout_dt > timedelta(hours=24):
                 # Auto-complete the workout
                 now_time = datetime.now().time()
-                cursor.execute("UPDATE workouts SET end_time = %s WHERE id = %s", (now_time, workout_data['id']))
-                conn.commit()
-                cursor.close()
-                conn.close()
+                await conn.execute("UPDATE workouts SET end_time = $1 WHERE id = $2", now_time, workout_data['id'])
                 return None
             
 
-        workout = dict(workout_data)
-        
-        # Fetch exercises
-        cursor.execute("""
-            SELECT we.*, e.name as exercise_name, e.tracked_metrics, array_remove(array_agg(m.name), NULL) as muscle_group
-            FROM workout_exercises we
-            JOIN exercises e ON we.exercise_id = e.id
-            LEFT JOIN exercise_muscles em ON e.id = em.exercise_id
-            LEFT JOIN muscles m ON em.muscle_id = m.id
-            WHERE we.workout_id = %s
-            GROUP BY we.id, e.name, e.tracked_metrics
-            ORDER BY we.sequence
-        """, (workout['id'],))
-        
-        exercises_data = cursor.fetchall()
-        
-        exercises_list = []
-        for ex_data in exercises_data:
-            ex = dict(ex_data)
-            # Map flattened fields to nested structure if needed, or just use as is for Response
-            
-            # Fetch sets
-            cursor.execute("SELECT * FROM workout_sets WHERE workout_exercise_id = %s ORDER BY set_number", (ex['id'],))
-            sets_data = cursor.fetchall()
-            
-            # We need to construct the `Exercise` object inside `WorkoutExercise`
-            # Frontend: `WorkoutExercise` has `exercise: Exercise`.
-            
-            sets_list = [dict(s) for s in sets_data]
-            
-            full_ex_obj = {
-                "id": ex['exercise_id'],
-                "name": ex['exercise_name'],
-                "muscle_group": ex['muscle_group'] or [],
-                "tracked_metrics": ex['tracked_metrics']
-            }
-            
-            workout_exercise = {
-                "id": ex['id'],
-                "workout_id": ex['workout_id'],
-                "exercise_id": ex['exercise_id'],
-                "sequence": ex['sequence'],
-                "exercise": full_ex_obj,
-                "sets": sets_list
-            }
-            exercises_list.append(workout_exercise)
-            
-        workout['exercises'] = exercises_list
-        
-        cursor.close()
-        conn.close()
+        workout = (await _assemble_workout_trees(conn, [workout_data]))[0]
         
         return workout
 
@@ -1441,9 +1366,8 @@ def get_active_workout():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/workouts/{workout_id}/finish")
-def finish_workout(workout_id: int):
+def finish_workout(workout_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         
         current_time = datetime.now().time()
@@ -1455,20 +1379,17 @@ def finish_workout(workout_id: int):
         
         if cursor.fetchone() is None:
             cursor.close()
-            conn.close()
             raise HTTPException(status_code=404, detail="Workout not found")
             
         conn.commit()
         cursor.close()
-        conn.close()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/workouts/{workout_id}/reopen")
-def reopen_workout(workout_id: int):
+def reopen_workout(workout_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Set end_time to NULL to make it active again
@@ -1479,78 +1400,90 @@ def reopen_workout(workout_id: int):
         
         if cursor.fetchone() is None:
             cursor.close()
-            conn.close()
             raise HTTPException(status_code=404, detail="Workout not found")
             
         conn.commit()
         cursor.close()
-        conn.close()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/workouts/{workout_id}", response_model=None)
-def get_workout(workout_id: int):
+EXPORT_BATCH_SIZE = 200
+
+EXPORT_CSV_COLUMNS = [
+    'workout_id', 'date', 'start_time', 'end_time', 'notes', 'group_name', 'exercise_title',
+    'set_number', 'reps', 'weight_kg', 'distance_m', 'duration_seconds', 'set_notes', 'completed'
+]
+
+def _workout_csv_rows(workout):
+    """Flatten a WorkoutResponse into one CSV row per set."""
+    base = [workout.id, workout.date, workout.start_time, workout.end_time, workout.notes]
+    for item in workout.exercises:
+        exercises = item.superset if isinstance(item, Superset) else [item]
+        for ex in exercises:
+            for s in ex.sets:
+                yield base + [ex.group_name, ex.name, s.set_number, s.reps, s.weight_kg, s.distance_m,
+                              s.duration_seconds, s.notes, s.completed]
+
+def _export_workouts(export_format, user_id):
+    with db_connection() as conn:
+        # Named (server-side) cursor: rows are pulled in batches instead of all at once
+        workouts_cursor = conn.cursor(name='workout_export', cursor_factory=psycopg2.extras.DictCursor)
+        workouts_cursor.itersize = EXPORT_BATCH_SIZE
+        tree_cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+
+        query = "SELECT * FROM workouts"
+        params = ()
+        if user_id is not None:
+            query += " WHERE user_id = %s"
+            params = (user_id,)
+        query += " ORDER BY date DESC, COALESCE(start_time, '00:00'::time) DESC, id DESC"
+        workouts_cursor.execute(query, params)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == 'csv':
+            writer.writerow(EXPORT_CSV_COLUMNS)
+
+        while True:
+            batch = workouts_cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not batch:
+                break
+            for w in _build_workout_responses(tree_cursor, batch):
+                workout = WorkoutResponse(**w)
+                if export_format == 'csv':
+                    writer.writerows(_workout_csv_rows(workout))
+                else:
+                    buffer.write(workout.model_dump_json())
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        tree_cursor.close()
+        workouts_cursor.close()
+
+@app.get("/workouts/export")
+def export_workouts(format: str = Query("ndjson", pattern="^(ndjson|csv)$"), user_id: Optional[int] = None):
+    """Stream the full workout history as NDJSON (one WorkoutResponse per line) or CSV (one row per set)."""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"workouts.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        _export_workouts(format, user_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/workouts/{workout_id}", response_model=None, dependencies=[Depends(_workout_etag)])
+async def get_workout(workout_id: int, conn=Depends(get_async_db)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cursor.execute("SELECT * FROM workouts WHERE id = %s", (workout_id,))
-        workout_data = cursor.fetchone()
+        workout_data = await conn.fetchrow(f"SELECT {WORKOUT_TREE_COLUMNS} FROM workouts WHERE id = $1", workout_id)
         
         if workout_data is None:
-            cursor.close()
-            conn.close()
             raise HTTPException(status_code=404, detail="Workout not found")
             
-        workout = dict(workout_data)
-        
-        # Borrowed logic from get_active_workout to populate full tree
-        # Fetch exercises
-        cursor.execute("""
-            SELECT we.*, e.name as exercise_name, e.tracked_metrics, array_remove(array_agg(m.name), NULL) as muscle_group
-            FROM workout_exercises we
-            JOIN exercises e ON we.exercise_id = e.id
-            LEFT JOIN exercise_muscles em ON e.id = em.exercise_id
-            LEFT JOIN muscles m ON em.muscle_id = m.id
-            WHERE we.workout_id = %s
-            GROUP BY we.id, e.name, e.tracked_metrics
-            ORDER BY we.sequence
-        """, (workout['id'],))
-        
-        exercises_data = cursor.fetchall()
-        
-        exercises_list = []
-        for ex_data in exercises_data:
-            ex = dict(ex_data)
-            
-            # Fetch sets
-            cursor.execute("SELECT * FROM workout_sets WHERE workout_exercise_id = %s ORDER BY set_number", (ex['id'],))
-            sets_data = cursor.fetchall()
-            
-            sets_list = [dict(s) for s in sets_data]
-            
-            # Construct Exercise object inside WorkoutExercise
-            full_ex_obj = {
-                "id": ex['exercise_id'],
-                "name": ex['exercise_name'],
-                "muscle_group": ex['muscle_group'] or [],
-                "tracked_metrics": ex['tracked_metrics']
-            }
-            
-            workout_exercise = {
-                "id": ex['id'],
-                "workout_id": ex['workout_id'],
-                "exercise_id": ex['exercise_id'],
-                "sequence": ex['sequence'],
-                "exercise": full_ex_obj,
-                "sets": sets_list
-            }
-            exercises_list.append(workout_exercise)
+        workout = (await _assemble_workout_trees(conn, [workout_data]))[0]
 
-        workout['exercises'] = exercises_list
-
-        cursor.close()
-        conn.close()
         return workout
     except HTTPException:
         raise
@@ -1558,143 +1491,452 @@ def get_workout(workout_id: int):
         print(f"Error getting workout: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/workouts/", response_model=List[WorkoutResponse])
-def get_workouts():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        
-        # 1. Fetch Workouts
-        cursor.execute("SELECT * FROM workouts ORDER BY date DESC, start_time DESC")
-        workouts_data = cursor.fetchall()
-        
-        workouts_map = {}
-        for w in workouts_data:
-            w_dict = dict(w)
-            w_dict['exercises'] = []
-            workouts_map[w['id']] = w_dict
+def _build_workout_responses(cursor, workouts_data):
+    """Attach exercises, muscles and sets to already-fetched workout rows and group supersets.
 
-        if not workouts_map:
-            return []
+    Returns WorkoutResponse-shaped dicts in the order of ``workouts_data``.
+    """
+    workouts_map = {}
+    for w in workouts_data:
+        w_dict = dict(w)
+        w_dict['exercises'] = []
+        workouts_map[w['id']] = w_dict
 
-        workout_ids = tuple(workouts_map.keys())
-        
-        # 2. Fetch Workout Exercises with Exercise Names
+    if not workouts_map:
+        return []
+
+    workout_ids = tuple(workouts_map.keys())
+    
+    # 2. Fetch Workout Exercises with Exercise Names
+    cursor.execute(f"""
+        SELECT we.id, we.workout_id, we.exercise_id, e.name, we.sequence, we.group_name, e.tracked_metrics
+        FROM workout_exercises we
+        JOIN exercises e ON we.exercise_id = e.id
+        WHERE we.workout_id IN %s
+        ORDER BY we.workout_id, we.sequence
+    """, (workout_ids,))
+    we_data = cursor.fetchall()
+    
+    we_map = {} # we_id -> we_dict
+    
+    # 3. Fetch Muscle Groups for all exercises involved
+    # Optimization: Get all exercise IDs first
+    exercise_ids = tuple(set(we['exercise_id'] for we in we_data))
+    exercise_muscles_map = {}
+    if exercise_ids:
         cursor.execute(f"""
-            SELECT we.id, we.workout_id, we.exercise_id, e.name, we.sequence, we.group_name, e.tracked_metrics
-            FROM workout_exercises we
-            JOIN exercises e ON we.exercise_id = e.id
-            WHERE we.workout_id IN %s
-            ORDER BY we.workout_id, we.sequence
-        """, (workout_ids,))
-        we_data = cursor.fetchall()
-        
-        we_map = {} # we_id -> we_dict
+            SELECT em.exercise_id, m.name
+            FROM exercise_muscles em
+            JOIN muscles m ON em.muscle_id = m.id
+            WHERE em.exercise_id IN %s
+        """, (exercise_ids,))
+        em_data = cursor.fetchall()
+        for em in em_data:
+            if em['exercise_id'] not in exercise_muscles_map:
+                exercise_muscles_map[em['exercise_id']] = []
+            exercise_muscles_map[em['exercise_id']].append(em['name'])
+
+    for we in we_data:
+        we_dict = {
+            'id': we['exercise_id'], # Use exercise_id as id for frontend compatibility? Or we.id? Frontend uses it for lookup?
+            # The frontend uses `item.name` mostly.
+            'name': we['name'],
+            'muscle_group': exercise_muscles_map.get(we['exercise_id'], []),
+            'sets': [],
+            'we_id': we['id'], # Keep track of internal ID for sets mapping
+            'group_name': we['group_name'],
+            'tracked_metrics': we['tracked_metrics']
+        }
+        we_map[we['id']] = we_dict
+        workouts_map[we['workout_id']]['exercises'].append(we_dict)
+
+    # 4. Fetch Sets
+    if we_map:
+        we_ids = tuple(we_map.keys())
+        cursor.execute(f"""
+            SELECT id, workout_exercise_id, set_number, reps, weight_kg, distance_m, duration_seconds, notes, completed
+            FROM workout_sets
+            WHERE workout_exercise_id IN %s
+            ORDER BY workout_exercise_id, set_number
+        """, (we_ids,))
+        sets_data = cursor.fetchall()
+        
+        for s in sets_data:
+            we_id = s['workout_exercise_id']
+            if we_id in we_map:
+                we_map[we_id]['sets'].append({
+                    'id': s['id'],
+                    'set_number': s['set_number'],
+                    'weight_kg': s['weight_kg'], # Returning kg as weight
+                    'reps': s['reps'],
+                    'distance_m': s['distance_m'], # Alignment with frontend
+                    'duration_seconds': s['duration_seconds'], # Alignment with frontend
+                    'notes': s.get('notes'),
+                    'completed': s['completed'] or False
+                })
+
+    # Post-process to group supersets
+    final_workouts = []
+    for w in workouts_map.values():
+        flat_exercises = w['exercises']
+        grouped_exercises = []
+        current_superset = None
+        
+        for ex in flat_exercises:
+            group_name = ex.get('group_name')
+            if group_name:
+                if current_superset and current_superset.get('group_name') == group_name:
+                     # Append to existing superset
+                     current_superset['superset'].append(ex)
+                else:
+                     # Start new superset
+                     current_superset = {
+                         'group_name': group_name, 
+                         'superset': [ex]
+                     }
+                     grouped_exercises.append(current_superset)
+            else:
+                current_superset = None
+                grouped_exercises.append(ex)
         
-        # 3. Fetch Muscle Groups for all exercises involved
-        # Optimization: Get all exercise IDs first
-        exercise_ids = tuple(set(we['exercise_id'] for we in we_data))
-        exercise_muscles_map = {}
-        if exercise_ids:
-            cursor.execute(f"""
-                SELECT em.exercise_id, m.name
-                FROM exercise_muscles em
-                JOIN muscles m ON em.muscle_id = m.id
-                WHERE em.exercise_id IN %s
-            """, (exercise_ids,))
-            em_data = cursor.fetchall()
-            for em in em_data:
-                if em['exercise_id'] not in exercise_muscles_map:
-                    exercise_muscles_map[em['exercise_id']] = []
-                exercise_muscles_map[em['exercise_id']].append(em['name'])
-
-        for we in we_data:
-            we_dict = {
-                'id': we['exercise_id'], # Use exercise_id as id for frontend compatibility? Or we.id? Frontend uses it for lookup?
-                # The frontend uses `item.name` mostly.
-                'name': we['name'],
-                'muscle_group': exercise_muscles_map.get(we['exercise_id'], []),
-                'sets': [],
-                'we_id': we['id'], # Keep track of internal ID for sets mapping
-                'group_name': we['group_name'],
-                'tracked_metrics': we['tracked_metrics']
-            }
-            we_map[we['id']] = we_dict
-            workouts_map[we['workout_id']]['exercises'].append(we_dict)
-
-        # 4. Fetch Sets
-        if we_map:
-            we_ids = tuple(we_map.keys())
-            cursor.execute(f"""
-                SELECT id, workout_exercise_id, set_number, reps, weight_kg, distance_m, duration_seconds, notes, completed
-                FROM workout_sets
-                WHERE workout_exercise_id IN %s
-                ORDER BY workout_exercise_id, set_number
-            """, (we_ids,))
-            sets_data = cursor.fetchall()
-            
-            for s in sets_data:
-                we_id = s['workout_exercise_id']
-                if we_id in we_map:
-                    we_map[we_id]['sets'].append({
-                        'id': s['id'],
-                        'set_number': s['set_number'],
-                        'weight_kg': s['weight_kg'], # Returning kg as weight
-                        'reps': s['reps'],
-                        'distance_m': s['distance_m'], # Alignment with frontend
-                        'duration_seconds': s['duration_seconds'], # Alignment with frontend
-                        'notes': s.get('notes'),
-                        'completed': s['completed'] or False
-                    })
+        w['exercises'] = grouped_exercises
+        final_workouts.append(w)
 
-        cursor.close()
-        conn.close()
+    return final_workouts
+
+def _encode_workouts_cursor(workout):
+    start = workout['start_time'].isoformat() if workout['start_time'] else ''
+    raw = f"{workout['date'].isoformat()}|{start}|{workout['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_workouts_cursor(token):
+    try:
+        date_str, start_str, id_str = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+        return date.fromisoformat(date_str), time.fromisoformat(start_str) if start_str else time.min, int(id_str)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/workouts/", response_model=List[WorkoutResponse])
+def get_workouts(
+    response: Response,
+    user_id: Optional[int] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    conn=Depends(get_db),
+):
+    """Workout history, newest first.
+
+    Pages are keyset-paginated on (date, start_time, id): pass ``limit`` and
+    follow the ``X-Next-Cursor`` response header with ``cursor`` to get the
+    next page. A workout without a start_time sorts as if it started at midnight.
+    """
+    after = _decode_workouts_cursor(cursor) if cursor else None
+    try:
+        db_cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         
-        # Post-process to group supersets
-        final_workouts = []
-        for w in workouts_map.values():
-            flat_exercises = w['exercises']
-            grouped_exercises = []
-            current_superset = None
-            
-            for ex in flat_exercises:
-                group_name = ex.get('group_name')
-                if group_name:
-                    if current_superset and current_superset.get('group_name') == group_name:
-                         # Append to existing superset
-                         current_superset['superset'].append(ex)
-                    else:
-                         # Start new superset
-                         current_superset = {
-                             'group_name': group_name, 
-                             'superset': [ex]
-                         }
-                         grouped_exercises.append(current_superset)
-                else:
-                    current_superset = None
-                    grouped_exercises.append(ex)
-            
-            w['exercises'] = grouped_exercises
-            final_workouts.append(w)
+        # 1. Fetch Workouts
+        conditions = []
+        params = []
+        if user_id is not None:
+            conditions.append("user_id = %s")
+            params.append(user_id)
+        if date_from:
+            conditions.append("date >= %s")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= %s")
+            params.append(date_to)
+        if after:
+            conditions.append("(date, COALESCE(start_time, '00:00'::time), id) < (%s, %s, %s)")
+            params.extend(after)
+
+        query = "SELECT * FROM workouts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY date DESC, COALESCE(start_time, '00:00'::time) DESC, id DESC"
+        if limit:
+            # Fetch one extra row to know whether another page exists
+            query += " LIMIT %s"
+            params.append(limit + 1)
+
+        db_cursor.execute(query, tuple(params))
+        workouts_data = db_cursor.fetchall()
+
+        if limit and len(workouts_data) > limit:
+            workouts_data = workouts_data[:limit]
+            response.headers["X-Next-Cursor"] = _encode_workouts_cursor(workouts_data[-1])
+
+        final_workouts = _build_workout_responses(db_cursor, workouts_data)
+        db_cursor.close()
 
         return [WorkoutResponse(**w) for w in final_workouts]
     except Exception as e:
         print(f"Error getting workouts: {e}") # Add logging
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Delta sync ---
+
+class SyncResponse(BaseModel):
+    token: str
+    workouts: List[dict]
+    workout_exercises: List[dict]
+    workout_sets: List[dict]
+    deleted: dict
+
+SYNC_TABLES = ("workouts", "workout_exercises", "workout_sets")
+
+# Owner of each synced row, joined in so /sync can filter by user
+SYNC_QUERIES = {
+    "workouts": "SELECT w.* FROM workouts w",
+    "workout_exercises": "SELECT we.* FROM workout_exercises we JOIN workouts w ON w.id = we.workout_id",
+    "workout_sets": """
+        SELECT ws.* FROM workout_sets ws
+        JOIN workout_exercises we ON we.id = ws.workout_exercise_id
+        JOIN workouts w ON w.id = we.workout_id
+    """,
+}
+
+def _encode_sync_token(txid):
+    return base64.urlsafe_b64encode(f"txid:{txid}".encode()).decode()
+
+def _decode_sync_token(token):
+    try:
+        prefix, txid = base64.urlsafe_b64decode(token.encode()).decode().split(':')
+        if prefix != "txid":
+            raise ValueError(prefix)
+        return int(txid)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+@app.get("/sync", response_model=SyncResponse)
+def sync_workouts(since: Optional[str] = None, user_id: Optional[int] = None, conn=Depends(get_db)):
+    """Workouts, workout_exercises and sets written or deleted since a token.
+
+    Without ``since`` every row is returned. Pass the returned ``token`` on the
+    next call to get only the changes: upsert the returned rows by id, then drop
+    the ids listed under ``deleted``. Rows may be repeated across syncs, never missed.
+    """
+    since_txid = _decode_sync_token(since) if since else None
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        # One snapshot for the token and every table, so nothing falls between them
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot()) AS xmin")
+        token = _encode_sync_token(cursor.fetchone()['xmin'])
+
+        conditions = []
+        params = []
+        if since_txid is not None:
+            conditions.append("{alias}.change_txid >= %s")
+            params.append(since_txid)
+        if user_id is not None:
+            conditions.append("w.user_id = %s")
+            params.append(user_id)
+
+        result = {"token": token}
+        for table, alias in zip(SYNC_TABLES, ("w", "we", "ws")):
+            query = SYNC_QUERIES[table]
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions).format(alias=alias)
+            cursor.execute(query + f" ORDER BY {alias}.id", tuple(params))
+            rows = cursor.fetchall()
+            for row in rows:
+                del row['change_txid']
+            result[table] = rows
+
+        result["deleted"] = {table: [] for table in SYNC_TABLES}
+        if since_txid is not None:
+            query = "SELECT table_name, row_id FROM sync_tombstones WHERE change_txid >= %s"
+            params = [since_txid]
+            if user_id is not None:
+                query += " AND user_id = %s"
+                params.append(user_id)
+            cursor.execute(query + " ORDER BY id", tuple(params))
+            for row in cursor.fetchall():
+                result["deleted"][row['table_name']].append(row['row_id'])
+
+        cursor.close()
+        conn.rollback()
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Reports ---
+
+class PeriodCount(BaseModel):
+    period: date
+    count: int
+
+class WorkoutTonnage(BaseModel):
+    workout_id: int
+    date: date
+    tonnage: float
+
+class MuscleVolume(BaseModel):
+    week: date
+    muscle: str
+    sets: int
+    tonnage: float
+
+class ExerciseHistoryEntry(BaseModel):
+    workout_id: int
+    date: date
+    max_weight: Optional[float] = None
+    estimated_1rm: Optional[float] = None
+    volume: float
+    sets: List[SetResponse] = []
+
+def _report_filters(user_id, date_from, date_to, date_column="w.date"):
+    conditions = ["w.user_id = %s"]
+    params = [user_id]
+    if date_from:
+        conditions.append(f"{date_column} >= %s")
+        params.append(date_from)
+    if date_to:
+        conditions.append(f"{date_column} <= %s")
+        params.append(date_to)
+    return " AND ".join(conditions), params
+
+@app.get("/reports/workouts_per_period", response_model=List[PeriodCount])
+def get_workouts_per_period(
+    period: str = Query("month", pattern="^(week|month|year)$"),
+    user_id: int = 1,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    conn=Depends(get_db),
+):
+    try:
+        where, params = _report_filters(user_id, date_from, date_to)
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cursor.execute(f"""
+            SELECT date_trunc(%s, w.date)::date AS period, COUNT(*) AS count
+            FROM workouts w
+            WHERE {where}
+            GROUP BY 1
+            ORDER BY 1
+        """, [period] + params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return [PeriodCount(**r) for r in rows]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/reports/tonnage", response_model=List[WorkoutTonnage])
+def get_workout_tonnage(
+    user_id: int = 1,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    conn=Depends(get_db),
+):
+    """Per-workout tonnage (sum of reps x weight_kg), oldest first. ``limit`` keeps the most recent N."""
+    try:
+        where, params = _report_filters(user_id, date_from, date_to)
+        query = f"""
+            SELECT w.id AS workout_id, w.date, COALESCE(SUM(ws.reps * ws.weight_kg), 0) AS tonnage,
+                   COALESCE(w.start_time, '00:00'::time) AS start_key
+            FROM workouts w
+            LEFT JOIN workout_exercises we ON we.workout_id = w.id
+            LEFT JOIN workout_sets ws ON ws.workout_exercise_id = we.id
+            WHERE {where}
+            GROUP BY w.id
+            ORDER BY w.date DESC, start_key DESC, w.id DESC
+        """
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return [WorkoutTonnage(**r) for r in reversed(rows)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/reports/muscle_volume", response_model=List[MuscleVolume])
+def get_muscle_weekly_volume(
+    user_id: int = 1,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    conn=Depends(get_db),
+):
+    """Weekly sets and tonnage per muscle. A set counts toward every muscle its exercise targets."""
+    try:
+        where, params = _report_filters(user_id, date_from, date_to)
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cursor.execute(f"""
+            SELECT date_trunc('week', w.date)::date AS week, m.name AS muscle,
+                   COUNT(ws.id) AS sets, COALESCE(SUM(ws.reps * ws.weight_kg), 0) AS tonnage
+            FROM workouts w
+            JOIN workout_exercises we ON we.workout_id = w.id
+            JOIN workout_sets ws ON ws.workout_exercise_id = we.id
+            JOIN exercise_muscles em ON em.exercise_id = we.exercise_id
+            JOIN muscles m ON m.id = em.muscle_id
+            WHERE {where}
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return [MuscleVolume(**r) for r in rows]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/reports/exercises/{exercise_id}/history", response_model=List[ExerciseHistoryEntry])
+def get_exercise_history(
+    exercise_id: int,
+    user_id: int = 1,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    conn=Depends(get_db),
+):
+    """Per-workout best weight, Epley estimated 1RM, volume and sets for one exercise, newest first."""
+    try:
+        where, params = _report_filters(user_id, date_from, date_to)
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cursor.execute(f"""
+            SELECT w.id AS workout_id, w.date,
+                   MAX(ws.weight_kg) AS max_weight,
+                   MAX(ws.weight_kg * (1 + ws.reps / 30.0)) AS estimated_1rm,
+                   COALESCE(SUM(ws.reps * ws.weight_kg), 0) AS volume,
+                   json_agg(json_build_object(
+                       'id', ws.id, 'set_number', ws.set_number, 'reps', ws.reps, 'weight_kg', ws.weight_kg,
+                       'distance_m', ws.distance_m, 'duration_seconds', ws.duration_seconds,
+                       'notes', ws.notes, 'completed', COALESCE(ws.completed, FALSE)
+                   ) ORDER BY we.sequence, ws.set_number) AS sets
+            FROM workouts w
+            JOIN workout_exercises we ON we.workout_id = w.id
+            JOIN workout_sets ws ON ws.workout_exercise_id = we.id
+            WHERE we.exercise_id = %s AND {where}
+            GROUP BY w.id
+            ORDER BY w.date DESC, COALESCE(w.start_time, '00:00'::time) DESC, w.id DESC
+        """, [exercise_id] + params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return [ExerciseHistoryEntry(**r) for r in rows]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.put("/workouts/{workout_id}", response_model=Workout)
-def update_workout(workout_id: int, workout: Workout):
+def update_workout(workout_id: int, workout: Workout, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cursor.execute("SELECT user_id, date FROM workouts WHERE id = %s", (workout_id,))
+        previous = cursor.fetchone()
+        summary_keys = _exercise_summary_keys(cursor, workout_id=workout_id)
         cursor.execute(
             "UPDATE workouts SET user_id = %s, date = %s, start_time = %s, end_time = %s, notes = %s WHERE id = %s RETURNING *",
             (workout.user_id, workout.date, workout.start_time, workout.end_time, workout.notes, workout_id)
         )
         updated_workout_data = cursor.fetchone()
+        # Moving a workout to another day or user changes last_performed and
+        # the totals of both the old and the new (user, exercise) summaries
+        if updated_workout_data is not None and (previous['user_id'], previous['date']) != (updated_workout_data['user_id'], updated_workout_data['date']):
+            _refresh_exercise_summary_keys(cursor, _moved_summary_keys(cursor, summary_keys, workout_id=workout_id))
         conn.commit()
         cursor.close()
-        conn.close()
         if updated_workout_data is None:
             raise HTTPException(status_code=404, detail="Workout not found")
         return Workout(**updated_workout_data)
@@ -1702,10 +1944,10 @@ def update_workout(workout_id: int, workout: Workout):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/workouts/{workout_id}", status_code=204)
-def delete_workout(workout_id: int):
+def delete_workout(workout_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
+        summary_keys = _exercise_summary_keys(cursor, workout_id=workout_id)
         
         # 1. Delete sets
         cursor.execute("""
@@ -1722,9 +1964,9 @@ def delete_workout(workout_id: int):
         cursor.execute("DELETE FROM workouts WHERE id = %s RETURNING id", (workout_id,))
         deleted_id = cursor.fetchone()
         
+        _refresh_exercise_summary_keys(cursor, summary_keys)
         conn.commit()
         cursor.close()
-        conn.close()
         
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="Workout not found")
@@ -1734,9 +1976,8 @@ def delete_workout(workout_id: int):
 
 
 @app.post("/workout_exercises/", response_model=WorkoutExercise)
-def create_workout_exercise(workout_exercise: WorkoutExercise):
+def create_workout_exercise(workout_exercise: WorkoutExercise, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO workout_exercises (workout_id, exercise_id, sequence) VALUES (%s, %s, %s) RETURNING *",
@@ -1745,20 +1986,17 @@ def create_workout_exercise(workout_exercise: WorkoutExercise):
         new_workout_exercise_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return WorkoutExercise(**new_workout_exercise_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/workout_exercises/{workout_exercise_id}", response_model=WorkoutExercise)
-def get_workout_exercise(workout_exercise_id: int):
+def get_workout_exercise(workout_exercise_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM workout_exercises WHERE id = %s", (workout_exercise_id,))
         workout_exercise_data = cursor.fetchone()
         cursor.close()
-        conn.close()
         if workout_exercise_data is None:
             raise HTTPException(status_code=404, detail="Workout exercise not found")
         return WorkoutExercise(**workout_exercise_data)
@@ -1766,31 +2004,33 @@ def get_workout_exercise(workout_exercise_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/workout_exercises/", response_model=List[WorkoutExercise])
-def get_workout_exercises():
+def get_workout_exercises(conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM workout_exercises")
         workout_exercises_data = cursor.fetchall()
         cursor.close()
-        conn.close()
         return [WorkoutExercise(**we) for we in workout_exercises_data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/workout_exercises/{workout_exercise_id}", response_model=WorkoutExercise)
-def update_workout_exercise(workout_exercise_id: int, workout_exercise: WorkoutExercise):
+def update_workout_exercise(workout_exercise_id: int, workout_exercise: WorkoutExercise, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cursor.execute("SELECT workout_id, exercise_id FROM workout_exercises WHERE id = %s", (workout_exercise_id,))
+        previous = cursor.fetchone()
+        summary_keys = _exercise_summary_keys(cursor, workout_exercise_id=workout_exercise_id)
         cursor.execute(
             "UPDATE workout_exercises SET workout_id = %s, exercise_id = %s, sequence = %s WHERE id = %s RETURNING *",
             (workout_exercise.workout_id, workout_exercise.exercise_id, workout_exercise.sequence, workout_exercise_id)
         )
         updated_workout_exercise_data = cursor.fetchone()
+        # Its sets now count towards another exercise (or workout): refresh both sides
+        if updated_workout_exercise_data is not None and tuple(previous) != (updated_workout_exercise_data['workout_id'], updated_workout_exercise_data['exercise_id']):
+            _refresh_exercise_summary_keys(cursor, _moved_summary_keys(cursor, summary_keys, workout_exercise_id=workout_exercise_id))
         conn.commit()
         cursor.close()
-        conn.close()
         if updated_workout_exercise_data is None:
             raise HTTPException(status_code=404, detail="Workout exercise not found")
         return WorkoutExercise(**updated_workout_exercise_data)
@@ -1798,10 +2038,10 @@ def update_workout_exercise(workout_exercise_id: int, workout_exercise: WorkoutE
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/workout_exercises/{workout_exercise_id}", status_code=204)
-def delete_workout_exercise(workout_exercise_id: int):
+def delete_workout_exercise(workout_exercise_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
+        summary_keys = _exercise_summary_keys(cursor, workout_exercise_id=workout_exercise_id)
         
         # 1. Delete associated sets first
         cursor.execute("DELETE FROM workout_sets WHERE workout_exercise_id = %s", (workout_exercise_id,))
@@ -1810,9 +2050,9 @@ def delete_workout_exercise(workout_exercise_id: int):
         cursor.execute("DELETE FROM workout_exercises WHERE id = %s RETURNING id", (workout_exercise_id,))
         deleted_id = cursor.fetchone()
         
+        _refresh_exercise_summary_keys(cursor, summary_keys)
         conn.commit()
         cursor.close()
-        conn.close()
         
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="Workout exercise not found")
@@ -1824,9 +2064,8 @@ class ReorderRequest(BaseModel):
     workout_exercise_ids: List[int]
 
 @app.post("/workouts/{workout_id}/reorder")
-def reorder_workout_exercises(workout_id: int, request: ReorderRequest):
+def reorder_workout_exercises(workout_id: int, request: ReorderRequest, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Verify all belong to the workout? 
@@ -1839,37 +2078,271 @@ def reorder_workout_exercises(workout_id: int, request: ReorderRequest):
             
         conn.commit()
         cursor.close()
-        conn.close()
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Batch writes ---
+# One request, one transaction and a fixed number of multi-row statements for
+# any number of exercise and set operations on a workout. New exercises get
+# ids up front (nextval) so sets created in the same batch can point at them
+# through a client-chosen ``ref``.
+
+class BatchExerciseOp(BaseModel):
+    op: str = Field(pattern="^(create|update|delete)$")
+    id: Optional[int] = None  # update/delete: existing workout_exercise id
+    ref: Optional[str] = None  # create: label that sets in this batch can use
+    exercise_id: Optional[int] = None
+    sequence: Optional[int] = None
+
+class BatchSetOp(BaseModel):
+    op: str = Field(pattern="^(create|update|delete)$")
+    id: Optional[int] = None  # update/delete: existing set id
+    workout_exercise_id: Optional[int] = None
+    workout_exercise_ref: Optional[str] = None  # instead of workout_exercise_id, for exercises created in this batch
+    set_number: Optional[int] = None
+    reps: Optional[int] = None
+    weight_kg: Optional[float] = None
+    duration_seconds: Optional[int] = None
+    distance_m: Optional[float] = None
+    height_cm: Optional[float] = None
+    tempo: Optional[str] = None
+    notes: Optional[str] = None
+    completed: bool = False
+
+class WorkoutBatch(BaseModel):
+    exercises: List[BatchExerciseOp] = []
+    sets: List[BatchSetOp] = []
+
+class WorkoutBatchResult(BaseModel):
+    workout: dict
+    refs: dict  # ref -> new workout_exercise id
+
+BATCH_SET_COLUMNS = ("workout_exercise_id", "set_number", "reps", "weight_kg", "duration_seconds", "distance_m", "height_cm", "tempo", "notes", "completed")
+BATCH_SET_TYPES = ("int", "int", "int", "numeric", "int", "numeric", "numeric", "text", "text", "bool")
+
+def _batch_set_unnest(first_param):
+    """unnest() arguments for the set columns, numbered from $first_param."""
+    return ", ".join(f"${first_param + i}::{t}[]" for i, t in enumerate(BATCH_SET_TYPES))
+
+def _batch_ids(ops, op, what):
+    ids = [o.id for o in ops if o.op == op]
+    if any(i is None for i in ids):
+        raise HTTPException(status_code=400, detail=f"{what} {op} requires an id")
+    return ids
+
+def _batch_set_columns(set_ops, refs):
+    """Column arrays (in BATCH_SET_COLUMNS order) for unnest(), resolving exercise refs."""
+    rows = []
+    for o in set_ops:
+        we_id = refs.get(o.workout_exercise_ref) if o.workout_exercise_ref else o.workout_exercise_id
+        if we_id is None or o.set_number is None:
+            raise HTTPException(status_code=400, detail="Set create/update requires set_number and a known workout_exercise_id or workout_exercise_ref")
+        rows.append((we_id, o.set_number, o.reps, o.weight_kg, o.duration_seconds, o.distance_m, o.height_cm, o.tempo, o.notes, o.completed))
+    return [list(column) for column in zip(*rows)]
+
+async def _workout_summary_keys(conn, workout_id):
+    rows = await conn.fetch("""
+        SELECT DISTINCT w.user_id, we.exercise_id
+        FROM workout_exercises we
+        JOIN workouts w ON we.workout_id = w.id
+        WHERE we.workout_id = $1
+    """, workout_id)
+    return {(r['user_id'], r['exercise_id']) for r in rows}
+
+@app.post("/workouts/{workout_id}/batch", response_model=WorkoutBatchResult)
+async def batch_workout_writes(workout_id: int, batch: WorkoutBatch, conn=Depends(get_async_db)):
+    """Apply exercise and set creates/updates/deletes to a workout atomically and return its tree.
+
+    Deletes run first, then exercise updates and creates, then set updates and
+    creates. Every referenced row must belong to this workout, otherwise nothing
+    is written. Updates replace the set like PUT /workout_sets/{id}; exercise
+    updates only change the fields given.
+    """
+    try:
+        async with conn.transaction():
+            workout_data = await conn.fetchrow(f"SELECT {WORKOUT_TREE_COLUMNS} FROM workouts WHERE id = $1 FOR UPDATE", workout_id)
+            if workout_data is None:
+                raise HTTPException(status_code=404, detail="Workout not found")
+
+            # Summaries of exercises leaving the workout must be refreshed too
+            summary_keys = await _workout_summary_keys(conn, workout_id)
+
+            deleted_set_ids = _batch_ids(batch.sets, "delete", "Set")
+            deleted_we_ids = _batch_ids(batch.exercises, "delete", "Exercise")
+            if deleted_set_ids:
+                deleted = await conn.fetch("""
+                    DELETE FROM workout_sets ws USING workout_exercises we
+                    WHERE ws.workout_exercise_id = we.id AND we.workout_id = $1 AND ws.id = ANY($2::int[])
+                    RETURNING ws.id
+                """, workout_id, deleted_set_ids)
+                if len(deleted) != len(set(deleted_set_ids)):
+                    raise HTTPException(status_code=404, detail="Some sets were not found in this workout")
+            if deleted_we_ids:
+                await conn.execute("""
+                    DELETE FROM workout_sets ws USING workout_exercises we
+                    WHERE ws.workout_exercise_id = we.id AND we.workout_id = $1 AND we.id = ANY($2::int[])
+                """, workout_id, deleted_we_ids)
+                deleted = await conn.fetch(
+                    "DELETE FROM workout_exercises WHERE workout_id = $1 AND id = ANY($2::int[]) RETURNING id",
+                    workout_id, deleted_we_ids
+                )
+                if len(deleted) != len(set(deleted_we_ids)):
+                    raise HTTPException(status_code=404, detail="Some exercises were not found in this workout")
+
+            updates = [o for o in batch.exercises if o.op == "update"]
+            if updates:
+                ids = _batch_ids(updates, "update", "Exercise")
+                updated = await conn.fetch("""
+                    UPDATE workout_exercises we
+                    SET exercise_id = COALESCE(u.exercise_id, we.exercise_id), sequence = COALESCE(u.sequence, we.sequence)
+                    FROM unnest($2::int[], $3::int[], $4::int[]) AS u(id, exercise_id, sequence)
+                    WHERE we.id = u.id AND we.workout_id = $1
+                    RETURNING we.id
+                """, workout_id, ids, [o.exercise_id for o in updates], [o.sequence for o in updates])
+                if len(updated) != len(set(ids)):
+                    raise HTTPException(status_code=404, detail="Some exercises were not found in this workout")
+
+            creates = [o for o in batch.exercises if o.op == "create"]
+            refs = {}
+            if creates:
+                if any(o.exercise_id is None or o.sequence is None for o in creates):
+                    raise HTTPException(status_code=400, detail="Exercise create requires exercise_id and sequence")
+                new_ids = [r['id'] for r in await conn.fetch(
+                    "SELECT nextval('workout_exercises_id_seq')::int AS id FROM generate_series(1, $1)", len(creates)
+                )]
+                await conn.execute("""
+                    INSERT INTO workout_exercises (id, workout_id, exercise_id, sequence)
+                    SELECT u.id, $1, u.exercise_id, u.sequence
+                    FROM unnest($2::int[], $3::int[], $4::int[]) AS u(id, exercise_id, sequence)
+                """, workout_id, new_ids, [o.exercise_id for o in creates], [o.sequence for o in creates])
+                refs = {o.ref: new_id for o, new_id in zip(creates, new_ids) if o.ref}
+
+            columns = ", ".join(BATCH_SET_COLUMNS)
+            updates = [o for o in batch.sets if o.op == "update"]
+            if updates:
+                ids = _batch_ids(updates, "update", "Set")
+                assignments = ", ".join(f"{c} = u.{c}" for c in BATCH_SET_COLUMNS)
+                updated = await conn.fetch(f"""
+                    UPDATE workout_sets ws SET {assignments}
+                    FROM unnest($2::int[], {_batch_set_unnest(3)}) AS u(id, {columns})
+                    JOIN workout_exercises target ON target.id = u.workout_exercise_id AND target.workout_id = $1
+                    WHERE ws.id = u.id
+                      AND EXISTS (SELECT 1 FROM workout_exercises we WHERE we.id = ws.workout_exercise_id AND we.workout_id = $1)
+                    RETURNING ws.id
+                """, workout_id, ids, *_batch_set_columns(updates, refs))
+                if len(updated) != len(set(ids)):
+                    raise HTTPException(status_code=404, detail="Some sets were not found in this workout")
+
+            creates = [o for o in batch.sets if o.op == "create"]
+            if creates:
+                inserted = await conn.fetch(f"""
+                    INSERT INTO workout_sets ({columns})
+                    SELECT u.*
+                    FROM unnest({_batch_set_unnest(2)}) AS u({columns})
+                    JOIN workout_exercises we ON we.id = u.workout_exercise_id AND we.workout_id = $1
+                    RETURNING id
+                """, workout_id, *_batch_set_columns(creates, refs))
+                if len(inserted) != len(creates):
+                    raise HTTPException(status_code=400, detail="Some sets point at exercises outside this workout")
+
+            summary_keys |= await _workout_summary_keys(conn, workout_id)
+            if summary_keys:
+                user_ids, exercise_ids = zip(*summary_keys)
+                await conn.execute("""
+                    SELECT refresh_exercise_summary(k.user_id, k.exercise_id)
+                    FROM unnest($1::int[], $2::int[]) AS k(user_id, exercise_id)
+                """, list(user_ids), list(exercise_ids))
+
+            workout = (await _assemble_workout_trees(conn, [workout_data]))[0]
+        return {"workout": workout, "refs": refs}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Exercise summaries ---
+# exercise_summaries (migrations/001) holds one row per (user_id, exercise_id).
+# Set write paths refresh the affected rows in the same transaction.
+
+async def _refresh_exercise_summaries(conn, workout_exercise_ids):
+    await conn.execute("""
+        SELECT refresh_exercise_summary(k.user_id, k.exercise_id)
+        FROM (
+            SELECT DISTINCT w.user_id, we.exercise_id
+            FROM workout_exercises we
+            JOIN workouts w ON we.workout_id = w.id
+            WHERE we.id = ANY($1::int[])
+        ) k
+    """, list(workout_exercise_ids))
+
+def _exercise_summary_keys(cursor, workout_id=None, workout_exercise_id=None):
+    """(user_id, exercise_id) pairs touched by a workout or workout exercise, read before deleting it."""
+    cursor.execute("""
+        SELECT DISTINCT w.user_id, we.exercise_id
+        FROM workout_exercises we
+        JOIN workouts w ON we.workout_id = w.id
+        WHERE we.workout_id = %s OR we.id = %s
+    """, (workout_id, workout_exercise_id))
+    return cursor.fetchall()
+
+def _moved_summary_keys(cursor, previous_keys, workout_id=None, workout_exercise_id=None):
+    """Keys read before moving a workout or workout exercise, plus the ones it has now."""
+    current_keys = _exercise_summary_keys(cursor, workout_id=workout_id, workout_exercise_id=workout_exercise_id)
+    return {tuple(k) for k in previous_keys} | {tuple(k) for k in current_keys}
+
+def _refresh_exercise_summary_keys(cursor, keys):
+    if not keys:
+        return
+    cursor.execute("""
+        SELECT refresh_exercise_summary(k.user_id, k.exercise_id)
+        FROM unnest(%s::int[], %s::int[]) AS k(user_id, exercise_id)
+    """, ([k[0] for k in keys], [k[1] for k in keys]))
+
+class ExerciseSummary(BaseModel):
+    user_id: int
+    exercise_id: int
+    best_set_id: Optional[int] = None
+    best_weight_kg: Optional[float] = None
+    best_reps: Optional[int] = None
+    estimated_1rm: Optional[float] = None
+    last_performed: Optional[date] = None
+    workout_count: int = 0
+    total_sets: int = 0
+    total_reps: int = 0
+    total_volume_kg: float = 0
+
+@app.get("/exercises/{exercise_id}/summary", response_model=Optional[ExerciseSummary])
+async def get_exercise_summary(exercise_id: int, user_id: int = 1, conn=Depends(get_async_db)):
+    try:
+        data = await conn.fetchrow(
+            "SELECT * FROM exercise_summaries WHERE user_id = $1 AND exercise_id = $2",
+            user_id, exercise_id
+        )
+        return ExerciseSummary(**data) if data else None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/workout_sets/", response_model=WorkoutSet)
-def create_workout_set(workout_set: WorkoutSet):
+async def create_workout_set(workout_set: WorkoutSet, conn=Depends(get_async_db)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cursor.execute(
-            "INSERT INTO workout_sets (workout_exercise_id, set_number, reps, weight_kg, duration_seconds, distance_m, height_cm, tempo, notes, completed) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING *",
-            (workout_set.workout_exercise_id, workout_set.set_number, workout_set.reps, workout_set.weight_kg, workout_set.duration_seconds, workout_set.distance_m, workout_set.height_cm, workout_set.tempo, workout_set.notes, workout_set.completed)
-        )
-        new_workout_set_data = cursor.fetchone()
-        conn.commit()
-        cursor.close()
-        conn.close()
+        async with conn.transaction():
+            new_workout_set_data = await conn.fetchrow(
+                "INSERT INTO workout_sets (workout_exercise_id, set_number, reps, weight_kg, duration_seconds, distance_m, height_cm, tempo, notes, completed) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10) RETURNING *",
+                workout_set.workout_exercise_id, workout_set.set_number, workout_set.reps, workout_set.weight_kg, workout_set.duration_seconds, workout_set.distance_m, workout_set.height_cm, workout_set.tempo, workout_set.notes, workout_set.completed
+            )
+            await _refresh_exercise_summaries(conn, [workout_set.workout_exercise_id])
         return WorkoutSet(**new_workout_set_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/workout_sets/{workout_set_id}", response_model=WorkoutSet)
-def get_workout_set(workout_set_id: int):
+def get_workout_set(workout_set_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM workout_sets WHERE id = %s", (workout_set_id,))
         workout_set_data = cursor.fetchone()
         cursor.close()
-        conn.close()
         if workout_set_data is None:
             raise HTTPException(status_code=404, detail="Workout set not found")
         return WorkoutSet(**workout_set_data)
@@ -1877,31 +2350,28 @@ def get_workout_set(workout_set_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/workout_sets/", response_model=List[WorkoutSet])
-def get_workout_sets():
+def get_workout_sets(conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM workout_sets")
         workout_sets_data = cursor.fetchall()
         cursor.close()
-        conn.close()
         return [WorkoutSet(**ws) for ws in workout_sets_data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/workout_sets/{workout_set_id}", response_model=WorkoutSet)
-def update_workout_set(workout_set_id: int, workout_set: WorkoutSet):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cursor.execute(
-            "UPDATE workout_sets SET workout_exercise_id = %s, set_number = %s, reps = %s, weight_kg = %s, duration_seconds = %s, distance_m = %s, height_cm = %s, tempo = %s, notes = %s, completed = %s WHERE id = %s RETURNING *",
-            (workout_set.workout_exercise_id, workout_set.set_number, workout_set.reps, workout_set.weight_kg, workout_set.duration_seconds, workout_set.distance_m, workout_set.height_cm, workout_set.tempo, workout_set.notes, workout_set.completed, workout_set_id)
-        )
-        updated_workout_set_data = cursor.fetchone()
-        conn.commit()
-        cursor.close()
-        conn.close()
+async def update_workout_set(workout_set_id: int, workout_set: WorkoutSet, conn=Depends(get_async_db)):
+    try:
+        async with conn.transaction():
+            # The set may move to another workout exercise; both sides need a refresh
+            previous_we_id = await conn.fetchval("SELECT workout_exercise_id FROM workout_sets WHERE id = $1 FOR UPDATE", workout_set_id)
+            updated_workout_set_data = await conn.fetchrow(
+                "UPDATE workout_sets SET workout_exercise_id = $1, set_number = $2, reps = $3, weight_kg = $4, duration_seconds = $5, distance_m = $6, height_cm = $7, tempo = $8, notes = $9, completed = $10 WHERE id = $11 RETURNING *",
+                workout_set.workout_exercise_id, workout_set.set_number, workout_set.reps, workout_set.weight_kg, workout_set.duration_seconds, workout_set.distance_m, workout_set.height_cm, workout_set.tempo, workout_set.notes, workout_set.completed, workout_set_id
+            )
+            if updated_workout_set_data is not None:
+                await _refresh_exercise_summaries(conn, {previous_we_id, workout_set.workout_exercise_id})
         if updated_workout_set_data is None:
             raise HTTPException(status_code=404, detail="Workout set not found")
         return WorkoutSet(**updated_workout_set_data)
@@ -1909,25 +2379,21 @@ def update_workout_set(workout_set_id: int, workout_set: WorkoutSet):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/workout_sets/{workout_set_id}", status_code=204)
-def delete_workout_set(workout_set_id: int):
+async def delete_workout_set(workout_set_id: int, conn=Depends(get_async_db)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM workout_sets WHERE id = %s RETURNING id", (workout_set_id,))
-        deleted_id = cursor.fetchone()
-        conn.commit()
-        cursor.close()
-        conn.close()
-        if deleted_id is None:
+        async with conn.transaction():
+            deleted_we_id = await conn.fetchval("DELETE FROM workout_sets WHERE id = $1 RETURNING workout_exercise_id", workout_set_id)
+            if deleted_we_id is not None:
+                await _refresh_exercise_summaries(conn, [deleted_we_id])
+        if deleted_we_id is None:
             raise HTTPException(status_code=404, detail="Workout set not found")
         return
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/routine_exercises/", response_model=RoutineExercise)
-def create_routine_exercise(routine_exercise: RoutineExercise):
+def create_routine_exercise(routine_exercise: RoutineExercise, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "INSERT INTO routine_exercises (routine_id, exercise_id, sequence, suggested_sets, suggested_reps, suggested_weight_percent, rest_period_seconds) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING *",
@@ -1936,20 +2402,17 @@ def create_routine_exercise(routine_exercise: RoutineExercise):
         new_routine_exercise_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         return RoutineExercise(**new_routine_exercise_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/routine_exercises/{routine_exercise_id}", response_model=RoutineExercise)
-def get_routine_exercise(routine_exercise_id: int):
+def get_routine_exercise(routine_exercise_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM routine_exercises WHERE id = %s", (routine_exercise_id,))
         routine_exercise_data = cursor.fetchone()
         cursor.close()
-        conn.close()
         if routine_exercise_data is None:
             raise HTTPException(status_code=404, detail="Routine exercise not found")
         return RoutineExercise(**routine_exercise_data)
@@ -1957,22 +2420,19 @@ def get_routine_exercise(routine_exercise_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/routine_exercises/", response_model=List[RoutineExercise])
-def get_routine_exercises():
+def get_routine_exercises(conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute("SELECT * FROM routine_exercises")
         routine_exercises_data = cursor.fetchall()
         cursor.close()
-        conn.close()
         return [RoutineExercise(**re) for re in routine_exercises_data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/routine_exercises/{routine_exercise_id}", response_model=RoutineExercise)
-def update_routine_exercise(routine_exercise_id: int, routine_exercise: RoutineExercise):
+def update_routine_exercise(routine_exercise_id: int, routine_exercise: RoutineExercise, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cursor.execute(
             "UPDATE routine_exercises SET routine_id = %s, exercise_id = %s, sequence = %s, suggested_sets = %s, suggested_reps = %s, suggested_weight_percent = %s, rest_period_seconds = %s WHERE id = %s RETURNING *",
@@ -1981,7 +2441,6 @@ def update_routine_exercise(routine_exercise_id: int, routine_exercise: RoutineE
         updated_routine_exercise_data = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if updated_routine_exercise_data is None:
             raise HTTPException(status_code=404, detail="Routine exercise not found")
         return RoutineExercise(**updated_routine_exercise_data)
@@ -1989,15 +2448,13 @@ def update_routine_exercise(routine_exercise_id: int, routine_exercise: RoutineE
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/routine_exercises/{routine_exercise_id}", status_code=204)
-def delete_routine_exercise(routine_exercise_id: int):
+def delete_routine_exercise(routine_exercise_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM routine_exercises WHERE id = %s RETURNING id", (routine_exercise_id,))
         deleted_id = cursor.fetchone()
         conn.commit()
         cursor.close()
-        conn.close()
         if deleted_id is None:
             raise HTTPException(status_code=404, detail="Routine exercise not found")
         return
@@ -2013,6 +2470,10 @@ FITBIT_REDIRECT_URI = "http://localhost:8000/auth/fitbit/callback"
 FITBIT_TOKEN_URL = "https://api.fitbit.com/oauth2/token"
 FITBIT_AUTH_URL = "https://www.fitbit.com/oauth2/authorize"
 
+def _epoch_seconds():
+    # `time` in this module is datetime.time, so no time.time() here
+    return int(datetime.now().timestamp())
+
 @app.get("/auth/fitbit/login")
 def fitbit_login(user_id: int):
     # Scope: weight, heartrate, activity, sleep, profile, location, settings, nutrition, oxygen_saturation, respiratory_rate, temperature
@@ -2047,9 +2508,8 @@ async def fitbit_callback(code: str, state: str):
         "code": code
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(FITBIT_TOKEN_URL, headers=headers, data=data)
-        
+    response = await fitbit.request("POST", FITBIT_TOKEN_URL, headers=headers, data=data)
+
     if response.status_code != 200:
         raise HTTPException(status_code=400, detail=f"Failed to retrieve token: {response.text}")
         
@@ -2058,28 +2518,24 @@ async def fitbit_callback(code: str, state: str):
     refresh_token = token_data["refresh_token"]
     expires_in = token_data["expires_in"]
     scope = token_data["scope"]
-    expires_at = int(time.time()) + expires_in
+    expires_at = _epoch_seconds() + expires_in
     
     # Save to DB
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO user_fitbit_auth (user_id, access_token, refresh_token, expires_at, scope)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (user_id) DO UPDATE SET
-            access_token = EXCLUDED.access_token,
-            refresh_token = EXCLUDED.refresh_token,
-            expires_at = EXCLUDED.expires_at,
-            scope = EXCLUDED.scope,
-            updated_at = CURRENT_TIMESTAMP
-            """,
-            (user_id, access_token, refresh_token, expires_at, scope)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        async with async_db_connection() as conn:
+            await conn.execute(
+                """
+                INSERT INTO user_fitbit_auth (user_id, access_token, refresh_token, expires_at, scope)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (user_id) DO UPDATE SET
+                access_token = EXCLUDED.access_token,
+                refresh_token = EXCLUDED.refresh_token,
+                expires_at = EXCLUDED.expires_at,
+                scope = EXCLUDED.scope,
+                updated_at = CURRENT_TIMESTAMP
+                """,
+                user_id, access_token, refresh_token, expires_at, scope
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
@@ -2087,14 +2543,12 @@ async def fitbit_callback(code: str, state: str):
     return RedirectResponse("http://localhost:5173/management?fitbit_connected=true")
 
 @app.get("/fitbit/status/{user_id}")
-def get_fitbit_status(user_id: int):
+def get_fitbit_status(user_id: int, conn=Depends(get_db)):
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM user_fitbit_auth WHERE user_id = %s", (user_id,))
         record = cursor.fetchone()
         cursor.close()
-        conn.close()
         return {"connected": record is not None}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2110,9 +2564,8 @@ async def _refresh_fitbit_token(user_id: int, refresh_token: str):
         "refresh_token": refresh_token
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(FITBIT_TOKEN_URL, headers=headers, data=data)
-        
+    response = await fitbit.request("POST", FITBIT_TOKEN_URL, headers=headers, data=data)
+
     if response.status_code != 200:
          # Token might be revoked or really expired
          print(f"Failed to refresh token: {response.text}")
@@ -2121,59 +2574,301 @@ async def _refresh_fitbit_token(user_id: int, refresh_token: str):
     token_data = response.json()
     return token_data
 
+# Token refresh is single-flight within a process: an asyncio lock per user
+# serializes callers and the rest read the first caller's result. No
+# connection or transaction is held across the Fitbit call; the new tokens
+# are written back only if the refresh token is still the one that was
+# spent, so a worker that lost a race keeps the winner's tokens (Fitbit hands
+# the same pair back for a refresh token reused shortly after rotation).
+FITBIT_REFRESH_MARGIN = int(os.getenv("FITBIT_REFRESH_MARGIN_SECONDS", "900"))
+FITBIT_REFRESH_CHECK_INTERVAL = int(os.getenv("FITBIT_REFRESH_CHECK_INTERVAL_SECONDS", "300"))
+
+_fitbit_refresh_locks = defaultdict(asyncio.Lock)
+
+async def _read_fitbit_auth(user_id: int):
+    async with async_db_connection() as conn:
+        auth_data = await conn.fetchrow(
+            "SELECT access_token, refresh_token, expires_at FROM user_fitbit_auth WHERE user_id = $1", user_id
+        )
+    if not auth_data:
+        raise HTTPException(status_code=404, detail="User not connected to Fitbit")
+    return auth_data
+
+async def _refresh_fitbit_token_once(user_id: int, margin: int = 0):
+    """Refresh the stored token unless it is valid for ``margin`` more seconds; returns the access token."""
+    async with _fitbit_refresh_locks[user_id]:
+        # Re-read under the lock: another caller may have just refreshed it
+        auth_data = await _read_fitbit_auth(user_id)
+        if auth_data['expires_at'] - margin > _epoch_seconds():
+            return auth_data['access_token']
+
+        new_tokens = await _refresh_fitbit_token(user_id, auth_data['refresh_token'])
+        if not new_tokens:
+            # Another worker may have rotated the token while we were asking
+            current = await _read_fitbit_auth(user_id)
+            if current['refresh_token'] != auth_data['refresh_token'] and current['expires_at'] > _epoch_seconds():
+                return current['access_token']
+            raise HTTPException(status_code=401, detail="Token expired and refresh failed")
+
+        async with async_db_connection() as conn:
+            stored = await conn.fetchval(
+                """
+                UPDATE user_fitbit_auth SET access_token = $1, refresh_token = $2, expires_at = $3, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = $4 AND refresh_token = $5
+                RETURNING access_token
+                """,
+                new_tokens['access_token'], new_tokens['refresh_token'], _epoch_seconds() + new_tokens['expires_in'],
+                user_id, auth_data['refresh_token']
+            )
+        if stored is None:
+            # Lost the race: the row already holds another worker's tokens
+            return (await _read_fitbit_auth(user_id))['access_token']
+        return stored
+
+async def _fitbit_access_token(user_id: int):
+    auth_data = await _read_fitbit_auth(user_id)
+    if _epoch_seconds() < auth_data['expires_at']:
+        return auth_data['access_token']
+    # Normally _fitbit_token_refresher got here first; this covers a refresher that is behind
+    return await _refresh_fitbit_token_once(user_id)
+
+async def _fitbit_token_refresher():
+    """Background task refreshing tokens that expire within FITBIT_REFRESH_MARGIN seconds."""
+    while True:
+        try:
+            async with async_db_connection() as conn:
+                rows = await conn.fetch(
+                    "SELECT user_id FROM user_fitbit_auth WHERE expires_at < $1",
+                    _epoch_seconds() + FITBIT_REFRESH_MARGIN
+                )
+            for row in rows:
+                try:
+                    await _refresh_fitbit_token_once(row['user_id'], margin=FITBIT_REFRESH_MARGIN)
+                except HTTPException as e:
+                    print(f"Could not refresh Fitbit token for user {row['user_id']}: {e.detail}")
+        except Exception as e:
+            print(f"Fitbit token refresher error: {e}")
+        await asyncio.sleep(FITBIT_REFRESH_CHECK_INTERVAL)
+
+async def _fetch_fitbit_heartrate_day(user_id: int, day: date, retries: int = 0, max_retry_delay: float = fitbit.FITBIT_MAX_RETRY_DELAY):
+    """Pull one day of 1-minute heart rate from Fitbit into the cache and return the cached row."""
+    access_token = await _fitbit_access_token(user_id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+    # "1min" intraday detail is available to Personal apps
+    url = f"/1/user/-/activities/heart/date/{day.isoformat()}/1d/1min.json"
+    response = await fitbit.request("GET", url, retries=retries, max_retry_delay=max_retry_delay, headers=headers)
+
+    if response.status_code == 429:
+        raise HTTPException(status_code=429, detail="Fitbit rate limit reached",
+                            headers={"Retry-After": str(int(fitbit.retry_delay(response, 0)))})
+    if response.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"Fitbit API error: {response.text}")
+
+    async with async_db_connection() as conn:
+        return await heartrate.store_day(conn, user_id, day, response.json())
+
+async def _load_heartrate_day(user_id: int, day: date):
+    """Cached heart-rate row for a day, refetched from Fitbit only when stale (see heartrate.is_fresh)."""
+    async with async_db_connection() as conn:
+        cached = await heartrate.get_day(conn, user_id, day)
+    if cached and heartrate.is_fresh(day, cached['fetched_at']):
+        return cached
+    return await _fetch_fitbit_heartrate_day(user_id, day)
+
+FITBIT_BACKFILL_CONCURRENCY = int(os.getenv("FITBIT_BACKFILL_CONCURRENCY", str(fitbit.FITBIT_MAX_CONCURRENCY)))
+# The HTTP backfill never parks a worker on Fitbit's hourly rate-limit reset
+FITBIT_BACKFILL_ENDPOINT_MAX_RETRY_DELAY = float(os.getenv("FITBIT_BACKFILL_ENDPOINT_MAX_RETRY_DELAY", "5"))
+
+class HeartrateBackfillResult(BaseModel):
+    workout_days: int
+    already_cached: int
+    fetched: List[date]
+    failed: dict  # ISO date -> error
+    pending: List[date] = []  # not attempted after Fitbit's rate limit was reached
+    retry_after: Optional[int] = None  # seconds until Fitbit accepts requests again
+
+async def backfill_heartrate(user_id: int, date_from: date, date_to: date, concurrency: int = FITBIT_BACKFILL_CONCURRENCY,
+                             max_retry_delay: float = fitbit.FITBIT_MAX_RETRY_DELAY):
+    """Cache heart rate for every day in the range that has a workout and no final cached copy.
+
+    Days are fetched concurrently (at most ``concurrency`` at a time, and never
+    more than fitbit.FITBIT_MAX_CONCURRENCY requests in flight), retrying
+    rate-limited requests after the delay Fitbit asks for as long as it is at
+    most ``max_retry_delay`` seconds. Past that the backfill stops and the
+    days not fetched yet come back as ``pending``.
+    """
+    async with async_db_connection() as conn:
+        rows = await conn.fetch("""
+            SELECT DISTINCT w.date, h.fetched_at
+            FROM workouts w
+            LEFT JOIN fitbit_heartrate_days h ON h.user_id = w.user_id AND h.date = w.date
+            WHERE w.user_id = $1 AND w.date BETWEEN $2 AND $3
+            ORDER BY w.date
+        """, user_id, date_from, date_to)
+    missing = [r['date'] for r in rows if r['fetched_at'] is None or not heartrate.is_fresh(r['date'], r['fetched_at'])]
+
+    # Refresh the token up front rather than in every concurrent fetch
+    if missing:
+        await _fitbit_access_token(user_id)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    retry_after = None
+    pending = []
+
+    async def fetch(day):
+        nonlocal retry_after
+        async with semaphore:
+            if retry_after is not None:
+                pending.append(day)
+                return day, None
+            try:
+                await _fetch_fitbit_heartrate_day(user_id, day, retries=fitbit.FITBIT_MAX_RETRIES, max_retry_delay=max_retry_delay)
+                return day, None
+            except HTTPException as e:
+                if e.status_code == 429:
+                    retry_after = int(e.headers["Retry-After"])
+                    pending.append(day)
+                    return day, None
+                return day, str(e.detail)
+            except Exception as e:
+                return day, str(e)
+
+    results = await asyncio.gather(*(fetch(day) for day in missing))
+    return HeartrateBackfillResult(
+        workout_days=len(rows),
+        already_cached=len(rows) - len(missing),
+        fetched=[day for day, error in results if error is None and day not in pending],
+        failed={day.isoformat(): error for day, error in results if error is not None},
+        pending=sorted(pending),
+        retry_after=retry_after,
+    )
+
+@app.post("/fitbit/heartrate/{user_id}/backfill", response_model=HeartrateBackfillResult)
+async def backfill_fitbit_heartrate(
+    user_id: int,
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+):
+    """Fill the heart-rate cache for the workout days in a range; see backfill_heartrate.py for long ranges.
+
+    Once Fitbit's rate limit is reached the response lists the remaining days
+    as ``pending`` with ``retry_after`` instead of waiting for the reset.
+    """
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    try:
+        return await backfill_heartrate(user_id, date_from, date_to, max_retry_delay=FITBIT_BACKFILL_ENDPOINT_MAX_RETRY_DELAY)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/fitbit/heartrate/{user_id}/{date_str}")
 async def get_fitbit_heartrate(user_id: int, date_str: str):
     # date_str format: YYYY-MM-DD
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cursor.execute("SELECT * FROM user_fitbit_auth WHERE user_id = %s", (user_id,))
-        auth_data = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if not auth_data:
-            raise HTTPException(status_code=404, detail="User not connected to Fitbit")
-            
-        access_token = auth_data['access_token']
-        refresh_token = auth_data['refresh_token']
-        expires_at = auth_data['expires_at']
-        
-        # Check if expired
-        if int(time.time()) > expires_at:
-            print("Token expired, refreshing...")
-            new_tokens = await _refresh_fitbit_token(user_id, refresh_token)
-            if new_tokens:
-                access_token = new_tokens['access_token']
-                # Update DB
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE user_fitbit_auth SET access_token = %s, refresh_token = %s, expires_at = %s WHERE user_id = %s",
-                    (new_tokens['access_token'], new_tokens['refresh_token'], int(time.time()) + new_tokens['expires_in'], user_id)
-                )
-                conn.commit()
-                cursor.close()
-                conn.close()
-            else:
-                 raise HTTPException(status_code=401, detail="Token expired and refresh failed")
-
-        # Fetch data
-        headers = {"Authorization": f"Bearer {access_token}"}
-        # Get Heart Rate Intraday for the day (if we want detailed) or just summary
-        # For workout overlay, we probably want intraday. 
-        # Note: Intraday might require specific permissions or "Personal" app type.
-        # Let's try to get the standard heart rate series.
-        # "1min" detail level is usually available for Personal apps.
-        url = f"https://api.fitbit.com/1/user/-/activities/heart/date/{date_str}/1d/1min.json"
-        
-        async with httpx.AsyncClient() as client:
-             response = await client.get(url, headers=headers)
-             
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail=f"Fitbit API error: {response.text}")
-            
-        return response.json()
-        
+        day = date.fromisoformat(date_str)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+    try:
+        row = await _load_heartrate_day(user_id, day)
+        return heartrate.to_fitbit_json(day, row['samples'], row['resting_heart_rate'])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class HeartrateZone(BaseModel):
+    name: str
+    min_bpm: int
+    max_bpm: Optional[int] = None
+    minutes: int
+
+class ExerciseHeartrate(BaseModel):
+    workout_exercise_id: int
+    exercise_id: int
+    name: str
+    start: str
+    end: str
+    avg_bpm: Optional[float] = None
+    max_bpm: Optional[int] = None
+
+class WorkoutHeartrate(BaseModel):
+    workout_id: int
+    date: date
+    start: str
+    end: str
+    interval_seconds: int = 60
+    bpm: List[Optional[int]]  # one per minute from start, null where the tracker recorded nothing
+    avg_bpm: Optional[float] = None
+    max_bpm: Optional[int] = None
+    minutes_with_data: int
+    max_hr: int
+    zones: List[HeartrateZone]
+    exercises: List[ExerciseHeartrate]
+
+@app.get("/workouts/{workout_id}/heartrate", response_model=WorkoutHeartrate)
+async def get_workout_heartrate(workout_id: int, max_hr: Optional[int] = Query(None, ge=100, le=250)):
+    """Heart rate during a workout: the minute samples inside the session plus summary metrics.
+
+    Time in zones uses ``max_hr`` (default HEARTRATE_MAX_BPM). Sets carry no
+    timestamps, so per-exercise figures split the session between exercises in
+    order, in proportion to their set counts.
+    """
+    try:
+        # Released before _load_heartrate_day, which may wait on Fitbit: a
+        # pooled connection is never held across the HTTP call
+        async with async_db_connection() as conn:
+            workout = await conn.fetchrow("SELECT id, user_id, date, start_time, end_time FROM workouts WHERE id = $1", workout_id)
+            if workout is None:
+                raise HTTPException(status_code=404, detail="Workout not found")
+            if workout['start_time'] is None:
+                raise HTTPException(status_code=400, detail="Workout has no start time")
+
+            exercises = await conn.fetch("""
+                SELECT we.id, we.exercise_id, e.name, COUNT(ws.id) AS set_count
+                FROM workout_exercises we
+                JOIN exercises e ON we.exercise_id = e.id
+                LEFT JOIN workout_sets ws ON ws.workout_exercise_id = we.id
+                WHERE we.workout_id = $1
+                GROUP BY we.id, e.name
+                ORDER BY we.sequence
+            """, workout_id)
+
+        now = datetime.now()
+        now_minute = heartrate.minute_of_day(now) if workout['date'] == now.date() else None
+        start, end = heartrate.session_window(workout['start_time'], workout['end_time'], now_minute)
+
+        row = await _load_heartrate_day(workout['user_id'], workout['date'])
+        samples = row['samples']
+        max_hr = max_hr or heartrate.DEFAULT_MAX_HR
+        summary = heartrate.summarize(samples, start, end, max_hr)
+
+        segments = heartrate.split_window(start, end, [ex['set_count'] for ex in exercises])
+        exercise_summaries = []
+        for ex, (seg_start, seg_end) in zip(exercises, segments):
+            seg = heartrate.summarize(samples, seg_start, seg_end, max_hr)
+            exercise_summaries.append({
+                "workout_exercise_id": ex['id'],
+                "exercise_id": ex['exercise_id'],
+                "name": ex['name'],
+                "start": heartrate.format_minute(seg_start),
+                "end": heartrate.format_minute(seg_end),
+                "avg_bpm": seg['avg_bpm'],
+                "max_bpm": seg['max_bpm'],
+            })
+
+        return {
+            "workout_id": workout_id,
+            "date": workout['date'],
+            "start": heartrate.format_minute(start),
+            "end": heartrate.format_minute(end),
+            "bpm": [bpm or None for bpm in samples[start:end]],
+            "max_hr": max_hr,
+            **summary,
+            "exercises": exercise_summaries,
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,93 @@
+-- Per-(user, exercise) performance summary, maintained incrementally by the
+-- workout set write paths and rebuildable with rebuild_exercise_summaries().
+
+CREATE TABLE IF NOT EXISTS exercise_summaries (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    exercise_id INTEGER NOT NULL REFERENCES exercises(id) ON DELETE CASCADE,
+    -- Heaviest set (ties broken by reps, then most recent)
+    best_set_id INTEGER,
+    best_weight_kg NUMERIC(6, 2),
+    best_reps INTEGER,
+    -- Epley: weight * (1 + reps / 30), best over all sets
+    estimated_1rm NUMERIC(7, 2),
+    last_performed DATE,
+    workout_count INTEGER NOT NULL DEFAULT 0,
+    total_sets INTEGER NOT NULL DEFAULT 0,
+    total_reps INTEGER NOT NULL DEFAULT 0,
+    total_volume_kg NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, exercise_id)
+);
+
+-- Single definition of the summary, used by both the incremental refresh and the full rebuild
+CREATE OR REPLACE VIEW exercise_summary_source AS
+SELECT agg.user_id, agg.exercise_id,
+       best.set_id AS best_set_id, best.weight_kg AS best_weight_kg, best.reps AS best_reps,
+       agg.estimated_1rm, agg.last_performed, agg.workout_count,
+       agg.total_sets, agg.total_reps, agg.total_volume_kg
+FROM (
+    SELECT w.user_id, we.exercise_id,
+           ROUND(MAX(ws.weight_kg * (1 + ws.reps / 30.0)), 2) AS estimated_1rm,
+           MAX(w.date) AS last_performed,
+           COUNT(DISTINCT w.id) AS workout_count,
+           COUNT(ws.id) AS total_sets,
+           COALESCE(SUM(ws.reps), 0) AS total_reps,
+           COALESCE(SUM(ws.reps * ws.weight_kg), 0) AS total_volume_kg
+    FROM workout_sets ws
+    JOIN workout_exercises we ON ws.workout_exercise_id = we.id
+    JOIN workouts w ON we.workout_id = w.id
+    GROUP BY w.user_id, we.exercise_id
+) agg
+LEFT JOIN LATERAL (
+    SELECT ws.id AS set_id, ws.weight_kg, ws.reps
+    FROM workout_sets ws
+    JOIN workout_exercises we ON ws.workout_exercise_id = we.id
+    JOIN workouts w ON we.workout_id = w.id
+    WHERE w.user_id = agg.user_id AND we.exercise_id = agg.exercise_id AND ws.weight_kg IS NOT NULL
+    ORDER BY ws.weight_kg DESC, ws.reps DESC NULLS LAST, w.date DESC
+    LIMIT 1
+) best ON TRUE;
+
+CREATE OR REPLACE FUNCTION refresh_exercise_summary(p_user_id INTEGER, p_exercise_id INTEGER) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO exercise_summaries (user_id, exercise_id, best_set_id, best_weight_kg, best_reps, estimated_1rm,
+                                    last_performed, workout_count, total_sets, total_reps, total_volume_kg, updated_at)
+    SELECT user_id, exercise_id, best_set_id, best_weight_kg, best_reps, estimated_1rm,
+           last_performed, workout_count, total_sets, total_reps, total_volume_kg, CURRENT_TIMESTAMP
+    FROM exercise_summary_source
+    WHERE user_id = p_user_id AND exercise_id = p_exercise_id
+    ON CONFLICT (user_id, exercise_id) DO UPDATE SET
+        best_set_id = EXCLUDED.best_set_id,
+        best_weight_kg = EXCLUDED.best_weight_kg,
+        best_reps = EXCLUDED.best_reps,
+        estimated_1rm = EXCLUDED.estimated_1rm,
+        last_performed = EXCLUDED.last_performed,
+        workout_count = EXCLUDED.workout_count,
+        total_sets = EXCLUDED.total_sets,
+        total_reps = EXCLUDED.total_reps,
+        total_volume_kg = EXCLUDED.total_volume_kg,
+        updated_at = EXCLUDED.updated_at;
+
+    -- No sets left for this exercise
+    IF NOT FOUND THEN
+        DELETE FROM exercise_summaries WHERE user_id = p_user_id AND exercise_id = p_exercise_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rebuild_exercise_summaries() RETURNS INTEGER AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    DELETE FROM exercise_summaries;
+    INSERT INTO exercise_summaries (user_id, exercise_id, best_set_id, best_weight_kg, best_reps, estimated_1rm,
+                                    last_performed, workout_count, total_sets, total_reps, total_volume_kg)
+    SELECT user_id, exercise_id, best_set_id, best_weight_kg, best_reps, estimated_1rm,
+           last_performed, workout_count, total_sets, total_reps, total_volume_kg
+    FROM exercise_summary_source;
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_exercise_summaries();
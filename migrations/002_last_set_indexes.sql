@@ -0,0 +1,11 @@
+-- Covering indexes for the previous-set lookup (GET /exercises/{id}/last_set and
+-- GET /exercises/last_sets): the exercise -> workout_exercises -> workout_sets
+-- steps are answered from the indexes alone; workouts is reached by primary key.
+
+-- exercise_id filter, carrying the join keys to workouts and workout_sets
+CREATE INDEX IF NOT EXISTS idx_workout_exercises_exercise_workout
+    ON workout_exercises (exercise_id, workout_id) INCLUDE (id);
+
+-- Join on workout_exercise_id + set_number filter, carrying the returned values
+CREATE INDEX IF NOT EXISTS idx_workout_sets_exercise_set_number
+    ON workout_sets (workout_exercise_id, set_number) INCLUDE (weight_kg, reps);
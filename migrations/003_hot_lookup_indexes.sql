@@ -0,0 +1,34 @@
+-- Secondary indexes for the hot lookup columns. Postgres does not index the
+-- referencing side of a foreign key, so without these every tree load and
+-- delete cascade falls back to a sequential scan.
+--
+-- Already covered by 002_last_set_indexes.sql (leading column):
+--   workout_exercises.exercise_id   -> idx_workout_exercises_exercise_workout
+--   workout_sets.workout_exercise_id -> idx_workout_sets_exercise_set_number
+
+-- Workout tree loads and workout deletes; sequence serves the ORDER BY
+CREATE INDEX IF NOT EXISTS idx_workout_exercises_workout
+    ON workout_exercises (workout_id, sequence);
+
+-- Routine schedule / day loads; sequence serves the ORDER BY
+CREATE INDEX IF NOT EXISTS idx_routine_exercises_routine_day
+    ON routine_exercises (routine_day_id, sequence);
+
+-- Exercise usage counts and exercise merges/deletes
+CREATE INDEX IF NOT EXISTS idx_routine_exercises_exercise
+    ON routine_exercises (exercise_id);
+
+-- Per-user history by date; trailing columns match the GET /workouts/
+-- keyset ordering so pages are read straight off the index
+CREATE INDEX IF NOT EXISTS idx_workouts_user_date
+    ON workouts (user_id, date DESC, (COALESCE(start_time, '00:00'::time)) DESC, id DESC);
+
+-- Active-workout lookup: only unfinished workouts are indexed
+CREATE INDEX IF NOT EXISTS idx_workouts_user_active
+    ON workouts (user_id, date DESC, start_time DESC)
+    WHERE end_time IS NULL;
+
+ANALYZE workouts;
+ANALYZE workout_exercises;
+ANALYZE workout_sets;
+ANALYZE routine_exercises;
@@ -0,0 +1,20 @@
+-- Background CSV imports (POST /workouts/import?background=true). Jobs run in
+-- the API process; this table is their status record, polled via GET /jobs/{id}.
+
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    filename VARCHAR(255),
+    -- 'queued', 'running', 'succeeded' or 'failed'
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    rows_processed INTEGER NOT NULL DEFAULT 0,
+    batches INTEGER NOT NULL DEFAULT 0,
+    workouts_imported INTEGER NOT NULL DEFAULT 0,
+    workouts_skipped INTEGER NOT NULL DEFAULT 0,
+    skipped_details JSONB NOT NULL DEFAULT '[]',
+    errors JSONB NOT NULL DEFAULT '[]',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
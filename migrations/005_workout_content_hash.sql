@@ -0,0 +1,43 @@
+-- SHA-256 of the source content a workout was imported from (importer.content_hash).
+-- A re-import skips sessions whose hash is unchanged and rewrites the others in place.
+-- NULL for workouts logged in the app or imported before this migration.
+ALTER TABLE workouts ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_workouts_user_content_hash
+    ON workouts (user_id, content_hash)
+    WHERE content_hash IS NOT NULL;
+
+ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS workouts_updated INTEGER NOT NULL DEFAULT 0;
+
+-- An imported session is identified by (user_id, date, start_time): the
+-- import dedups against this key with one anti-join and relies on the unique
+-- index for INSERT ... ON CONFLICT. Workouts logged in the app (content_hash
+-- NULL) may share a date and start time and are never constrained.
+--
+-- Imported duplicates of one session would block the index. Keep the oldest
+-- as the import target and demote the rest to app-logged so no workout data
+-- is removed; the notice lists what was demoted.
+DO $$
+DECLARE
+    demoted INTEGER[];
+BEGIN
+    WITH ranked AS (
+        SELECT id, row_number() OVER (PARTITION BY user_id, date, start_time ORDER BY id) AS occurrence
+        FROM workouts
+        WHERE content_hash IS NOT NULL AND start_time IS NOT NULL
+    ), updated AS (
+        UPDATE workouts w SET content_hash = NULL
+        FROM ranked r
+        WHERE w.id = r.id AND r.occurrence > 1
+        RETURNING w.id
+    )
+    SELECT array_agg(id ORDER BY id) INTO demoted FROM updated;
+    IF demoted IS NOT NULL THEN
+        RAISE NOTICE 'Duplicate imported sessions kept as app-logged workouts: %', demoted;
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_workouts_user_imported_session
+    ON workouts (user_id, date, start_time)
+    WHERE content_hash IS NOT NULL;
@@ -0,0 +1,34 @@
+-- Cheap change detection for cached read models. Statement-level triggers bump
+-- a counter per cache key on every write, whichever code path made it, so each
+-- API worker can tell whether its in-memory copy is stale with one PK lookup.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    name VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES (TG_ARGV[0], 1)
+    ON CONFLICT (name) DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Exercise catalog: exercises joined with their muscle names
+DROP TRIGGER IF EXISTS exercises_catalog_version ON exercises;
+CREATE TRIGGER exercises_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON exercises
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('exercise_catalog');
+
+DROP TRIGGER IF EXISTS exercise_muscles_catalog_version ON exercise_muscles;
+CREATE TRIGGER exercise_muscles_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON exercise_muscles
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('exercise_catalog');
+
+DROP TRIGGER IF EXISTS muscles_catalog_version ON muscles;
+CREATE TRIGGER muscles_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON muscles
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('exercise_catalog');
+
+INSERT INTO table_versions (name) VALUES ('exercise_catalog') ON CONFLICT (name) DO NOTHING;
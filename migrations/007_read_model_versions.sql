@@ -0,0 +1,35 @@
+-- Version counters for the read-mostly endpoints that serve ETags: routines
+-- (/routines/, /routines/active/schedule) and workout trees (/workouts/{id}).
+-- The exercise_catalog counter from 006 covers exercise names and muscles.
+
+DROP TRIGGER IF EXISTS routines_version ON routines;
+CREATE TRIGGER routines_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON routines
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('routines');
+
+DROP TRIGGER IF EXISTS routine_days_version ON routine_days;
+CREATE TRIGGER routine_days_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON routine_days
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('routines');
+
+DROP TRIGGER IF EXISTS routine_exercises_version ON routine_exercises;
+CREATE TRIGGER routine_exercises_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON routine_exercises
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('routines');
+
+DROP TRIGGER IF EXISTS workouts_version ON workouts;
+CREATE TRIGGER workouts_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON workouts
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('workouts');
+
+DROP TRIGGER IF EXISTS workout_exercises_version ON workout_exercises;
+CREATE TRIGGER workout_exercises_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON workout_exercises
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('workouts');
+
+DROP TRIGGER IF EXISTS workout_sets_version ON workout_sets;
+CREATE TRIGGER workout_sets_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON workout_sets
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('workouts');
+
+INSERT INTO table_versions (name) VALUES ('routines'), ('workouts') ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,87 @@
+-- Change tracking for GET /sync. Every workout, workout_exercise and set row
+-- records when and by which transaction it was last written; deletes leave a
+-- tombstone. A sync token is the xmin of the snapshot that served it, so rows
+-- written by transactions still in flight at that point are picked up by the
+-- next sync instead of being skipped.
+
+CREATE OR REPLACE FUNCTION touch_sync_columns() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    NEW.change_txid := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE workouts
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS change_txid BIGINT NOT NULL DEFAULT txid_current();
+ALTER TABLE workout_exercises
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS change_txid BIGINT NOT NULL DEFAULT txid_current();
+ALTER TABLE workout_sets
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS change_txid BIGINT NOT NULL DEFAULT txid_current();
+
+DROP TRIGGER IF EXISTS workouts_touch_sync ON workouts;
+CREATE TRIGGER workouts_touch_sync
+    BEFORE INSERT OR UPDATE ON workouts
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_columns();
+
+DROP TRIGGER IF EXISTS workout_exercises_touch_sync ON workout_exercises;
+CREATE TRIGGER workout_exercises_touch_sync
+    BEFORE INSERT OR UPDATE ON workout_exercises
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_columns();
+
+DROP TRIGGER IF EXISTS workout_sets_touch_sync ON workout_sets;
+CREATE TRIGGER workout_sets_touch_sync
+    BEFORE INSERT OR UPDATE ON workout_sets
+    FOR EACH ROW EXECUTE FUNCTION touch_sync_columns();
+
+CREATE INDEX IF NOT EXISTS idx_workouts_change_txid ON workouts (change_txid);
+CREATE INDEX IF NOT EXISTS idx_workout_exercises_change_txid ON workout_exercises (change_txid);
+CREATE INDEX IF NOT EXISTS idx_workout_sets_change_txid ON workout_sets (change_txid);
+
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL,
+    row_id INTEGER NOT NULL,
+    user_id INTEGER,
+    change_txid BIGINT NOT NULL DEFAULT txid_current(),
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_change_txid ON sync_tombstones (change_txid);
+
+-- Children are always deleted before their workout, so the owner can still be looked up
+CREATE OR REPLACE FUNCTION record_sync_tombstone() RETURNS TRIGGER AS $$
+DECLARE
+    owner_id INTEGER;
+BEGIN
+    IF TG_TABLE_NAME = 'workouts' THEN
+        owner_id := OLD.user_id;
+    ELSIF TG_TABLE_NAME = 'workout_exercises' THEN
+        SELECT w.user_id INTO owner_id FROM workouts w WHERE w.id = OLD.workout_id;
+    ELSE
+        SELECT w.user_id INTO owner_id
+        FROM workout_exercises we JOIN workouts w ON w.id = we.workout_id
+        WHERE we.id = OLD.workout_exercise_id;
+    END IF;
+    INSERT INTO sync_tombstones (table_name, row_id, user_id) VALUES (TG_TABLE_NAME, OLD.id, owner_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS workouts_sync_tombstone ON workouts;
+CREATE TRIGGER workouts_sync_tombstone
+    AFTER DELETE ON workouts
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+
+DROP TRIGGER IF EXISTS workout_exercises_sync_tombstone ON workout_exercises;
+CREATE TRIGGER workout_exercises_sync_tombstone
+    AFTER DELETE ON workout_exercises
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+
+DROP TRIGGER IF EXISTS workout_sets_sync_tombstone ON workout_sets;
+CREATE TRIGGER workout_sets_sync_tombstone
+    AFTER DELETE ON workout_sets
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
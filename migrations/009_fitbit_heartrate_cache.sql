@@ -0,0 +1,23 @@
+-- Fitbit credentials were created by hand so far; make them part of the schema.
+CREATE TABLE IF NOT EXISTS user_fitbit_auth (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL UNIQUE REFERENCES users(id),
+    access_token TEXT NOT NULL,
+    refresh_token TEXT NOT NULL,
+    expires_at BIGINT NOT NULL, -- unix seconds
+    scope TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- One row per fetched day of 1-minute intraday heart rate (see heartrate.py).
+-- samples holds 1440 bytes, one bpm per minute of the day, 0 where the device
+-- recorded nothing: about 1.4 kB a day instead of ~60 kB of Fitbit JSON.
+CREATE TABLE IF NOT EXISTS fitbit_heartrate_days (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    date DATE NOT NULL,
+    samples BYTEA NOT NULL,
+    resting_heart_rate SMALLINT,
+    fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, date)
+);
@@ -0,0 +1,104 @@
+-- Per-workout version for the /workouts/{id} ETag. The global 'workouts'
+-- counter from 007 made every set write in the app update the same
+-- table_versions row and invalidated the tag of every workout; its triggers
+-- go. The exercise_catalog and routines counters stay.
+
+DROP TRIGGER IF EXISTS workouts_version ON workouts;
+DROP TRIGGER IF EXISTS workout_exercises_version ON workout_exercises;
+DROP TRIGGER IF EXISTS workout_sets_version ON workout_sets;
+DELETE FROM table_versions WHERE name = 'workouts';
+
+ALTER TABLE workouts ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+
+-- Any direct update of the workout row moves its version on
+CREATE OR REPLACE FUNCTION bump_own_workout_version() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.version = OLD.version THEN
+        NEW.version := OLD.version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS workouts_own_version ON workouts;
+CREATE TRIGGER workouts_own_version
+    BEFORE UPDATE ON workouts
+    FOR EACH ROW EXECUTE FUNCTION bump_own_workout_version();
+
+-- A version-only update is a child changing, not the workout row itself:
+-- leave updated_at/change_txid alone so /sync does not re-send the workout
+-- for every set logged. (BEFORE triggers run in name order, so
+-- workouts_own_version has already moved the version when this runs.)
+CREATE OR REPLACE FUNCTION touch_sync_columns() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND to_jsonb(NEW) - 'version' = to_jsonb(OLD) - 'version' THEN
+        RETURN NEW;
+    END IF;
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    NEW.change_txid := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Child writes bump each affected workout once per statement, reading the
+-- transition tables (an update may move a row between workouts, so both
+-- sides count). Deletes cascading from the workout itself match no row.
+CREATE OR REPLACE FUNCTION bump_parent_workout_version() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'workout_exercises' THEN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE workouts SET version = version + 1 WHERE id IN (SELECT workout_id FROM new_rows);
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE workouts SET version = version + 1 WHERE id IN (SELECT workout_id FROM old_rows);
+        ELSE
+            UPDATE workouts SET version = version + 1
+            WHERE id IN (SELECT workout_id FROM new_rows UNION SELECT workout_id FROM old_rows);
+        END IF;
+    ELSE
+        IF TG_OP = 'INSERT' THEN
+            UPDATE workouts SET version = version + 1 WHERE id IN (
+                SELECT we.workout_id FROM workout_exercises we JOIN new_rows r ON r.workout_exercise_id = we.id);
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE workouts SET version = version + 1 WHERE id IN (
+                SELECT we.workout_id FROM workout_exercises we JOIN old_rows r ON r.workout_exercise_id = we.id);
+        ELSE
+            UPDATE workouts SET version = version + 1 WHERE id IN (
+                SELECT we.workout_id FROM workout_exercises we
+                JOIN (SELECT workout_exercise_id FROM new_rows UNION SELECT workout_exercise_id FROM old_rows) r
+                    ON r.workout_exercise_id = we.id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow a single event per trigger, hence three of each
+DROP TRIGGER IF EXISTS workout_exercises_insert_workout_version ON workout_exercises;
+CREATE TRIGGER workout_exercises_insert_workout_version
+    AFTER INSERT ON workout_exercises REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_workout_version();
+
+DROP TRIGGER IF EXISTS workout_exercises_update_workout_version ON workout_exercises;
+CREATE TRIGGER workout_exercises_update_workout_version
+    AFTER UPDATE ON workout_exercises REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_workout_version();
+
+DROP TRIGGER IF EXISTS workout_exercises_delete_workout_version ON workout_exercises;
+CREATE TRIGGER workout_exercises_delete_workout_version
+    AFTER DELETE ON workout_exercises REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_workout_version();
+
+DROP TRIGGER IF EXISTS workout_sets_insert_workout_version ON workout_sets;
+CREATE TRIGGER workout_sets_insert_workout_version
+    AFTER INSERT ON workout_sets REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_workout_version();
+
+DROP TRIGGER IF EXISTS workout_sets_update_workout_version ON workout_sets;
+CREATE TRIGGER workout_sets_update_workout_version
+    AFTER UPDATE ON workout_sets REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_workout_version();
+
+DROP TRIGGER IF EXISTS workout_sets_delete_workout_version ON workout_sets;
+CREATE TRIGGER workout_sets_delete_workout_version
+    AFTER DELETE ON workout_sets REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_parent_workout_version();
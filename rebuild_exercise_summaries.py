@@ -0,0 +1,37 @@
+import psycopg2
+import os
+
+# Default env vars (docker-compose provides its own)
+os.environ.setdefault("DB_NAME", "workouts")
+os.environ.setdefault("DB_USER", "user")
+os.environ.setdefault("DB_PASSWORD", "password")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+
+def get_db_connection():
+    return psycopg2.connect(
+        dbname=os.environ.get("DB_NAME"),
+        user=os.environ.get("DB_USER"),
+        password=os.environ.get("DB_PASSWORD"),
+        host=os.environ.get("DB_HOST"),
+        port=os.environ.get("DB_PORT")
+    )
+
+def rebuild_exercise_summaries():
+    """Recompute every exercise_summaries row from workout_sets (after bulk imports or manual SQL edits)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT rebuild_exercise_summaries()")
+        count = cursor.fetchone()[0]
+        conn.commit()
+        print(f"Rebuilt {count} exercise summaries.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    rebuild_exercise_summaries()
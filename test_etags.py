@@ -0,0 +1,107 @@
+from fastapi.testclient import TestClient
+
+from main import app, get_async_db, get_db
+
+# /muscles/ is tagged from the exercise_catalog counter; a client presenting
+# the current tag gets 304 after the version lookup alone.
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def execute(self, sql, params=None):
+        self.conn.queries.append(sql)
+        if "FROM table_versions" in sql:
+            self.result = [(name, self.conn.version) for name in params[0]]
+        elif "FROM muscles" in sql:
+            self.result = [{'id': 1, 'name': 'Chest'}]
+        else:
+            self.result = []
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+        self.version = 7
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+
+def _client(conn):
+    app.dependency_overrides[get_db] = lambda: conn
+    return TestClient(app)
+
+
+def teardown_function():
+    app.dependency_overrides.clear()
+
+
+def test_etag_and_not_modified():
+    conn = FakeConnection()
+    client = _client(conn)
+
+    first = client.get("/muscles/")
+    assert first.status_code == 200
+    assert first.headers["etag"] == '"exercise_catalog.7"'
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert first.json() == [{'id': 1, 'name': 'Chest'}]
+
+    conn.queries.clear()
+    repeat = client.get("/muscles/", headers={"If-None-Match": first.headers["etag"]})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == first.headers["etag"]
+    assert len(conn.queries) == 1
+
+
+def test_changed_version_returns_body():
+    conn = FakeConnection()
+    client = _client(conn)
+    etag = client.get("/muscles/").headers["etag"]
+
+    conn.version += 1
+    response = client.get("/muscles/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"exercise_catalog.8"'
+
+
+class FakeAsyncConnection:
+    def __init__(self, workout_versions):
+        self.workout_versions = workout_versions
+
+    async def fetch(self, sql, *args):
+        if "FROM table_versions" in sql:
+            return [{'name': name, 'version': 7} for name in args[0]]
+        return []
+
+    async def fetchval(self, sql, workout_id):
+        return self.workout_versions.get(workout_id)
+
+    async def fetchrow(self, sql, workout_id):
+        return {'id': workout_id, 'user_id': 1, 'date': '2025-07-09'}
+
+
+def test_workout_etag_tracks_only_that_workout():
+    conn = FakeAsyncConnection({1: 3, 2: 5})
+    app.dependency_overrides[get_async_db] = lambda: conn
+    client = TestClient(app)
+
+    assert client.get("/workouts/1", headers={"If-None-Match": '"exercise_catalog.7-workout.3"'}).status_code == 304
+    conn.workout_versions[2] += 1
+    assert client.get("/workouts/1", headers={"If-None-Match": '"exercise_catalog.7-workout.3"'}).status_code == 304
+    conn.workout_versions[1] += 1
+    response = client.get("/workouts/1", headers={"If-None-Match": '"exercise_catalog.7-workout.3"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"exercise_catalog.7-workout.4"'
@@ -0,0 +1,188 @@
+import asyncio
+import contextlib
+from datetime import date
+
+import httpx
+
+import fitbit
+import main
+from main import _refresh_fitbit_token
+
+# Fitbit calls go through one shared client; a MockTransport stands in for the API.
+
+
+def _run(coro_factory, handler):
+    async def scenario():
+        await fitbit.open_client(transport=httpx.MockTransport(handler))
+        try:
+            return await coro_factory()
+        finally:
+            await fitbit.close_client()
+    return asyncio.run(scenario())
+
+
+def test_token_refresh_uses_shared_client():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"access_token": "new", "refresh_token": "next", "expires_in": 28800})
+
+    async def refresh_twice():
+        first_client = fitbit.client
+        tokens = [await _refresh_fitbit_token(1, "old"), await _refresh_fitbit_token(1, "next")]
+        assert fitbit.client is first_client
+        return tokens
+
+    tokens = _run(refresh_twice, handler)
+
+    assert [t["access_token"] for t in tokens] == ["new", "new"]
+    assert [str(r.url) for r in seen] == ["https://api.fitbit.com/oauth2/token"] * 2
+    assert seen[0].headers["authorization"].startswith("Basic ")
+    assert b"refresh_token=old" in seen[0].content
+
+
+def test_failed_refresh_returns_none():
+    result = _run(lambda: _refresh_fitbit_token(1, "revoked"), lambda request: httpx.Response(401, json={"errors": []}))
+    assert result is None
+
+
+def test_concurrency_is_bounded():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={})
+
+    async def burst():
+        return await asyncio.gather(*(fitbit.request("GET", f"/1/user/-/profile.json?i={i}") for i in range(20)))
+
+    responses = _run(burst, handler)
+
+    assert all(r.status_code == 200 for r in responses)
+    assert 1 < peak <= fitbit.FITBIT_MAX_CONCURRENCY
+
+
+class FakeAuthStore:
+    """Stands in for asyncpg: one user_fitbit_auth row, UPDATEs applied in place."""
+
+    def __init__(self, expires_at):
+        self.row = {"user_id": 1, "access_token": "stale", "refresh_token": "r0", "expires_at": expires_at}
+        self.open_connections = 0
+
+    def connection(self):
+        store = self
+
+        class Conn:
+            async def fetchrow(self, sql, *args):
+                return dict(store.row)
+
+            async def fetchval(self, sql, *args):
+                # UPDATE ... WHERE refresh_token = $5 RETURNING access_token
+                if store.row["refresh_token"] != args[4]:
+                    return None
+                store.row.update(access_token=args[0], refresh_token=args[1], expires_at=args[2])
+                return args[0]
+
+        @contextlib.asynccontextmanager
+        async def cm():
+            store.open_connections += 1
+            try:
+                yield Conn()
+            finally:
+                store.open_connections -= 1
+        return cm()
+
+
+def test_concurrent_expired_requests_refresh_once(monkeypatch):
+    store = FakeAuthStore(expires_at=0)
+    monkeypatch.setattr(main, "async_db_connection", store.connection)
+    refreshes = []
+
+    async def handler(request):
+        refreshes.append(store.open_connections)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"access_token": "fresh", "refresh_token": "r1", "expires_in": 28800})
+
+    async def burst():
+        return await asyncio.gather(*(main._fitbit_access_token(1) for _ in range(5)))
+
+    tokens = _run(burst, handler)
+
+    assert tokens == ["fresh"] * 5
+    # One refresh, and no pooled connection held while Fitbit answers it
+    assert refreshes == [0]
+    assert store.row["refresh_token"] == "r1"
+
+
+def test_refresh_keeps_tokens_rotated_by_another_worker(monkeypatch):
+    store = FakeAuthStore(expires_at=0)
+    monkeypatch.setattr(main, "async_db_connection", store.connection)
+
+    async def handler(request):
+        # Another worker rotates the stored pair while this refresh is in flight
+        store.row.update(access_token="other", refresh_token="r2", expires_at=2 ** 40)
+        return httpx.Response(200, json={"access_token": "fresh", "refresh_token": "r1", "expires_in": 28800})
+
+    token = _run(lambda: main._fitbit_access_token(1), handler)
+
+    assert token == "other"
+    assert store.row["refresh_token"] == "r2"
+
+
+def test_rate_limited_requests_retry_after_fitbit_delay(monkeypatch):
+    monkeypatch.setattr(fitbit, "retry_delay", lambda response, attempt: 0)
+    statuses = iter([429, 429, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), headers={"Fitbit-Rate-Limit-Reset": "120"})
+
+    response = _run(lambda: fitbit.request("GET", "/1/user/-/profile.json", retries=3), handler)
+    assert response.status_code == 200
+
+
+def test_retry_delay_follows_rate_limit_headers():
+    assert fitbit.retry_delay(httpx.Response(429, headers={"Retry-After": "30"}), 0) == 31
+    assert fitbit.retry_delay(httpx.Response(429, headers={"Fitbit-Rate-Limit-Reset": "120"}), 0) == 121
+    assert fitbit.retry_delay(httpx.Response(503), 2) == 4
+
+
+def test_backfill_endpoint_stops_at_rate_limit_instead_of_waiting(monkeypatch):
+    days = [date(2025, 7, d) for d in range(1, 6)]
+
+    class Conn:
+        async def fetch(self, sql, *args):
+            return [{'date': d, 'fetched_at': None} for d in days]
+
+    @contextlib.asynccontextmanager
+    async def connection():
+        yield Conn()
+
+    async def token(user_id):
+        return "token"
+
+    async def store_day(conn, user_id, day, payload):
+        return {}
+
+    monkeypatch.setattr(main, "async_db_connection", connection)
+    monkeypatch.setattr(main, "_fitbit_access_token", token)
+    monkeypatch.setattr(main.heartrate, "store_day", store_day)
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        if len(requested) > 2:
+            return httpx.Response(429, headers={"Fitbit-Rate-Limit-Reset": "1800"})
+        return httpx.Response(200, json={})
+
+    result = _run(lambda: main.backfill_heartrate(1, days[0], days[-1], concurrency=1, max_retry_delay=5), handler)
+
+    assert result.fetched == days[:2]
+    assert result.pending == days[2:]
+    assert result.retry_after == 1801
+    assert len(requested) == 3
@@ -0,0 +1,64 @@
+from datetime import date, datetime, time, timedelta
+
+import heartrate
+
+
+def _payload(points):
+    return {
+        "activities-heart": [{"dateTime": "2024-03-01", "value": {"restingHeartRate": 58}}],
+        "activities-heart-intraday": {
+            "dataset": [{"time": t, "value": v} for t, v in points],
+            "datasetInterval": 1,
+            "datasetType": "minute",
+        },
+    }
+
+
+def test_samples_round_trip_through_compact_encoding():
+    payload = _payload([("00:00:00", 61), ("07:30:00", 142), ("23:59:00", 70)])
+    samples = heartrate.encode_samples(payload["activities-heart-intraday"]["dataset"])
+
+    assert len(samples) == heartrate.MINUTES_PER_DAY
+    assert list(heartrate.iter_samples(samples)) == [(0, 61), (450, 142), (1439, 70)]
+    assert heartrate.resting_heart_rate(payload) == 58
+
+    rebuilt = heartrate.to_fitbit_json(date(2024, 3, 1), samples, 58)
+    assert rebuilt["activities-heart-intraday"]["dataset"] == payload["activities-heart-intraday"]["dataset"]
+    assert rebuilt["activities-heart"][0]["value"] == {"restingHeartRate": 58}
+
+
+def test_past_days_are_final_and_today_expires():
+    day = date(2024, 3, 1)
+    day_end = datetime(2024, 3, 2).astimezone()
+    long_after = day_end + timedelta(days=30)
+
+    # Fetched well after the day ended: never refetched
+    assert heartrate.is_fresh(day, day_end + heartrate.FINAL_AFTER, now=long_after)
+    # Fetched during the day: only good for the TTL
+    fetched = day_end - timedelta(hours=3)
+    assert heartrate.is_fresh(day, fetched, now=fetched + heartrate.TODAY_TTL / 2)
+    assert not heartrate.is_fresh(day, fetched, now=fetched + heartrate.TODAY_TTL * 2)
+
+
+def test_session_summary_and_exercise_split():
+    samples = bytearray(heartrate.MINUTES_PER_DAY)
+    samples[600:660] = bytes(range(100, 160))
+    samples[630] = 0  # tracker gap
+
+    start, end = heartrate.session_window(time(10, 0), time(11, 0))
+    summary = heartrate.summarize(bytes(samples), start, end, max_hr=190)
+
+    assert (start, end) == (600, 660)
+    assert summary["minutes_with_data"] == 59
+    assert summary["max_bpm"] == 159
+    assert sum(z["minutes"] for z in summary["zones"]) == 59
+    assert [z["minutes"] for z in summary["zones"]] == [0, 14, 18, 19, 8, 0]
+
+    assert heartrate.split_window(600, 660, [3, 0, 1]) == [(600, 645), (645, 645), (645, 660)]
+    assert heartrate.split_window(600, 660, [0, 0]) == [(600, 630), (630, 660)]
+
+
+def test_session_window_without_end_time():
+    assert heartrate.session_window(time(23, 30), time(0, 30)) == (1410, 1440)
+    assert heartrate.session_window(time(9, 0), None, now_minute=600) == (540, 600)
+    assert heartrate.session_window(time(9, 0), None) == (540, 540 + heartrate.DEFAULT_SESSION_MINUTES)
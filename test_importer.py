@@ -0,0 +1,164 @@
+import csv
+import io
+from datetime import date, time
+
+import psycopg2
+import pytest
+
+import importer
+
+CSV_TEXT = '''"title","start_time","end_time","description","exercise_title","superset_id","exercise_notes","set_index","set_type","weight_lbs","reps","distance_miles","duration_seconds","rpe"
+"Upper","9 Jul 2025, 06:42","9 Jul 2025, 07:46","","Lateral Raise (Cable)",,"",1,"normal",11,10,,,
+"Upper","9 Jul 2025, 06:42","9 Jul 2025, 07:46","","Lateral Raise (Cable)",,"",0,"normal",11,9,,,
+"Upper","9 Jul 2025, 06:42","9 Jul 2025, 07:46","","Sled Push",,"",0,"normal",,,255,,
+"Legs","10 Jul 2025, 06:00","10 Jul 2025, 07:00","","Plank",,"",0,"normal",,,,60,
+"Broken","not a date","","","Plank",,"",0,"normal",,,,60,
+'''
+
+
+def parse(text=CSV_TEXT):
+    return importer.parse_workouts(csv.DictReader(io.StringIO(text)))
+
+
+def test_groups_rows_into_workouts_and_exercises():
+    workouts, skipped = parse()
+
+    assert [w['date'].day for w in workouts] == [9, 10]
+    assert list(workouts[0]['exercises']) == ["Lateral Raise (Cable)", "Sled Push"]
+    raises = workouts[0]['exercises']["Lateral Raise (Cable)"]
+    assert [s['set_number'] for s in raises] == [2, 1]
+    assert raises[0]['weight_kg'] == 4.99
+    assert skipped == ["Invalid date for ('not a date', '', 'Broken')"]
+
+
+def test_sled_weight_logged_as_distance():
+    workouts, _ = parse()
+    sled = workouts[0]['exercises']["Sled Push"][0]
+
+    assert sled['weight_kg'] == round(255 * importer.LBS_TO_KG, 2)
+    assert sled['distance_m'] is None
+
+
+def test_copy_value_escaping():
+    assert importer._copy_value(None) == "\\N"
+    assert importer._copy_value("a\tb\nc\\") == "a\\tb\\nc\\\\"
+
+
+def test_iter_csv_rows_reads_in_small_chunks():
+    text = CSV_TEXT.replace('"Upper"', '"Überkörper"').replace('""', '"multi\nline"', 1)
+    data = io.BytesIO(text.encode("utf-8"))
+
+    rows = list(importer.iter_csv_rows(data, chunk_size=7))
+
+    assert rows == list(csv.DictReader(io.StringIO(text)))
+    assert rows[0]['title'] == "Überkörper"
+
+
+def test_batches_close_on_workout_boundaries():
+    workouts = importer.iter_workouts(csv.DictReader(io.StringIO(CSV_TEXT)))
+    batches = list(importer._iter_batches(workouts, batch_rows=2))
+
+    assert [[w['rows'] for w in batch] for batch in batches] == [[3], [1, 1]]
+
+
+JSON_TEXT = """[
+  {"date": "2025-10-12", "notes": "", "exercises": [
+    {"superset": [
+      {"name": "Sled Push", "category": "ATG", "sets": [{"reps": 3, "weight": 0, "distance": "255"}]},
+      {"name": "Split Squat", "category": "ATG", "sets": [{"reps": 10, "weight": 0, "height": "18 in"}]}
+    ]},
+    {"name": "Bike", "sets": [{"distance": "30 Yards", "duration": 1.5}]}
+  ]},
+  {"date": "not a date", "exercises": []}
+]"""
+
+
+def test_json_archive_streams_into_the_csv_workout_shape():
+    items = list(importer.iter_json_items(io.StringIO(JSON_TEXT), chunk_size=16))
+    workouts = [importer.parse_json_workout(item) for item in items]
+
+    assert len(workouts) == 2 and workouts[1]['date'] is None
+    workout = workouts[0]
+    assert workout['title'] == "ATG" and workout['start_time'] is None
+    assert list(workout['exercises']) == ["Sled Push", "Split Squat", "Bike"]
+    assert workout['exercises']["Sled Push"][0]['weight_kg'] == round(255 * importer.LBS_TO_KG, 2)
+    assert workout['exercises']["Split Squat"][0]['height_cm'] == 45.72
+    bike = workout['exercises']["Bike"][0]
+    assert (bike['distance_m'], bike['duration_seconds']) == (27.43, 90)
+
+
+def test_parallel_map_keeps_order_across_processes():
+    groups = list(importer.iter_row_groups(csv.DictReader(io.StringIO(CSV_TEXT))))
+
+    parsed = list(importer.parallel_map(importer.parse_csv_workout, groups, workers=2, chunk_size=1))
+
+    assert [w['key'] for w in parsed] == [w['key'] for w in map(importer.parse_csv_workout, groups)]
+
+
+def test_content_hash_tracks_exercises_and_sets():
+    workouts, _ = parse()
+    again, _ = parse()
+    edited, _ = parse(CSV_TEXT.replace('"normal",11,10', '"normal",11,12'))
+
+    assert workouts[0]['content_hash'] == again[0]['content_hash']
+    assert workouts[0]['content_hash'] != edited[0]['content_hash']
+    assert workouts[1]['content_hash'] == edited[1]['content_hash']
+
+
+@pytest.fixture
+def db_cursor():
+    try:
+        conn = importer.get_db_connection()
+    except psycopg2.OperationalError:
+        pytest.skip("no database reachable")
+    cursor = conn.cursor()
+    yield cursor
+    conn.rollback()
+    conn.close()
+
+
+def test_sessions_logged_in_app_are_never_rewritten(db_cursor):
+    db_cursor.execute("""
+        INSERT INTO users (username, email, password_hash)
+        VALUES ('importer_test', 'importer_test@example.com', 'x') RETURNING id
+    """)
+    user_id = db_cursor.fetchone()[0]
+    db_cursor.execute("""
+        INSERT INTO workouts (user_id, date, start_time, notes) VALUES (%s, %s, %s, 'logged in app') RETURNING id
+    """, (user_id, date(2025, 7, 9), time(6, 42)))
+    app_workout_id = db_cursor.fetchone()[0]
+    db_cursor.execute("INSERT INTO exercises (name) VALUES ('Importer Test Press') ON CONFLICT (name) DO NOTHING")
+    db_cursor.execute("""
+        INSERT INTO workout_exercises (workout_id, exercise_id, sequence)
+        SELECT %s, id, 1 FROM exercises WHERE name = 'Importer Test Press'
+    """, (app_workout_id,))
+
+    workouts, _ = parse()
+    imported, updated, skipped = importer.load_workouts(db_cursor, workouts, user_id)
+
+    assert (imported, updated) == (1, 0)
+    assert skipped == [f'Skipped 2025-07-09 06:42 "Upper": logged in app as workout {app_workout_id}']
+    db_cursor.execute("SELECT notes, content_hash FROM workouts WHERE id = %s", (app_workout_id,))
+    assert db_cursor.fetchone() == ('logged in app', None)
+    db_cursor.execute("SELECT count(*) FROM workout_exercises WHERE workout_id = %s", (app_workout_id,))
+    assert db_cursor.fetchone()[0] == 1
+
+
+def test_known_exercises_leave_the_catalog_version_alone(db_cursor):
+    db_cursor.execute("""
+        INSERT INTO users (username, email, password_hash)
+        VALUES ('importer_test', 'importer_test@example.com', 'x') RETURNING id
+    """)
+    user_id = db_cursor.fetchone()[0]
+    db_cursor.execute("""
+        INSERT INTO exercises (name) VALUES ('Lateral Raise (Cable)'), ('Sled Push'), ('Plank')
+        ON CONFLICT (name) DO NOTHING
+    """)
+    db_cursor.execute("SELECT version FROM table_versions WHERE name = 'exercise_catalog'")
+    before = db_cursor.fetchone()
+
+    workouts, _ = parse()
+    importer.load_workouts(db_cursor, workouts, user_id)
+
+    db_cursor.execute("SELECT version FROM table_versions WHERE name = 'exercise_catalog'")
+    assert db_cursor.fetchone() == before
@@ -0,0 +1,68 @@
+from main import get_active_routine_schedule
+
+# Regression test: /routines/active/schedule must load the whole
+# day -> exercise -> muscles tree in a constant number of queries.
+
+DAYS = 7
+EXERCISES_PER_DAY = 15
+
+
+class RecordingCursor:
+    def __init__(self, queries, has_active_routine):
+        self.queries = queries
+        self.has_active_routine = has_active_routine
+        self.result = []
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+        if "FROM routines" in sql:
+            self.result = [{'id': 1}] if self.has_active_routine else []
+        elif "FROM routine_days" in sql:
+            self.result = [{'id': d, 'name': f"Day {d}", 'day_of_week': d} for d in range(DAYS)]
+        elif "FROM routine_exercises" in sql:
+            self.result = [
+                {
+                    'routine_day_id': d, 'id': d * 100 + i, 'name': f"Exercise {d}-{i}", 'group_name': None,
+                    'suggested_sets': 3, 'suggested_reps': '8-12', 'suggested_weight_percent': None,
+                    'rest_period_seconds': 90, 'tempo': None, 'muscle_group': ['Chest', 'Triceps'],
+                }
+                for d in range(DAYS) for i in range(EXERCISES_PER_DAY)
+            ]
+        else:
+            self.result = []
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self, has_active_routine=True):
+        self.queries = []
+        self.has_active_routine = has_active_routine
+
+    def cursor(self, cursor_factory=None):
+        return RecordingCursor(self.queries, self.has_active_routine)
+
+
+def test_schedule_query_count_is_constant():
+    conn = RecordingConnection()
+    days = get_active_routine_schedule(user_id=1, conn=conn)
+
+    assert len(conn.queries) == 3
+    assert len(days) == DAYS
+    assert all(len(day['exercises']) == EXERCISES_PER_DAY for day in days)
+    assert days[0]['exercises'][0]['muscle_group'] == ['Chest', 'Triceps']
+    assert days[0]['exercises'][0]['sets'] == []
+
+
+def test_schedule_without_active_routine():
+    conn = RecordingConnection(has_active_routine=False)
+
+    assert get_active_routine_schedule(user_id=1, conn=conn) == []
+    assert len(conn.queries) == 1
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+
+import psycopg2
+
+# Default env vars (docker-compose provides its own)
+os.environ.setdefault("DB_NAME", "workouts")
+os.environ.setdefault("DB_USER", "user")
+os.environ.setdefault("DB_PASSWORD", "password")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+
+# Hot queries and the index each one is expected to use (migrations/002, 003).
+# Sequential scans are disabled while explaining so the check also holds on a
+# near-empty dev database, where the planner would otherwise prefer them.
+CHECKS = [
+    ("workout tree load",
+     "SELECT * FROM workout_exercises WHERE workout_id = ANY(ARRAY[1, 2, 3]) ORDER BY workout_id, sequence",
+     "idx_workout_exercises_workout"),
+    ("workout sets load",
+     "SELECT * FROM workout_sets WHERE workout_exercise_id = ANY(ARRAY[1, 2, 3]) ORDER BY workout_exercise_id, set_number",
+     "idx_workout_sets_exercise_set_number"),
+    ("previous set lookup",
+     "SELECT we.workout_id FROM workout_exercises we WHERE we.exercise_id = 1",
+     "idx_workout_exercises_exercise_workout"),
+    ("routine day exercises",
+     "SELECT * FROM routine_exercises WHERE routine_day_id = 1 ORDER BY sequence",
+     "idx_routine_exercises_routine_day"),
+    ("workout history by date",
+     "SELECT * FROM workouts WHERE user_id = 1 AND date >= '2025-01-01' AND date <= '2025-12-31'",
+     "idx_workouts_user_date"),
+    ("workout history page",
+     "SELECT * FROM workouts WHERE user_id = 1 ORDER BY date DESC, COALESCE(start_time, '00:00'::time) DESC, id DESC LIMIT 50",
+     "idx_workouts_user_date"),
+    ("workout history next page",
+     "SELECT * FROM workouts WHERE user_id = 1 AND (date, COALESCE(start_time, '00:00'::time), id) < ('2025-06-01', '07:00', 500) "
+     "ORDER BY date DESC, COALESCE(start_time, '00:00'::time) DESC, id DESC LIMIT 31",
+     "idx_workouts_user_date"),
+    ("active workout",
+     "SELECT * FROM workouts WHERE user_id = 1 AND end_time IS NULL ORDER BY date DESC, start_time DESC LIMIT 1",
+     "idx_workouts_user_active"),
+]
+
+def get_db_connection():
+    return psycopg2.connect(
+        dbname=os.environ.get("DB_NAME"),
+        user=os.environ.get("DB_USER"),
+        password=os.environ.get("DB_PASSWORD"),
+        host=os.environ.get("DB_HOST"),
+        port=os.environ.get("DB_PORT")
+    )
+
+def plan_indexes(plan):
+    """All index names referenced anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= plan_indexes(child)
+    return names
+
+def verify_indexes():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    failures = 0
+    try:
+        cursor.execute("SET enable_seqscan = off")
+        for label, query, expected in CHECKS:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = plan_indexes(plan[0]["Plan"])
+            if expected in used:
+                print(f"OK    {label}: {expected}")
+            else:
+                failures += 1
+                print(f"FAIL  {label}: expected {expected}, plan uses {sorted(used) or 'no index'}")
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if verify_indexes() else 0)
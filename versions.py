@@ -0,0 +1,68 @@
+"""Change counters kept in the table_versions table.
+
+Statement-level triggers bump one counter per cache key whenever a table
+feeding that key is written (migrations/006_table_versions.sql and
+007_read_model_versions.sql). Reading a handful of counters is a single
+primary-key lookup, which makes them cheap validators for in-process caches
+and HTTP ETags.
+
+A single workout tree is validated by the version column of its workouts row
+instead (migrations/010_workout_versions.sql), so logging a set only changes
+the tag of the workout it belongs to.
+"""
+import asyncpg
+import psycopg2
+
+EXERCISE_CATALOG = "exercise_catalog"  # exercises, exercise_muscles, muscles
+ROUTINES = "routines"                  # routines, routine_days, routine_exercises
+
+VERSIONS_QUERY = "SELECT name, version FROM table_versions WHERE name = ANY(%s)"
+
+WORKOUT_VERSION_QUERY = "SELECT version FROM workouts WHERE id = $1"
+
+
+def get_versions(conn, names):
+    """{name: version} for the requested keys, or None if any of them is not tracked."""
+    names = list(names)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(VERSIONS_QUERY, (names,))
+        versions = dict(cursor.fetchall())
+    except psycopg2.errors.UndefinedTable:
+        # Migrations not applied yet: behave as if nothing were cacheable
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+    return versions if len(versions) == len(names) else None
+
+
+async def fetch_versions(conn, names):
+    """asyncpg counterpart of get_versions."""
+    names = list(names)
+    try:
+        rows = await conn.fetch(VERSIONS_QUERY.replace("%s", "$1::text[]"), names)
+    except asyncpg.exceptions.UndefinedTableError:
+        return None
+    versions = {row['name']: row['version'] for row in rows}
+    return versions if len(versions) == len(names) else None
+
+
+def get_version(conn, name):
+    versions = get_versions(conn, [name])
+    return versions[name] if versions else None
+
+
+def make_etag(versions):
+    """Strong ETag naming every counter the response was built from, or None when untracked."""
+    if not versions:
+        return None
+    return '"%s"' % "-".join(f"{name}.{version}" for name, version in sorted(versions.items()))
+
+
+async def fetch_workout_version(conn, workout_id):
+    """Version of one workout tree, or None if the workout does not exist or is untracked."""
+    try:
+        return await conn.fetchval(WORKOUT_VERSION_QUERY, workout_id)
+    except asyncpg.exceptions.UndefinedColumnError:
+        return None